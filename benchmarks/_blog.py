@@ -0,0 +1,81 @@
+"""Synthetic blogs for the benchmarks, built from a local CSV of generated articles, with no network."""
+import csv
+import functools
+import sys
+import threading
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parents[1] / 'src'
+
+# The benchmarks run against the source tree, whether or not the package is installed.
+sys.path.insert(0, str(SRC_DIR))
+
+COLUMNS = (
+    'Status', 'Title', 'Legacy Slugs', 'Timestamp', 'Modified Timestamp', 'Author Name', 'Author email',
+    'About the Author', 'Author Avatar Image URL', 'linked.in github urls',
+    'Header Image (will be used in RSS feed)', 'Excerpt/Short Summary', 'Categories', 'Slug', 'Markdown',
+)
+CATEGORIES = ('Engineering', 'Product', 'Design', 'Culture')
+
+SETTINGS = '''blog_name: "Benchmark"
+blog_root_url: "blog"
+blog_post_location_url: "{location}"
+domain_url: "https://example.com"
+'''
+
+
+def get_markdown(index: int, paragraphs: int) -> str:
+    sections = [f'# Article {index}\n']
+    for paragraph in range(paragraphs):
+        text = f'Paragraph {paragraph} of article {index}, with **bold** text and a [link](https://x.io). '
+        sections.append(f'## Section {paragraph}\n\n' + text * 8)
+
+    return '\n\n'.join(sections) + '\n'
+
+
+def make_blog(workdir: Path, articles: int, paragraphs: int = 20, location: str = 'posts.csv') -> Path:
+    """
+    Write the settings and a CSV of `articles` generated articles into `workdir`.
+
+    :param location: where the build reads the CSV from, the file in `workdir` by default. See `serve_directory()`
+    """
+    workdir.mkdir(parents=True, exist_ok=True)
+    workdir.joinpath('settings.yaml').write_text(SETTINGS.format(location=location), encoding='utf-8')
+
+    with open(workdir / 'posts.csv', 'w', newline='', encoding='utf-8') as fp:
+        writer = csv.DictWriter(fp, COLUMNS)
+        writer.writeheader()
+        for index in range(articles):
+            writer.writerow({
+                'Status': '1',
+                'Title': f'Article {index}',
+                'Timestamp': f'01/{index % 28 + 1:02d}/2024 10:{index % 60:02d}:00',
+                'Author Name': 'Author',
+                'Author email': 'author@example.com',
+                'About the Author': 'About the author.',
+                'Author Avatar Image URL': 'https://example.com/avatar.png',
+                'Header Image (will be used in RSS feed)': 'https://example.com/header.png',
+                'Excerpt/Short Summary': f'Summary of article {index}.',
+                'Categories': CATEGORIES[index % len(CATEGORIES)],
+                'Markdown': get_markdown(index, paragraphs),
+            })
+
+    return workdir
+
+
+def serve_directory(directory: Path) -> str:
+    """
+    Serve files of `directory` over HTTP from a daemon thread and return the base URL.
+    Versions of BlogVi before local sources read the CSV only from a URL.
+    """
+    handler = functools.partial(QuietHandler, directory=str(directory))
+    server = HTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return f'http://127.0.0.1:{server.server_port}'
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
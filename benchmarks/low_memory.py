@@ -0,0 +1,89 @@
+"""
+Memory allocated by a build of a synthetic blog, with and without `low_memory`.
+
+    python benchmarks/low_memory.py --articles 200 800
+
+Each mode builds a fresh blog of each size in its own process, traced with tracemalloc, which slows the build down
+several times. Stages run one by one, so the peak of each is its own. Reported are the peak of the whole build,
+the peak of the stages generating the pages, once the source is parsed, and the memory still allocated when the build
+is over. Requires Python 3.9 or newer.
+"""
+import argparse
+import contextlib
+import io
+import json
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+from _blog import make_blog
+
+# Stages reading the source and building the articles from its rows, the same in both modes.
+SOURCE_STAGES = ('fetch', 'index')
+
+
+def measure(workdir: Path, low_memory: bool) -> dict:
+    """Build the blog in `workdir` and return the memory allocated by the build, in bytes."""
+    from blog_vi.__main__ import generate_blog
+    from blog_vi.core.build import BuildGraph
+
+    stage_peaks = {}
+    run_stage = BuildGraph.run_stage
+
+    def run_traced_stage(stage, *args, **kwargs):
+        tracemalloc.reset_peak()
+        try:
+            return run_stage(stage, *args, **kwargs)
+        finally:
+            stage_peaks[stage.name] = tracemalloc.get_traced_memory()[1]
+
+    BuildGraph.run_stage = staticmethod(run_traced_stage)
+    BuildGraph.max_workers = 1
+
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        generate_blog(workdir, low_memory=low_memory)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'peak': max(stage_peaks.values()),
+        'generation_peak': max(peak for name, peak in stage_peaks.items() if name not in SOURCE_STAGES),
+        'retained': current,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--articles', type=int, nargs='+', default=[200, 800], help='sizes of the blogs')
+    parser.add_argument('--paragraphs', type=int, default=20, help='sections of each generated article')
+    parser.add_argument('--measure', choices=('on', 'off'), help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.workdir, low_memory=args.measure == 'on')))
+        return
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for articles in args.articles:
+            for mode in ('off', 'on'):
+                workdir = make_blog(Path(directory, f'{articles}-{mode}'), articles, args.paragraphs)
+                process = subprocess.run(
+                    [sys.executable, __file__, '--measure', mode, '--workdir', str(workdir)],
+                    stdout=subprocess.PIPE, universal_newlines=True, check=True,
+                )
+                results[articles, mode] = json.loads(process.stdout.splitlines()[-1])
+
+    print(f'Articles of {args.paragraphs} sections, MiB')
+    print(f'{"articles":<10}{"low_memory":<12}{"peak":>10}{"generation":>12}{"retained":>10}')
+    for (articles, mode), result in results.items():
+        print(f'{articles:<10}{mode:<12}{result["peak"] / 2 ** 20:>10.1f}'
+              f'{result["generation_peak"] / 2 ** 20:>12.1f}{result["retained"] / 2 ** 20:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Directories created by a build of a synthetic blog: `mkdir` calls against the output directories of the articles.
+
+    python benchmarks/mkdir_calls.py --articles 1000
+    python benchmarks/mkdir_calls.py --articles 1000 --rev c454004^
+
+Every `os.mkdir` call is counted, `Path.mkdir` and `os.makedirs` included, each being a syscall whether the directory
+exists or not. `--rev` builds the same blog with the sources of a git revision as well, e.g. to compare with
+the article paths that created their directories on every access.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+from pathlib import Path
+
+from _blog import SRC_DIR, make_blog, serve_directory
+
+
+def measure(workdir: Path, src_dir: Path) -> dict:
+    """Build the blog in `workdir` twice, the second time with nothing changed, and count `mkdir` calls of each."""
+    sys.path.insert(0, str(src_dir))
+    from blog_vi.__main__ import generate_blog
+
+    calls = []
+    mkdir = os.mkdir
+
+    def counted_mkdir(path, *args, **kwargs):
+        calls.append(os.fspath(path))
+        return mkdir(path, *args, **kwargs)
+
+    os.mkdir = counted_mkdir
+
+    # The CSV is served over HTTP, which any version of BlogVi reads.
+    workdir.joinpath('settings.yaml').write_text(
+        workdir.joinpath('settings.yaml').read_text().replace('"posts.csv"', f'"{serve_directory(workdir)}/posts.csv"')
+    )
+
+    results = {}
+    for build in ('build', 'rebuild'):
+        calls.clear()
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_blog(workdir)
+        results[build] = {'calls': len(calls), 'directories': len(set(calls))}
+
+    results['article_directories'] = sum(1 for _ in workdir.glob('articles/*/index.html'))
+
+    return results
+
+
+def export_sources(rev: str, directory: Path) -> Path:
+    """Extract the package sources of the git revision `rev` into `directory`."""
+    repository = SRC_DIR.parent
+    archive = subprocess.run(['git', 'archive', '--format=tar', rev, 'src'], cwd=str(repository),
+                             stdout=subprocess.PIPE, check=True).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(str(directory))
+
+    return directory / 'src'
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--articles', type=int, default=500)
+    parser.add_argument('--rev', help='git revision to compare the working tree with')
+    parser.add_argument('--measure', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', type=Path, help=argparse.SUPPRESS)
+    parser.add_argument('--src', type=Path, default=SRC_DIR, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.workdir, args.src)))
+        return
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        sources = {'working tree': SRC_DIR}
+        if args.rev:
+            sources[args.rev] = export_sources(args.rev, Path(directory, 'rev'))
+
+        for index, (name, src_dir) in enumerate(sources.items()):
+            workdir = make_blog(Path(directory, f'blog{index}'), args.articles, paragraphs=2)
+            process = subprocess.run(
+                [sys.executable, __file__, '--measure', '--workdir', str(workdir), '--src', str(src_dir)],
+                stdout=subprocess.PIPE, universal_newlines=True, check=True,
+            )
+            results[name] = json.loads(process.stdout.splitlines()[-1])
+
+    print(f'{args.articles} articles, mkdir calls (distinct directories)')
+    print(f'{"sources":<16}{"build":>16}{"rebuild":>16}{"article dirs":>14}')
+    for name, result in results.items():
+        build, rebuild = result['build'], result['rebuild']
+        print(f'{name:<16}{build["calls"]:>8} ({build["directories"]:>5}){rebuild["calls"]:>8} '
+              f'({rebuild["directories"]:>5}){result["article_directories"]:>14}')
+
+
+if __name__ == '__main__':
+    main()
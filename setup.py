@@ -34,17 +34,18 @@ setup(
         "Intended Audience :: Developers",
         "License :: OSI Approved :: Apache Software License",
         "Programming Language :: Python :: 3",
-        "Programming Language :: Python :: 3.5",
-        "Programming Language :: Python :: 3.6",
-        "Programming Language :: Python :: 3.7",
         "Programming Language :: Python :: 3.8",
         "Programming Language :: Python :: 3.9",
     ],
     keywords="blog-vi(勝利)",
     packages=find_packages(where="src"),
     package_dir={"": "src"},
-    python_requires=">=3.5, <4",
+    python_requires=">=3.8, <4",
     install_requires=install_reqs,
+    extras_require={
+        # Parquet and Arrow snapshots of the articles, see `blogvi snapshot`.
+        "parquet": ["pyarrow"],
+    },
     entry_points={
         "console_scripts": [
             "blogvi=blog_vi._cli:_cli"
@@ -1,75 +1,147 @@
-import sys
+from concurrent.futures import ThreadPoolExecutor
+from glob import glob
 from pathlib import Path
-import copy
+from typing import List, Optional, Sequence, Tuple, TYPE_CHECKING
+
+import yaml
 
 from blog_vi._config import SETTINGS_FILENAME
 from blog_vi._settings import Settings, get_settings
-from blog_vi.core.article import Article
-from blog_vi.core.landing import Landing
-from blog_vi.core.translations.engine import TranslateEngine
-from blog_vi.core.translations.exceptions import (
-    ProviderSettingsNotFound, TranslateEngineNotFound, BadProviderSettingsError
-)
-from blog_vi.core.utils import get_articles_from_csv, prepare_workdir
+from blog_vi.core.build import BuildContext, BuildTarget, build_index, get_build_graph
+from blog_vi.core.output import BuildOutput, add_assets, close_output, open_output
+from blog_vi.core.utils import prepare_workdir
 
+if TYPE_CHECKING:
+    from blog_vi.core.plan import BuildPlan
 
-def generate_blog(workdir: Path) -> None:
-    workdir, templates_dir = prepare_workdir(workdir)
 
+def load_settings(workdir: Path) -> Settings:
+    """Return settings of the blog in `workdir`, without preparing the directory."""
     settings_dict = get_settings(workdir / SETTINGS_FILENAME)
-    settings = Settings(workdir, templates_dir, **settings_dict)
-
-    url = settings.blog_post_location_url
-    articles = get_articles_from_csv(url)
-    print(f"[DEBUG] Fetched {len(articles)} articles from CSV.")
-
-    index = Landing.from_settings(settings)
-    articles_added = 0
-
-    for cnt, article in enumerate(articles):
-        if article['Status'] != '1':
-            continue
-
-        article['Title'] = article.get('Title') or f'blog-{cnt}'
-
-        if article['Legacy Slugs'] != '':
-            article_obj = Article.from_config(settings, index, article)
-            redirect_slug = article_obj.slug
-            index.add_article(article_obj)
-            legacy_slugs = article['Legacy Slugs'].split(';')
-            for slug in legacy_slugs:
-                legacy_article = copy.deepcopy(article)
-                legacy_article['Slug'] = slug
-                legacy_article['Is Legacy'] = True
-                legacy_article['Redirect Slug'] = redirect_slug
-                article_obj = Article.from_config(settings, index, legacy_article)
-                index.add_article(article_obj)
-
-        else:
-            article_obj = Article.from_config(settings, index, article)
-            index.add_article(article_obj)
-        articles_added += 1
-
-    print(f"[DEBUG] Added {articles_added} articles with Status '1' to index.")
-    print(f"[DEBUG] Calling index.generate() to write output...")
-    index.generate()
-    print(f"[DEBUG] index.generate() finished.")
-
-    if settings.translate_articles:
-        try:
-            if settings.source_language is None:
-                print('[-] Please, provide a source language abbreviation.')
-                sys.exit(1)
-            engine = TranslateEngine(index, settings.source_language['abbreviation'])
-        except ProviderSettingsNotFound:
-            print(f'[-] Settings not found for translate provider {settings.translator}')
-        except TranslateEngineNotFound:
-            print('[-] Translate engine not found')
-        except BadProviderSettingsError:
-            print(f'[-] Please, fill all {settings.translator} provider settings')
-        except TypeError:
-            print('[-] Please define translator provider in settings')
-        else:
-            engine.translate()
-
-    index.cache_changes()
+
+    return Settings(workdir, workdir / 'templates', **settings_dict)
+
+
+def generate_blog(workdir: Path, low_memory: bool = False, resume: bool = False, batch: bool = False,
+                  poll_interval: float = 60, stages: Optional[Sequence[str]] = None,
+                  target: Optional[BuildTarget] = None, stale_outputs: Optional[str] = None,
+                  emit_tar: Optional[Path] = None, output: Optional[str] = None) -> BuildOutput:
+    """
+    Generate the blog in `workdir`, along with its translations.
+
+    :param resume: reuse articles translated by an interrupted build
+    :param batch: translate pending texts with the batch API of the provider before building the translations
+    :param poll_interval: seconds between checks of the batch jobs
+    :param stages: names of the build stages to run, along with the ones they require. All stages by default
+    :param target: articles and languages regenerated by a partial build. The whole blog by default
+    :param stale_outputs: what to do with files of previous builds, that this one does not produce.
+                          Overrides the `stale_outputs` setting
+    :param emit_tar: path of a tar archive to write the files added and changed by the build to
+    :param output: where pages are written: `directory` (default), `memory`, or the path of a tar or zip archive.
+                   See `create_output()`
+    :return: the output of the build, e.g. with the files kept in memory
+    """
+    workdir, templates_dir = prepare_workdir(workdir)
+
+    settings = load_settings(workdir)
+    if low_memory:
+        settings.low_memory = True
+    if stale_outputs:
+        settings.stale_outputs = stale_outputs
+
+    context = BuildContext(settings, resume=resume, batch=batch, poll_interval=poll_interval, target=target,
+                           emit_tar=emit_tar)
+    build_output = open_output(settings, output)
+    try:
+        # Partial builds regenerate their targets, whether the stages are up to date or not,
+        # and builds into other outputs than the blog directory regenerate everything.
+        get_build_graph().run(context, stages, force=context.target.is_partial or not build_output.in_workdir)
+
+        if not build_output.in_workdir:
+            add_assets(build_output, templates_dir)
+    finally:
+        close_output(settings)
+
+    if not build_output.in_workdir:
+        print(f'[+] Wrote the blog to {build_output.describe()}.')
+
+    return build_output
+
+
+def plan_blog(workdir: Path) -> 'BuildPlan':
+    """Return the plan of a build of the blog in `workdir`, evaluated without writing anything."""
+    from blog_vi.core.plan import BuildPlan
+
+    settings = load_settings(workdir)
+
+    return BuildPlan(BuildContext(settings), get_build_graph()).evaluate()
+
+
+def snapshot_blog(workdir: Path, output: Optional[Path] = None) -> Tuple[int, Path]:
+    """
+    Freeze the articles of the blog in `workdir` into a local file, `snapshot.csv.gz` in `workdir` by default.
+    Return the number of rows written and the path of the snapshot.
+    """
+    from blog_vi.core.sources import DEFAULT_SNAPSHOT_FILENAME, SourceError, get_articles_from_source, write_snapshot
+
+    settings = load_settings(workdir)
+    output = output or workdir / DEFAULT_SNAPSHOT_FILENAME
+
+    rows = get_articles_from_source(settings.blog_post_location_url, workdir)
+    if not rows:
+        raise SourceError(f'No articles fetched from {settings.blog_post_location_url}, the snapshot is not written.')
+
+    write_snapshot(rows, output)
+
+    return len(rows), output
+
+
+def get_site_workdirs(sites: str) -> Tuple[List[Path], int]:
+    """
+    Return blog directories listed in the `sites` YAML file, or matching the `sites` glob pattern,
+    along with the number of concurrent jobs to build them with.
+
+    The YAML file is either a list of directories or a mapping with `sites` and optional `jobs` keys.
+    Relative directories are resolved against the file location.
+    """
+    path = Path(sites)
+
+    if path.suffix not in ('.yaml', '.yml') or not path.is_file():
+        return sorted(Path(match) for match in glob(sites) if Path(match).is_dir()), 4
+
+    with open(path) as f:
+        config = yaml.load(f, Loader=yaml.FullLoader) or {}
+
+    if isinstance(config, list):
+        config = {'sites': config}
+
+    workdirs = []
+    for site in config.get('sites', []):
+        workdir = Path(site['path'] if isinstance(site, dict) else site)
+        workdirs.append(workdir if workdir.is_absolute() else path.parent / workdir)
+
+    return workdirs, config.get('jobs', 4)
+
+
+def generate_blogs(workdirs: List[Path], jobs: int = 4, low_memory: bool = False) -> List[Path]:
+    """
+    Generate several blogs in this process, scheduling them across a pool of `jobs` workers.
+    Compiled templates, Markdown converters and HTTP connections are shared between the builds.
+
+    :return: directories of the blogs, that failed to build
+    """
+    failed = []
+
+    with ThreadPoolExecutor(max_workers=min(jobs, len(workdirs))) as executor:
+        futures = {executor.submit(generate_blog, workdir, low_memory=low_memory): workdir for workdir in workdirs}
+
+        for future, workdir in futures.items():
+            try:
+                future.result()
+            except (Exception, SystemExit) as e:
+                print(f'[-] Failed to build the blog in {workdir}. Error - {e!r}')
+                failed.append(workdir)
+            else:
+                print(f'[+] Built the blog in {workdir}')
+
+    return failed
@@ -1,30 +1,366 @@
+import contextlib
+import json
 import os
+import sys
 from pathlib import Path
 
 import click
 
-from .__main__ import generate_blog
+from .__main__ import generate_blog, generate_blogs, get_site_workdirs, load_settings, plan_blog, snapshot_blog
 from ._config import SETTINGS_FILENAME, AUTHORS_FILENAME
+from .core.build import STAGE_NAMES, BuildTarget
+from .core.manifest import STALE_OUTPUT_MODES
+from .core.output import OUTPUT_KINDS, TAR_SUFFIXES, ZIP_SUFFIXES
 
 # List of filenames, that must exists in the directory
 MANDATORY_FILENAMES = [SETTINGS_FILENAME]
+# Outputs of `--output`, besides archives.
+CLI_OUTPUT_KINDS = tuple(kind for kind in OUTPUT_KINDS if kind != 'memory')
 
 
-@click.command()
+class DefaultCommandGroup(click.Group):
+    """A group running `default_command`, when the first argument is not a command name.
+
+    Keeps `blogvi <directory>` working as a shortcut for `blogvi build <directory>`.
+    """
+    default_command = 'build'
+
+    def parse_args(self, ctx, args):
+        if not args or (args[0] not in self.commands and args[0] not in self.get_help_option_names(ctx)):
+            args = [self.default_command, *args]
+
+        return super().parse_args(ctx, args)
+
+
+def split_values(ctx, param, values) -> tuple:
+    """Split comma-separated values of an option given several times."""
+    return tuple(value.strip() for option in values for value in option.split(',') if value.strip())
+
+
+def check_output(ctx, param, value):
+    """
+    Check the output is the blog directory or the path of an archive of a known format.
+    The `memory` output is left to `generate_blog()` callers, the command line would discard its files.
+    """
+    if value is None or value in CLI_OUTPUT_KINDS or value.endswith(TAR_SUFFIXES + ZIP_SUFFIXES):
+        return value
+
+    raise click.BadParameter('expected {}, or a path ending with {}.'.format(
+        ', '.join(CLI_OUTPUT_KINDS), ', '.join(TAR_SUFFIXES + ZIP_SUFFIXES)
+    ))
+
+
+def check_workdir(workdir: Path) -> bool:
+    """Check the directory contains all mandatory files and report the missing ones."""
+    for filename in MANDATORY_FILENAMES:
+        if not workdir.joinpath(filename).exists():
+            click.echo('Could not find `{}` in directory `{}`.'.format(filename, workdir))
+
+            return False
+
+    return True
+
+
+@click.group(cls=DefaultCommandGroup)
+def _cli():
+    pass
+
+
+@_cli.command()
 @click.argument(
     "directory",
     envvar="BLOGVI_DIRECTORY",
     type=click.Path(exists=True, file_okay=False, dir_okay=True),
     required=True
 )
-def _cli(directory):
+@click.option(
+    "--low-memory",
+    is_flag=True,
+    default=False,
+    help="Release article bodies as soon as their pages are written."
+)
+@click.option(
+    "--resume",
+    is_flag=True,
+    default=False,
+    help="Reuse articles translated by an interrupted build, instead of translating them again."
+)
+@click.option(
+    "--stage",
+    "stages",
+    type=click.Choice(STAGE_NAMES),
+    multiple=True,
+    help="Run only this build stage, along with the stages it requires. Can be given several times."
+)
+@click.option(
+    "--only",
+    "slugs",
+    multiple=True,
+    callback=split_values,
+    help="Regenerate just the articles with these comma-separated slugs, and the pages depending on them."
+)
+@click.option(
+    "--category",
+    "categories",
+    multiple=True,
+    callback=split_values,
+    help="Regenerate just the articles of this category, and the pages depending on them. Can be given several times."
+)
+@click.option(
+    "--lang",
+    "languages",
+    multiple=True,
+    callback=split_values,
+    help="Build just these comma-separated languages. The source language is given by its abbreviation as well."
+)
+@click.option(
+    "--stale-outputs",
+    type=click.Choice(STALE_OUTPUT_MODES),
+    default=None,
+    help="Report, delete, or delete and tombstone files of previous builds, that this build no longer produces."
+         " Defaults to the `stale_outputs` setting."
+)
+@click.option(
+    "--emit-tar",
+    type=click.Path(dir_okay=False, writable=True),
+    default=None,
+    help="Write the files added and changed since the previous build into this tar archive, gzipped for .gz/.tgz."
+)
+@click.option(
+    "--output",
+    default=None,
+    callback=check_output,
+    help="Write the pages to the blog directory (`directory`, default),"
+         " or stream them into a tar or zip archive given by its path, e.g. site.tar.gz or site.zip."
+)
+def build(directory, low_memory, resume, stages, slugs, categories, languages, stale_outputs, emit_tar, output):
+    """Generate the blog in DIRECTORY.
+
+    The build runs in stages: fetch, index, articles, landing, categories, search, rss, translate, cache and manifest.
+    Independent stages run concurrently, and stages whose inputs did not change since the last build are skipped.
+
+    --only, --category and --lang make a partial build, regenerating just the given articles with their neighbours,
+    their categories, the landing, search index and feed, in the given languages.
+    """
     # TODO: Checks for `templates_dir`
     workdir = Path(directory)
 
-    for filename in MANDATORY_FILENAMES:
-        if not workdir.joinpath(filename).exists():
-            click.echo('Could not find `{}` in directory `{}`.'.format(filename, directory))
+    if not check_workdir(workdir):
+        return
+
+    target = BuildTarget(slugs=slugs, categories=categories, languages=languages)
+    generate_blog(workdir, low_memory=low_memory, resume=resume, stages=stages, target=target,
+                  stale_outputs=stale_outputs, emit_tar=Path(emit_tar) if emit_tar else None, output=output)
+
+
+@_cli.command()
+@click.argument(
+    "directory",
+    envvar="BLOGVI_DIRECTORY",
+    type=click.Path(exists=True, file_okay=False, dir_okay=True),
+    required=True
+)
+@click.option(
+    "--low-memory",
+    is_flag=True,
+    default=False,
+    help="Release article bodies as soon as their pages are written."
+)
+@click.option(
+    "--resume",
+    is_flag=True,
+    default=False,
+    help="Reuse articles translated by an interrupted build, instead of translating them again."
+)
+@click.option(
+    "--batch",
+    is_flag=True,
+    default=False,
+    help="Translate all pending texts with the batch API of the provider, then build."
+)
+@click.option(
+    "--poll-interval",
+    type=click.FloatRange(min=0),
+    default=60,
+    show_default=True,
+    help="Seconds between checks of the batch jobs."
+)
+def translate(directory, low_memory, resume, batch, poll_interval):
+    """Translate the blog in DIRECTORY and build it.
+
+    With --batch, texts are translated offline, with a higher latency and a lower cost. The job state is kept
+    in the blog directory, so an interrupted run resumes polling the submitted jobs.
+    """
+    workdir = Path(directory)
+
+    if not check_workdir(workdir):
+        raise click.exceptions.Exit(1)
+
+    settings = load_settings(workdir)
+    if not settings.translate_articles or not settings.translation_list:
+        click.echo('Translations are disabled in `{}`, set `translate_articles` and `translation_list`.'.format(
+            directory
+        ))
+        raise click.exceptions.Exit(1)
+
+    generate_blog(workdir, low_memory=low_memory, resume=resume, batch=batch, poll_interval=poll_interval)
+
+
+@_cli.command()
+@click.argument(
+    "directory",
+    envvar="BLOGVI_DIRECTORY",
+    type=click.Path(exists=True, file_okay=False, dir_okay=True),
+    required=True
+)
+@click.option(
+    "--json",
+    "as_json",
+    is_flag=True,
+    default=False,
+    help="Print the plan as JSON."
+)
+def plan(directory, as_json):
+    """Show what a build of the blog in DIRECTORY would regenerate and why, without writing anything.
+
+    Lists stages, article pages and translations to be regenerated, the characters to be sent
+    to the translation provider and the CPU time estimated from the previous build.
+    """
+    workdir = Path(directory)
+
+    if not check_workdir(workdir):
+        return
+
+    if as_json:
+        # Keep the progress messages of the fetch out of the JSON output.
+        with contextlib.redirect_stdout(sys.stderr):
+            build_plan = plan_blog(workdir)
+
+        click.echo(json.dumps(build_plan.to_dict(), indent=2))
+        return
+
+    build_plan = plan_blog(workdir)
+    click.echo(build_plan.format())
+
+
+@_cli.command()
+@click.argument(
+    "directory",
+    envvar="BLOGVI_DIRECTORY",
+    type=click.Path(exists=True, file_okay=False, dir_okay=True),
+    required=True
+)
+@click.argument("output", type=click.Path(dir_okay=False), required=False)
+def snapshot(directory, output):
+    """Freeze the articles of the blog in DIRECTORY into the local file OUTPUT, for builds with no network.
+
+    OUTPUT defaults to `snapshot.csv.gz` in DIRECTORY. Its format is given by the extension: .csv, .csv.gz,
+    .parquet, .arrow or .feather. Parquet and Arrow require pyarrow. Point `blog_post_location_url`
+    to the snapshot to build from it.
+    """
+    from .core.sources import SourceError
+
+    workdir = Path(directory)
+
+    if not check_workdir(workdir):
+        return
+
+    try:
+        count, path = snapshot_blog(workdir, Path(output) if output else None)
+    except SourceError as e:
+        click.echo(str(e))
+        raise click.exceptions.Exit(1)
+
+    click.echo('Wrote {} articles to `{}`. Set `blog_post_location_url: "{}"` to build from it.'.format(
+        count, path, os.path.relpath(path, workdir)
+    ))
+
+
+@_cli.command('build-many')
+@click.argument("sites", required=True)
+@click.option(
+    "-j", "--jobs",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Number of sites built concurrently. Defaults to the `jobs` value of the sites file, or 4."
+)
+@click.option(
+    "--low-memory",
+    is_flag=True,
+    default=False,
+    help="Release article bodies as soon as their pages are written."
+)
+def build_many(sites, jobs, low_memory):
+    """Generate many blogs in a single process.
+
+    SITES is either a YAML file listing the blog directories or a glob pattern matching them.
+    Templates, Markdown converters and HTTP connections are shared between the builds.
+    """
+    workdirs, default_jobs = get_site_workdirs(sites)
+    workdirs = [workdir for workdir in workdirs if check_workdir(workdir)]
+
+    if not workdirs:
+        click.echo('No blogs found in `{}`.'.format(sites))
+
+        return
+
+    failed = generate_blogs(workdirs, jobs=jobs or default_jobs, low_memory=low_memory)
+
+    if failed:
+        raise click.exceptions.Exit(1)
+
+
+@_cli.group('tm')
+def translation_memory():
+    """Manage the translation memory."""
+
+
+def get_workdir_translation_memory(directory):
+    from .core.translations.memory import get_translation_memory
+
+    workdir = Path(directory)
+    if not check_workdir(workdir):
+        raise click.exceptions.Exit(1)
+
+    memory = get_translation_memory(load_settings(workdir))
+    if memory is None:
+        click.echo('The translation memory is disabled in `{}`.'.format(directory))
+        raise click.exceptions.Exit(1)
+
+    return memory
+
+
+@translation_memory.command('stats')
+@click.argument("directory", type=click.Path(exists=True, file_okay=False, dir_okay=True))
+def translation_memory_stats(directory):
+    """Show statistics of the translation memory of the blog in DIRECTORY."""
+    memory = get_workdir_translation_memory(directory)
+    stats = memory.get_stats()
+    stored_stats = memory.get_stored_stats()
+
+    click.echo('Segments: {entries}'.format(**stats))
+    for run, hits, misses in (('Last run', stored_stats['last_hits'], stored_stats['last_misses']),
+                              ('All runs', stored_stats['total_hits'], stored_stats['total_misses'])):
+        lookups = hits + misses
+        ratio = '{:.0%}'.format(hits / lookups) if lookups else '-'
+        click.echo('{}: {} hits, {} misses, hit ratio {}'.format(run, hits, misses, ratio))
+
+
+@translation_memory.command('export')
+@click.argument("directory", type=click.Path(exists=True, file_okay=False, dir_okay=True))
+@click.argument("output", type=click.File('w', encoding='utf-8'))
+def translation_memory_export(directory, output):
+    """Export the translation memory of the blog in DIRECTORY into OUTPUT as JSON lines."""
+    count = get_workdir_translation_memory(directory).export(output)
+
+    click.echo('Exported {} segments.'.format(count))
+
 
-            return
+@translation_memory.command('import')
+@click.argument("directory", type=click.Path(exists=True, file_okay=False, dir_okay=True))
+@click.argument("source", type=click.File('r', encoding='utf-8'))
+def translation_memory_import(directory, source):
+    """Import segments from SOURCE, exported with `blogvi tm export`, into the blog in DIRECTORY."""
+    count = get_workdir_translation_memory(directory).import_(source)
 
-    generate_blog(workdir)
+    click.echo('Imported {} new segments.'.format(count))
@@ -1,5 +1,7 @@
 SETTINGS_FILENAME = 'settings.yaml'
 AUTHORS_FILENAME = 'authors.yaml'
+# Directory in the working directory, keeping the build state between runs
+STATE_DIRNAME = '.blogvi'
 DEEPL_API_KEY = ''
 
 SETTINGS_DEFAULTS = {
@@ -42,12 +44,32 @@ SETTINGS_DEFAULTS = {
     'google_translator': {},
     'deepl_translator': {},
     'claude_translator': {},
+    'pseudo_translator': {},
     'translation_list': [],
     'translate_articles': None,
+    # Maximum number of translation requests in flight, overall and per provider id.
+    # Providers without an entry fall back to their own `max_concurrency`.
+    'translation_concurrency': 8,
+    'translation_provider_concurrency': {},
+    'translation_provider_rate_limit': {},
+    'translation_max_retries': 5,
+    # SQLite translation memory, relative to the working directory. Set to false to disable.
+    'translation_memory': f'{STATE_DIRNAME}/translation_memory.sqlite3',
+    'translation_metrics': f'{STATE_DIRNAME}/translation_metrics.json',
+    'translation_metrics_prometheus': None,
+    # Worker processes rendering translated languages. Defaults to one per language, up to the CPU count
+    'render_workers': None,
     'show_language_picker': False,
     'source_language': {},
     'source_abbreviation': None,
     'favicons': [],
+    # Converted markdown, reused by any article with the same markdown. Size in megabytes
+    'fragment_cache': f'{STATE_DIRNAME}/fragments.sqlite3',
+    'fragment_cache_size': 256,
+    # What to do with files of previous builds, that the build no longer produces: report, delete or tombstone
+    'stale_outputs': 'report',
+    # Release article bodies as soon as their page is written
+    'low_memory': False,
     # Default Call to Action settings
     'call_to_action': {
         'enabled': False, # Disabled by default
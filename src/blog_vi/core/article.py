@@ -1,17 +1,95 @@
+import threading
 from datetime import datetime, timezone
-from functools import reduce
+from functools import cached_property, reduce
 from pathlib import Path
+from typing import Optional
 from urllib.parse import urljoin
 
-import markdown
-from markdown.extensions.tables import TableExtension
-from markdown.extensions.toc import TocExtension
-from jinja2 import FileSystemLoader, Environment
 from slugify import slugify
 
+from .fragments import MarkdownFragment, get_fragment_cache
+from .output import get_output
+from .templates import get_environment
 from .tracker import Tracker
 
-from .utils import get_md_file, ImgExtExtension, H1H2Extension
+from .utils import is_markdown_url
+
+
+_local = threading.local()
+
+
+def get_markdown_converter() -> 'markdown.Markdown':
+    """Return a Markdown converter, created once per thread and reset before each use."""
+    md = getattr(_local, 'markdown', None)
+
+    if md is None:
+        # Markdown is imported here, so builds without changed articles never load it.
+        import markdown
+        from markdown.extensions.tables import TableExtension
+        from markdown.extensions.toc import TocExtension
+
+        from .markdown_extensions import ImgExtExtension, H1H2Extension
+
+        md = markdown.Markdown(extensions=[
+            'markdown.extensions.extra',
+            # Revert permalink to True, will style with CSS
+            TocExtension(permalink=True, toc_depth='2-2'),
+            ImgExtExtension(),
+            H1H2Extension(),
+            TableExtension()
+        ])
+        _local.markdown = md
+
+    return md.reset()
+
+
+class ArticleCard:
+    """
+    A lightweight view of an article with just the fields used by landings, categories, feeds and search.
+    Built once per article, see `Article.card`.
+    """
+    __slots__ = ('title', 'slug', 'path', 'url', 'header_image', 'summary', 'author_name', 'author_email',
+                 'author_image', 'author_info', 'author_social', 'publish_date', 'timestamp', 'categories',
+                 'status', 'is_legacy', 'reading_time', 'previous', 'next')
+
+    # Fields exported into `data.json` for the search.
+    search_keys = ('title', 'author_name', 'author_email', 'author_info', 'author_image', 'author_social',
+                   'header_image', 'summary', 'publish_date', 'categories', 'status', 'path', 'slug', 'previous',
+                   'next')
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields[name])
+
+    @classmethod
+    def from_article(cls, article: 'Article') -> 'ArticleCard':
+        return cls(
+            title=article.title,
+            slug=article.slug,
+            path=article.path,
+            url=article.url,
+            header_image=article.header_image,
+            summary=article.summary,
+            author_name=article.author_name,
+            author_email=article.author_email,
+            author_image=article.author_image,
+            author_info=article.author_info,
+            author_social=article.author_social,
+            publish_date=article.publish_date,
+            timestamp=article.timestamp,
+            categories=tuple(article.categories),
+            status=article.status,
+            is_legacy=article.is_legacy,
+            reading_time=article.readingTime,
+            previous=article.previous,
+            next=article.next,
+        )
+
+    def to_dict(self) -> dict:
+        data = {key: getattr(self, key) for key in self.search_keys}
+        data['categories'] = list(self.categories)
+
+        return data
 
 
 class Article:
@@ -62,20 +140,46 @@ class Article:
 
         self.template = template or self.base_template
 
-        self.url = self.prepare_url()
-
         self.is_legacy = is_legacy
 
         self.toc_html = ""
+        # Sources of the images and texts of the h1 and h2 headings, filled on generation
+        self.images = []
+        self.headings = []
 
-        self.tracker = Tracker(self, ['title', 'markdown', 'summary', 'categories', 'is_legacy'], self._get_output_dir())
+        # Set once the article body has been dropped, see `release()`
+        self.released = False
+        # Articles with failed translations are rendered, but not cached, so the next build retries them.
+        self.cacheable = True
 
-    @property
-    def path(self):
-        output_dir = self._get_output_dir()
-        relative_path = output_dir.relative_to(self.settings.workdir)
+        # Built on the first access, once the article is generated. See `card`.
+        self._card = None
+
+        self.tracker = Tracker(self, ['title', 'markdown', 'summary', 'categories', 'is_legacy'], self.output_dir)
+
+    # Paths are pure computations on the slug and settings, so they are computed once and cached.
+    # Output directories are created in bulk right before writing, see `Landing.prepare_output_dirs()`.
+    @cached_property
+    def output_dir(self) -> Path:
+        return self.workdir.joinpath(self.slug)
+
+    @cached_property
+    def path(self) -> str:
+        relative_path = self.output_dir.relative_to(self.settings.workdir)
         return urljoin(self.settings.blog_root_path, str(relative_path))
 
+    @cached_property
+    def url(self) -> str:
+        return self.prepare_url()
+
+    @property
+    def card(self) -> ArticleCard:
+        """Return the card of the article, used by landings, feeds and search."""
+        if self._card is None:
+            self._card = ArticleCard.from_article(self)
+
+        return self._card
+
     @classmethod
     def from_config(cls, settings: 'Settings', landing, config: dict) -> 'Article':
         """Return a class instance from the given config."""
@@ -113,81 +217,97 @@ class Article:
             markdown=config['Markdown'],
         )
 
-    def generate(self):
-        """Generate an article."""
-        if not self.tracker.is_changed():
-            return
-
-        filepath = self._md_to_html()
+    def generate(self, force: bool = False) -> bool:
+        """
+        Generate an article, if it changed since the last build, its page is missing or it is `force`d.
+        Return whether it was written.
+        """
+        if not force and not self.tracker.is_changed() and self.output_dir.joinpath('index.html').exists():
+            return False
 
-        output_dir = self._get_output_dir()
-        path_to_article = output_dir.relative_to(self.workdir)
+        html = self._md_to_html()
 
-        directory_loader = FileSystemLoader([ self.workdir, self.templates_dir.resolve()])
-        env = Environment(loader=directory_loader)
+        env = get_environment(self.workdir, self.templates_dir.resolve())
         template = env.get_template(self.template)
         rendered = template.render(
-            content=str(Path(path_to_article, 'index.html')),
+            # Included by the template, straight from memory rather than from a file written aside.
+            content=env.from_string(html),
             article=self,
             settings=self.settings,
             landing=self.landing
         )
 
-        filepath.write_text(rendered)
+        get_output(self.settings).write(self.output_dir.joinpath('index.html'), rendered)
 
-    def _md_to_html(self) -> Path:
-        """Convert markdown content to the html one and return the path to resulting file."""
-        md = markdown.Markdown(extensions=[
-            'markdown.extensions.extra',
-            # Revert permalink to True, will style with CSS
-            TocExtension(permalink=True, toc_depth='2-2'),
-            ImgExtExtension(),
-            H1H2Extension(),
-            TableExtension()
-        ])
-        source = self.workdir.joinpath(f'{self.slug}.md')
+        return True
 
-        output_dir = self._get_output_dir()
-        output = output_dir.joinpath('index.html')
+    def release(self, keep_markdown: bool = False):
+        """Drop the article body once its page is written, keeping only the card metadata.
 
-        md_file = get_md_file(self.markdown, str(source))
+        :param keep_markdown: keep the markdown source, e.g. when it is still needed for translation
+        """
+        self.toc_html = ""
+        self.images = []
+        self.headings = []
+
+        if not keep_markdown:
+            self.markdown = None
+            self.released = True
+
+    def get_markdown_body(self) -> Optional[str]:
+        """
+        Return the markdown of the article.
+        Markdown given by a URL is fetched once per build and shared by the landing, see `MarkdownFetcher`.
+        """
+        if is_markdown_url(self.markdown):
+            return self.landing.markdown_fetcher.get(self.markdown)
+
+        return self.markdown
 
-        # Calculate word count and reading time from the fetched markdown file
-        try:
-            with open(md_file, 'r', encoding='utf-8') as f: # Specify encoding
-                content = f.read()
-            self.wordCount = len(content.split())
-            self.readingTime = max(1, round(self.wordCount / 200)) # Min 1 minute reading time
-        except Exception as e:
-            print(f"Warning: Could not calculate word count/reading time for {self.slug}: {e}")
-            # Keep defaults (0)
+    def convert_markdown(self, content: str) -> MarkdownFragment:
+        """Convert markdown, or take the result of an earlier conversion of the same markdown from the cache."""
+        cache = get_fragment_cache(self.settings)
 
+        fragment = cache.get(content) if cache is not None else None
+        if fragment is not None:
+            return fragment
+
+        md = get_markdown_converter()
         html_content = md.convert(content) # Convert content string instead of file to get TOC
-        self.toc_html = md.toc # Store the generated TOC
+        fragment = MarkdownFragment(
+            html_content,
+            md.toc,
+            images=md.images,
+            h1s=md.h1s,
+            h2s=md.h2s,
+            word_count=len(content.split())
+        )
 
-        # Write the HTML content to the output file
-        with open(output, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+        if cache is not None:
+            cache.set(content, fragment)
 
-        source.unlink()
+        return fragment
 
-        return output
+    def _md_to_html(self) -> str:
+        """Convert markdown content to the html one and return it."""
+        content = self.get_markdown_body()
+        fragment = self.convert_markdown(content)
 
-    def _get_publish_date(self) -> str:
-        return self.timestamp.strftime('%B %d, %Y')
+        # Calculate reading time from the word count of the fetched markdown
+        self.wordCount = fragment.word_count
+        self.readingTime = max(1, round(self.wordCount / 200)) # Min 1 minute reading time
 
-    def _get_output_dir(self) -> Path:
-        output_dir = self.workdir.joinpath(self.slug)
-        output_dir.mkdir(exist_ok=True, parents=True)
+        self.toc_html = fragment.toc # Store the generated TOC
+        self.images = fragment.images
+        self.headings = fragment.h1s + fragment.h2s
 
-        return output_dir
+        return fragment.html
 
-    def to_dict(self) -> dict:
-        keys = ('title', 'author_name', 'author_email', 'author_info', 'author_image', 'author_social', 'markdown',
-                'header_image', 'summary', 'publish_date', 'categories', 'status', 'path', 'slug', 'previous',
-                'next')
+    def _get_publish_date(self) -> str:
+        return self.timestamp.strftime('%B %d, %Y')
 
-        return {key: getattr(self, key) for key in keys}
+    def _get_output_dir(self) -> Path:
+        return self.output_dir
 
     def prepare_url(self):
         """
@@ -0,0 +1,609 @@
+"""
+The build of a blog as a graph of stages.
+
+A stage declares the stages it requires, the build inputs its output depends on and the files it writes.
+Stages run as soon as their requirements are done, independent ones concurrently. A stage is skipped,
+when the fingerprints of its inputs match the ones of its last complete run and its outputs are still on disk.
+Fingerprints and durations of the runs are kept in `.blogvi/stages.json`, see `StageCache`.
+"""
+import copy
+import hashlib
+import json
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, TYPE_CHECKING
+
+from blog_vi._config import STATE_DIRNAME
+from blog_vi._settings import Settings
+
+from .article import Article
+from .fragments import MARKDOWN_CONFIG_VERSION, PackageNotFoundError, get_markdown_version, version
+from .landing import Landing
+from .manifest import BuildManifest, collect_stale_outputs, save_changes, write_changes_archive
+from .output import get_output
+from .sources import get_articles_from_source
+from .utils import write_atomically
+
+if TYPE_CHECKING:
+    from blog_vi.core.translations.engine import TranslateEngine
+
+STAGES_FILENAME = 'stages.json'
+# Inputs of the stages writing pages: the CSV rows, the settings, the templates and the code rendering them.
+PAGE_INPUTS = ('source', 'settings', 'templates', 'version')
+# Settings of how the build runs, that do not change the pages, so are left out of the settings fingerprint.
+RUN_SETTINGS = ('low_memory', 'stale_outputs')
+
+
+_report_lock = threading.Lock()
+
+
+def report(message: str) -> None:
+    """
+    Print a message of the scheduler. Stages run concurrently, so the line is written in a single call,
+    rather than by `print()` writing the text and the line end apart, and the lines of two stages never mix.
+    """
+    with _report_lock:
+        sys.stdout.write(f'{message}\n')
+
+
+def get_fingerprint(value) -> str:
+    """Return a hash of a JSON-serializable value, encoded piece by piece, so large values are never held as JSON."""
+    digest = hashlib.sha256()
+    for chunk in json.JSONEncoder(sort_keys=True, default=str).iterencode(value):
+        digest.update(chunk.encode())
+    return digest.hexdigest()
+
+
+def get_templates_fingerprint(templates_dir: Path) -> str:
+    digest = hashlib.sha256()
+
+    for path in sorted(templates_dir.rglob('*')):
+        if path.is_file():
+            digest.update(str(path.relative_to(templates_dir)).encode())
+            digest.update(hashlib.sha256(path.read_bytes()).digest())
+
+    return digest.hexdigest()
+
+
+def get_version() -> str:
+    """Return versions of BlogVi and Markdown, so upgrades rebuild the pages."""
+    try:
+        blog_vi_version = version('blog-vi')
+    except PackageNotFoundError:
+        blog_vi_version = ''
+
+    return f'{blog_vi_version}|{get_markdown_version()}|{MARKDOWN_CONFIG_VERSION}'
+
+
+class BuildTarget:
+    """
+    Part of the blog regenerated by a partial build: articles given by slug or category, and languages.
+    An empty target regenerates the whole blog.
+    """
+
+    def __init__(self, slugs: Iterable[str] = (), categories: Iterable[str] = (), languages: Iterable[str] = ()):
+        self.slugs = set(slugs)
+        self.categories = set(categories)
+        self.languages = set(languages)
+
+    @property
+    def is_partial(self) -> bool:
+        return bool(self.slugs or self.categories or self.languages)
+
+    def includes_language(self, abbreviation: Optional[str]) -> bool:
+        return not self.languages or abbreviation in self.languages
+
+    def includes_source(self, settings: Settings) -> bool:
+        return self.includes_language((settings.source_language or {}).get('abbreviation'))
+
+    def get_slugs(self, landing: Landing) -> Optional[Set[str]]:
+        """
+        Return slugs of the targeted articles along with their neighbours, whose previous and next links change,
+        or None, if all articles are targeted.
+        """
+        if not self.slugs and not self.categories:
+            return None
+
+        articles = landing.get_articles()
+        for slug in sorted(self.slugs - {article.slug for article in articles}):
+            print(f'[-] Article {slug} is not published, skipped.')
+
+        slugs = {
+            article.slug for article in articles
+            if article.slug in self.slugs or self.categories.intersection(article.categories)
+        }
+
+        return slugs | landing.get_neighbours(slugs)
+
+
+class BuildContext:
+    """State shared by the stages of a build: the settings, fetched rows, the landing and the input fingerprints."""
+
+    def __init__(self, settings: Settings, resume: bool = False, batch: bool = False, poll_interval: float = 60,
+                 target: Optional[BuildTarget] = None, emit_tar: Optional[Path] = None):
+        self.settings = settings
+        self.target = target or BuildTarget()
+        # Archive the files changed by the build are written to, see `update_manifest()`.
+        self.emit_tar = emit_tar
+
+        # Options of the translation, see `translate()`.
+        self.resume = resume
+        self.batch = batch
+        self.poll_interval = poll_interval
+
+        # Filled by the `fetch` and `index` stages.
+        self.rows: Optional[list] = None
+        self.index: Optional[Landing] = None
+
+        # Stage name to the inputs changed since its last run, or None, if it has no recorded run. See `run_stage()`.
+        self.changed_inputs: Dict[str, Optional[List[str]]] = {}
+
+        # Files of the translated landings, and whether all languages were translated. See `translate()`.
+        self.translated_outputs: List[Path] = []
+        self.translations_complete = True
+
+        page_settings = {
+            name: value for name, value in json.loads(settings.to_json()).items() if name not in RUN_SETTINGS
+        }
+        self.inputs: Dict[str, str] = {
+            'settings': get_fingerprint(page_settings),
+            'templates': get_templates_fingerprint(settings.templates_dir),
+            'version': get_version(),
+        }
+
+    def set_input(self, name: str, value) -> None:
+        self.inputs[name] = get_fingerprint(value)
+
+    @property
+    def records_runs(self) -> bool:
+        """
+        Whether runs of the stages are recorded in the stage cache. Partial builds regenerate just a part
+        of the outputs, and builds into outputs other than the blog directory leave it as it is,
+        so both keep the records of the last full build of the directory.
+        """
+        return not self.target.is_partial and get_output(self.settings).in_workdir
+
+
+class Stage:
+    """A step of the build, run with the `BuildContext`."""
+
+    def __init__(self, name: str, run: Callable[[BuildContext], Optional[bool]], requires: Sequence[str] = (),
+                 inputs: Sequence[str] = (), outputs: Callable[[BuildContext], Iterable[Path]] = None,
+                 count: Callable[[BuildContext], int] = None):
+        """
+        :param run: runs the stage. Returning False marks the run incomplete, so the next build runs it again
+        :param requires: names of the stages, that must be done before this one
+        :param inputs: names of the inputs in `BuildContext.inputs` fingerprinting the stage.
+                       Stages without inputs run on every build
+        :param outputs: returns the files written by the stage. The stage runs again, if any of them is missing
+        :param count: returns the number of items processed by the run, recorded along with its duration
+        """
+        self.name = name
+        self.run = run
+        self.requires = tuple(requires)
+        self.inputs = tuple(inputs)
+        self.outputs = outputs
+        self.count = count
+
+    def get_inputs(self, context: BuildContext) -> Dict[str, str]:
+        return {name: context.inputs[name] for name in self.inputs}
+
+    def get_missing_outputs(self, context: BuildContext) -> List[Path]:
+        if self.outputs is None:
+            return []
+
+        return [path for path in self.outputs(context) if not path.exists()]
+
+    def get_changed_inputs(self, context: BuildContext, cache: 'StageCache') -> Optional[List[str]]:
+        """Return names of the inputs changed since the last run of the stage, or None, if it has no recorded run."""
+        run = cache.get(self.name)
+        if run is None:
+            return None
+
+        inputs = self.get_inputs(context)
+
+        return [name for name in self.inputs if run['inputs'].get(name) != inputs[name]]
+
+    def get_reason(self, context: BuildContext, cache: 'StageCache') -> Optional[str]:
+        """Return why the stage has to run, or None, if it is up to date."""
+        if not self.inputs:
+            return 'runs on every build'
+
+        changed = self.get_changed_inputs(context, cache)
+        if changed is None:
+            return 'not built yet'
+
+        if changed:
+            return f'changed {", ".join(changed)}'
+
+        missing = self.get_missing_outputs(context)
+        if missing:
+            return f'{len(missing)} missing outputs'
+
+        return None
+
+    def __repr__(self):
+        return f'Stage({self.name!r})'
+
+
+class StageCache:
+    """
+    The last complete run of each stage, kept in `.blogvi/stages.json`:
+    fingerprints of its inputs, its duration in seconds and the number of items it processed.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+
+        self._lock = threading.Lock()
+        self._runs: Dict[str, dict] = self.load()
+
+    @classmethod
+    def for_settings(cls, settings: Settings) -> 'StageCache':
+        return cls(Path(settings.workdir, STATE_DIRNAME, STAGES_FILENAME))
+
+    def load(self) -> Dict[str, dict]:
+        try:
+            with open(self.path, encoding='utf-8') as fp:
+                runs = json.load(fp)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+        # Runs recorded as bare fingerprints, by earlier versions, are run again.
+        return {name: run for name, run in runs.items() if isinstance(run, dict)}
+
+    def get(self, name: str) -> Optional[dict]:
+        with self._lock:
+            return self._runs.get(name)
+
+    def set(self, name: str, run: Optional[dict]) -> None:
+        with self._lock:
+            if run is None:
+                self._runs.pop(name, None)
+            else:
+                self._runs[name] = run
+
+    def save(self) -> None:
+        with self._lock:
+            write_atomically(self.path, json.dumps(self._runs, indent=2, sort_keys=True))
+
+
+class BuildGraph:
+    """Stages of a build and the scheduler running them."""
+    # Maximum number of stages running at once, all the ready ones by default. 1 runs them one by one, e.g. to profile.
+    max_workers: Optional[int] = None
+
+    def __init__(self, stages: Sequence[Stage]):
+        self.stages: Dict[str, Stage] = {stage.name: stage for stage in stages}
+
+        for stage in stages:
+            for name in stage.requires:
+                if name not in self.stages:
+                    raise ValueError(f'Stage {stage.name} requires an unknown stage {name}.')
+
+        self.order = self.sort()
+
+    def sort(self) -> List[str]:
+        """Return names of the stages in a topological order."""
+        order, visiting = [], set()
+
+        def visit(name):
+            if name in order:
+                return
+            if name in visiting:
+                raise ValueError(f'Stage {name} depends on itself.')
+
+            visiting.add(name)
+            for required in self.stages[name].requires:
+                visit(required)
+            visiting.discard(name)
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+
+        return order
+
+    def select(self, names: Iterable[str]) -> List[str]:
+        """Return the given stages along with all the stages they require, in a topological order."""
+        selected = set()
+
+        def add(name):
+            if name not in self.stages:
+                raise ValueError(f'Unknown stage {name}.')
+
+            if name not in selected:
+                selected.add(name)
+                for required in self.stages[name].requires:
+                    add(required)
+
+        for name in names:
+            add(name)
+
+        return [name for name in self.order if name in selected]
+
+    def run(self, context: BuildContext, names: Optional[Sequence[str]] = None, force: bool = False) -> None:
+        """
+        Run the given stages and the ones they require, or all stages.
+        Stages named explicitly always run, the ones they require are skipped, when up to date, unless `force`d.
+        """
+        selected = self.select(names or self.order)
+        forced = set(selected if force else names or ())
+        cache = StageCache.for_settings(context.settings)
+
+        pending, done, running = list(selected), set(), {}
+        error = None
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers or len(selected),
+                                    thread_name_prefix='blogvi-stage') as executor:
+                while pending or running:
+                    # Stages are not started after a failure, the running ones are waited for.
+                    ready = [] if error else [
+                        name for name in pending if all(required in done for required in self.stages[name].requires)
+                    ]
+                    for name in ready:
+                        pending.remove(name)
+                        future = executor.submit(self.run_stage, self.stages[name], context, cache, name in forced)
+                        running[future] = name
+
+                    if not running:
+                        break
+
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        name = running.pop(future)
+                        try:
+                            future.result()
+                        except BaseException as e:
+                            report(f'[-] Stage {name} failed. Error - {e!r}')
+                            error = error or e
+                        else:
+                            done.add(name)
+        finally:
+            cache.save()
+
+        if error is not None:
+            raise error
+
+    @staticmethod
+    def run_stage(stage: Stage, context: BuildContext, cache: StageCache, forced: bool = False) -> None:
+        if not forced and stage.get_reason(context, cache) is None:
+            report(f'[+] Stage {stage.name} is up to date, skipped.')
+            return
+
+        context.changed_inputs[stage.name] = stage.get_changed_inputs(context, cache)
+
+        if context.records_runs:
+            # Forget the previous run, so an interrupted one is not taken as complete.
+            cache.set(stage.name, None)
+
+        started_at = time.perf_counter()
+        complete = stage.run(context) is not False
+        duration = time.perf_counter() - started_at
+
+        if complete and context.records_runs:
+            cache.set(stage.name, {
+                'inputs': stage.get_inputs(context),
+                'duration': round(duration, 3),
+                'items': stage.count(context) if stage.count else None,
+            })
+
+        report(f'[+] Stage {stage.name} finished in {duration:.2f}s.')
+
+
+def build_index(settings: Settings, articles: list) -> Landing:
+    """Build the main landing and its articles from the fetched CSV rows."""
+    index = Landing.from_settings(settings)
+    articles_added = 0
+
+    for cnt, article in enumerate(articles):
+        if article['Status'] != '1':
+            continue
+
+        article['Title'] = article.get('Title') or f'blog-{cnt}'
+
+        if article['Legacy Slugs'] != '':
+            article_obj = Article.from_config(settings, index, article)
+            redirect_slug = article_obj.slug
+            index.add_article(article_obj)
+            legacy_slugs = article['Legacy Slugs'].split(';')
+            for slug in legacy_slugs:
+                legacy_article = copy.deepcopy(article)
+                legacy_article['Slug'] = slug
+                legacy_article['Is Legacy'] = True
+                legacy_article['Redirect Slug'] = redirect_slug
+                article_obj = Article.from_config(settings, index, legacy_article)
+                index.add_article(article_obj)
+
+        else:
+            article_obj = Article.from_config(settings, index, article)
+            index.add_article(article_obj)
+        articles_added += 1
+
+    print(f"[DEBUG] Added {articles_added} articles with Status '1' to index.")
+
+    return index
+
+
+def fetch_articles(context: BuildContext) -> None:
+    settings = context.settings
+    context.rows = get_articles_from_source(settings.blog_post_location_url, settings.workdir)
+    if not context.rows:
+        # A source, that failed to load, gives no rows, which must not replace the pages of the blog with empty ones.
+        print(f'[-] No articles fetched from {settings.blog_post_location_url}, the blog is left as it is.')
+        sys.exit(1)
+
+    context.set_input('source', context.rows)
+    print(f"[DEBUG] Fetched {len(context.rows)} articles from CSV.")
+
+
+def build_landing(context: BuildContext) -> None:
+    context.index = build_index(context.settings, context.rows)
+    context.index.prepare()
+    context.index.partial_slugs = context.target.get_slugs(context.index)
+    # Do not keep the raw CSV rows alive for the rest of the build.
+    context.rows = None
+
+
+def translate(context: BuildContext) -> None:
+    settings = context.settings
+    languages = [
+        translation['abbreviation'] for translation in settings.translation_list
+        if context.target.includes_language(translation['abbreviation'])
+    ]
+    if not settings.translate_articles or not languages:
+        if context.batch:
+            print('[-] Nothing to translate in batch, translations are disabled or no language is selected.')
+            sys.exit(1)
+        return
+
+    # Imported here, so builds without translations do not pay for the engine.
+    from blog_vi.core.translations.engine import TranslateEngine
+    from blog_vi.core.translations.exceptions import (
+        ProviderSettingsNotFound, TranslateEngineNotFound, BadProviderSettingsError
+    )
+
+    try:
+        if settings.source_language is None:
+            print('[-] Please, provide a source language abbreviation.')
+            sys.exit(1)
+        engine = TranslateEngine(context.index, settings.source_language['abbreviation'], resume=context.resume,
+                                 languages=languages)
+    except ProviderSettingsNotFound:
+        print(f'[-] Settings not found for translate provider {settings.translator}')
+    except TranslateEngineNotFound:
+        print('[-] Translate engine not found')
+    except BadProviderSettingsError:
+        print(f'[-] Please, fill all {settings.translator} provider settings')
+    except TypeError:
+        print('[-] Please define translator provider in settings')
+    else:
+        if context.batch:
+            translate_in_batch(engine, context.poll_interval)
+
+        engine.translate()
+
+        context.translated_outputs = engine.outputs
+        context.translations_complete = engine.complete
+        return
+
+    context.translations_complete = False
+
+
+def translate_in_batch(engine: 'TranslateEngine', poll_interval: float) -> None:
+    """Fill the translation memory with a batch job. Whatever it fails to translate, the build translates."""
+    from blog_vi.core.translations.batch import BatchTranslationJob
+    from blog_vi.core.translations.exceptions import TranslateError
+
+    try:
+        BatchTranslationJob(engine, poll_interval=poll_interval).run()
+    except TranslateError as e:
+        print(f'[-] {e} Translating interactively.')
+
+
+def update_manifest(context: BuildContext) -> None:
+    """
+    Record the files of the build in the manifest, collect the files of previous builds, it did not produce,
+    and list the files changed since the previous build.
+    """
+    settings = context.settings
+    if not get_output(settings).in_workdir:
+        # The manifest lists the files of the blog directory, that builds into other outputs leave as they are.
+        return
+
+    previous = BuildManifest.load(settings.workdir)
+    manifest = BuildManifest(settings.workdir)
+    manifest.add(context.index.get_outputs(), previous)
+    manifest.add(context.translated_outputs, previous)
+
+    stale = manifest.get_stale(previous)
+    # A blog with no published articles, e.g. unpublished by mistake, must not take the pages of the blog along.
+    if context.target.is_partial or not context.translations_complete or not context.index.get_articles():
+        # Files of the parts, that were not built, are not known, so nothing is collected.
+        manifest.keep(previous, stale)
+    else:
+        collect_stale_outputs(settings, stale, settings.stale_outputs)
+
+        if settings.stale_outputs == 'report':
+            # Reported files are kept in the manifest, until they are deleted.
+            manifest.keep(previous, stale)
+
+    changes = manifest.get_changes(previous)
+    changes_path = save_changes(settings, changes)
+    if context.emit_tar:
+        write_changes_archive(settings.workdir, changes, changes_path, context.emit_tar)
+
+    # Saved last, so the changes are listed again by the next build, if writing the archive failed.
+    manifest.save()
+
+
+def source_stage(generate: Callable[[Landing], Optional[bool]]) -> Callable[[BuildContext], bool]:
+    """
+    Return a stage running `generate` with the main landing, unless a partial build excludes the source language.
+    """
+    def run(context: BuildContext) -> bool:
+        if not context.target.includes_source(context.settings):
+            return False
+
+        return generate(context.index) is not False
+
+    return run
+
+
+def regenerates_articles(changed_inputs: Optional[Sequence[str]]) -> bool:
+    """
+    Return whether pages of unchanged articles are written again, given the inputs changed since the last run
+    of the articles stage. Changed rows are found by the article caches, but the templates, settings and code
+    render every page.
+    """
+    return changed_inputs is None or bool(set(changed_inputs) - {'source'})
+
+
+def generate_articles(context: BuildContext) -> bool:
+    context.index.regenerate_articles = regenerates_articles(context.changed_inputs.get('articles'))
+
+    return source_stage(Landing.generate_articles)(context)
+
+
+def get_article_outputs(context: BuildContext) -> List[Path]:
+    outputs = []
+    for article in context.index.get_articles():
+        # Deleting the cache files of the articles forces them to be generated again.
+        outputs.extend((article.output_dir / 'index.html', article.output_dir / article.tracker.output_filename))
+
+    return outputs
+
+
+BLOG_STAGES = (
+    Stage('fetch', fetch_articles),
+    Stage('index', build_landing, requires=('fetch',)),
+    Stage('articles', generate_articles, requires=('index',), inputs=PAGE_INPUTS,
+          outputs=get_article_outputs, count=lambda context: context.index.generated_articles),
+    # Cards on the landing, categories, search and feeds carry the reading time, known once articles are generated.
+    Stage('landing', source_stage(Landing.generate_page), requires=('articles',), inputs=PAGE_INPUTS,
+          outputs=lambda context: [context.index.workdir / 'index.html']),
+    Stage('categories', source_stage(Landing.generate_category_pages), requires=('articles',),
+          inputs=PAGE_INPUTS,
+          outputs=lambda context: [
+              landing.workdir / 'index.html' for landing in context.index.get_categories().values()
+          ]),
+    Stage('search', source_stage(Landing.generate_search_index), requires=('articles',),
+          inputs=PAGE_INPUTS, outputs=lambda context: [context.index.workdir / 'data.json']),
+    Stage('rss', source_stage(Landing.generate_rss), requires=('articles',), inputs=PAGE_INPUTS,
+          outputs=lambda context: [context.index.workdir / 'rss.xml']),
+    # Translations keep their own caches per article and language, so the stage always runs.
+    Stage('translate', translate, requires=('index',)),
+    # Caches of the source articles tell the translations which articles changed,
+    # so they are not saved by partial builds leaving out the source language.
+    Stage('cache', source_stage(Landing.cache_changes), requires=('articles', 'translate')),
+    Stage('manifest', update_manifest, requires=('landing', 'categories', 'search', 'rss', 'cache')),
+)
+STAGE_NAMES = tuple(stage.name for stage in BLOG_STAGES)
+
+
+def get_build_graph() -> BuildGraph:
+    return BuildGraph(BLOG_STAGES)
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+# Bump, when the Markdown extensions or their configuration change, see `get_markdown_converter()`.
+MARKDOWN_CONFIG_VERSION = '1'
+
+
+def get_markdown_version() -> str:
+    # Read from the package metadata, so cache hits do not import Markdown.
+    try:
+        return version('markdown')
+    except PackageNotFoundError:
+        return ''
+
+
+class MarkdownFragment:
+    """The result of a Markdown conversion: HTML, table of contents, images, headings and word count."""
+    __slots__ = ('html', 'toc', 'images', 'h1s', 'h2s', 'word_count')
+
+    def __init__(self, html: str, toc: str, images: List[str], h1s: List[str], h2s: List[str], word_count: int):
+        self.html = html
+        self.toc = toc
+        self.images = images
+        self.h1s = h1s
+        self.h2s = h2s
+        self.word_count = word_count
+
+    def to_bytes(self) -> bytes:
+        return zlib.compress(json.dumps({name: getattr(self, name) for name in self.__slots__}).encode(), 6)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'MarkdownFragment':
+        return cls(**json.loads(zlib.decompress(data)))
+
+
+class FragmentCache:
+    """
+    Persistent, content-addressed cache of Markdown conversions, backed by SQLite.
+
+    Fragments are keyed by the hash of the markdown, the Markdown version and `MARKDOWN_CONFIG_VERSION`,
+    stored zlib-compressed, and evicted least recently used first, once they exceed `max_size` bytes.
+    The file is shared by the threads and the processes of a build.
+    """
+    schema = '''
+        CREATE TABLE IF NOT EXISTS fragments (
+            key TEXT PRIMARY KEY,
+            data BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            accessed_at REAL NOT NULL
+        )
+    '''
+    # Eviction runs every `eviction_interval` stored fragments, and frees a tenth of `max_size`.
+    eviction_interval = 100
+
+    def __init__(self, path: Union[str, Path], max_size: int):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._version = f'{get_markdown_version()}|{MARKDOWN_CONFIG_VERSION}'
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None, timeout=30)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute(self.schema)
+        self._connection.execute('CREATE INDEX IF NOT EXISTS fragments_accessed_at ON fragments (accessed_at)')
+
+    def get_key(self, markdown: str) -> str:
+        return hashlib.sha256(f'{self._version}\n{markdown}'.encode()).hexdigest()
+
+    def get(self, markdown: str) -> Optional[MarkdownFragment]:
+        key = self.get_key(markdown)
+
+        with self._lock:
+            row = self._connection.execute('SELECT data FROM fragments WHERE key = ?', (key,)).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._connection.execute('UPDATE fragments SET accessed_at = ? WHERE key = ?', (time.time(), key))
+
+        return MarkdownFragment.from_bytes(row[0])
+
+    def set(self, markdown: str, fragment: MarkdownFragment) -> None:
+        data = fragment.to_bytes()
+
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO fragments VALUES (?, ?, ?, ?)',
+                (self.get_key(markdown), data, len(data), time.time())
+            )
+
+            self._writes += 1
+            if self._writes % self.eviction_interval == 1:
+                self._evict()
+
+    def _evict(self) -> None:
+        size = self._connection.execute('SELECT COALESCE(SUM(size), 0) FROM fragments').fetchone()[0]
+        if size <= self.max_size:
+            return
+
+        excess = size - self.max_size * 0.9
+        freed = 0
+        keys = []
+
+        for key, fragment_size in self._connection.execute('SELECT key, size FROM fragments ORDER BY accessed_at'):
+            if freed >= excess:
+                break
+
+            keys.append((key,))
+            freed += fragment_size
+
+        self._connection.executemany('DELETE FROM fragments WHERE key = ?', keys)
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries, size = self._connection.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM fragments'
+            ).fetchone()
+
+        return {'entries': entries, 'size': size, 'hits': self.hits, 'misses': self.misses}
+
+
+_caches: Dict[Path, FragmentCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_fragment_cache(settings: 'Settings') -> Optional[FragmentCache]:
+    """
+    Return the fragment cache configured in the settings, or None, if it is disabled.
+    Caches are opened once per process, so all builds using the same file share it.
+    """
+    if not settings.fragment_cache:
+        return None
+
+    path = Path(settings.workdir, settings.fragment_cache).resolve()
+
+    with _caches_lock:
+        if path not in _caches:
+            _caches[path] = FragmentCache(path, max_size=settings.fragment_cache_size * 1024 * 1024)
+
+        return _caches[path]
@@ -2,14 +2,15 @@ import json
 import mimetypes
 from itertools import zip_longest
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Iterable, Optional, Set
 from urllib.parse import urljoin
 
-from feedgen.feed import FeedGenerator
-from jinja2 import FileSystemLoader, Environment
 from slugify import slugify
 
-from .article import Article
+from .article import Article, ArticleCard
+from .output import get_output
+from .templates import get_environment
+from .utils import MarkdownFetcher
 
 
 class BaseLanding:
@@ -43,6 +44,18 @@ class BaseLanding:
         # List of categories. Filled from the articles categories automatically.
         self._categories: Dict[str, ''] = {}
 
+        # Number of article pages written by `generate_articles()`.
+        self.generated_articles = 0
+
+        # Slugs of the articles regenerated by a partial build, along with their neighbours.
+        # Pages of the other articles, categories and their caches are left as they are.
+        self.partial_slugs: Optional[Set[str]] = None
+        # Whether pages of unchanged articles are written as well, e.g. after the templates changed.
+        self.regenerate_articles = False
+
+        # Markdown of articles given by URLs, fetched once per build. See `Article.get_markdown_body()`.
+        self.markdown_fetcher = MarkdownFetcher(on_disk=settings.low_memory)
+
     @property
     def path(self):
         """Return a path to this landing."""
@@ -77,6 +90,28 @@ class BaseLanding:
     def get_articles(self) -> List['Article']:
         return self._articles.copy()
 
+    def get_categories(self) -> Dict[str, 'Landing']:
+        return self._categories.copy()
+
+    def get_partial_articles(self) -> List['Article']:
+        """Return articles regenerated by the build: all of them, or the ones of a partial build."""
+        if self.partial_slugs is None:
+            return self.get_articles()
+
+        return [article for article in self._articles if article.slug in self.partial_slugs]
+
+    def get_neighbours(self, slugs: Iterable[str]) -> Set[str]:
+        """Return slugs of the articles linking to the given ones as their previous or next article."""
+        links = {f'../{slug}' for slug in slugs}
+
+        return {
+            article.slug for article in self._articles
+            if article.previous.get('link') in links or article.next.get('link') in links
+        }
+
+    def get_cards(self) -> List['ArticleCard']:
+        return [article.card for article in self._articles]
+
     def add_article(self, article: 'Article'):
         """Validate and add an article to the list of articles."""
         self._articles.append(article)
@@ -91,31 +126,42 @@ class BaseLanding:
         """Generate the landing page and its contents, such as articles and categories."""
         self.pre_generate_hook()
 
-        rendered = self.render_template()
-
-        filepath = self.workdir.joinpath(filename)
-        filepath.write_text(rendered)
+        self.generate_page(filename)
 
         self.post_generate_hook()
 
-    def render_template(self):
-        directory_loader = FileSystemLoader(self.templates_dir.resolve())
-        env = Environment(loader=directory_loader)
+    def generate_page(self, filename: str = 'index.html'):
+        """Write the landing page alone. Cards of the articles must be final, i.e. the articles generated."""
+        output = get_output(self.settings)
+        output.make_dirs([self.workdir])
+
+        # Stream the template straight to the output instead of building the whole page in memory
+        output.write(self.workdir.joinpath(filename), self.stream_template())
 
-        template = env.get_template(self.template)
+    def get_template(self):
+        return get_environment(self.templates_dir.resolve()).get_template(self.template)
 
+    def get_template_context(self) -> dict:
         # Apply max_length to slugify here as well for consistency
         categories = {(category, f'{slugify(category, max_length=100)}/') for category in self._categories.keys()}
-        head_article = self._articles[0] if self._articles else None
+        cards = self.get_cards()
+        head_article = cards[0] if cards else None
 
-        return template.render(
-            articles=self._articles[1:],
-            head_article=head_article,
-            categories=categories,
-            searchConfig=self.search_config,
-            settings=self.settings,
-            blog=self
-        )
+        return {
+            'articles': cards[1:],
+            'head_article': head_article,
+            'categories': categories,
+            'searchConfig': self.search_config,
+            'settings': self.settings,
+            'blog': self
+        }
+
+    def render_template(self) -> str:
+        return self.get_template().render(**self.get_template_context())
+
+    def stream_template(self):
+        """Return an iterator over the rendered chunks of the landing template."""
+        return self.get_template().generate(**self.get_template_context())
 
     @staticmethod
     def prepare_search_config(search_config) -> dict:
@@ -126,10 +172,18 @@ class BaseLanding:
             ]
         }
 
+    def get_outputs(self) -> List[Path]:
+        """Return files of the landing, whether written by this build or kept from the previous one."""
+        return [self.workdir.joinpath('index.html')]
+
     def cache_changes(self):
         """Create cache files for articles."""
-        for article in self.get_articles():
-            article.tracker.save_changes()
+        for article in self.get_partial_articles():
+            # Released articles have saved their cache right after generation.
+            if article.released or not article.cacheable:
+                continue
+
+            article.tracker.save_changes(get_output(self.settings))
 
 
 class Landing(BaseLanding):
@@ -138,6 +192,8 @@ class Landing(BaseLanding):
         return self.path
 
     def generate_rss(self):
+        from feedgen.feed import FeedGenerator
+
         domain = self.settings.domain_url
         blog_path = self.settings.blog_root_path
         fg = FeedGenerator()
@@ -148,7 +204,13 @@ class Landing(BaseLanding):
         fg.subtitle(self.name)
         fg.language('en')
 
-        for article in self._articles:
+        cards = self.get_cards()
+        if cards:
+            # Stamped with the newest article rather than the time of the build,
+            # so the feed changes only with the articles and deploys do not purge it on every build.
+            fg.lastBuildDate(max(article.timestamp for article in cards))
+
+        for article in cards:
             fe = fg.add_entry(order='append')
 
             fe.id(article.url)
@@ -160,10 +222,37 @@ class Landing(BaseLanding):
             fe.enclosure(url=article.header_image, type=mimetypes.guess_type(article.header_image)[0] or '')
             fe.published(article.timestamp)
 
-        fg.rss_file(str(self.workdir / 'rss.xml'))
+        get_output(self.settings).write(self.workdir / 'rss.xml', fg.rss_str())
+
+    def get_outputs(self) -> List[Path]:
+        # Categories are grouped here as well, as landings rendered by worker processes are not prepared.
+        categories = self._categories or self.generate_categories()
+
+        outputs = super().get_outputs() + [self.workdir.joinpath('data.json'), self.workdir.joinpath('rss.xml')]
+        for article in self._articles:
+            outputs += [article.output_dir / 'index.html', article.output_dir / article.tracker.output_filename]
+        for landing in categories.values():
+            outputs += landing.get_outputs()
+
+        return outputs
 
-    def generate_articles(self) -> List['Article']:
-        """A hook returning pregenerated articles, that are ready to be generated."""
+    def generate_search_index(self):
+        """Dump the article cards into `data.json`, used for search."""
+        # The markdown body is exported only when the search is configured to look into it.
+        with_markdown = 'markdown' in self.settings.search_config
+
+        records = []
+        for article in self._articles:
+            record = article.card.to_dict()
+            if with_markdown:
+                # Fetched, if the markdown is given by a URL. Kept by released articles, see `release_article()`.
+                record['markdown'] = article.get_markdown_body()
+            records.append(record)
+
+        get_output(self.settings).write(self.workdir.joinpath('data.json'), json.dumps(records))
+
+    def link_articles(self) -> List['Article']:
+        """Link published articles to their neighbours and return them in chronological order."""
         articles_to_generate = list(filter(lambda art: art.status == 1, self._articles))
         for current, next in zip_longest(
                 articles_to_generate, articles_to_generate[1:], fillvalue=None
@@ -179,15 +268,59 @@ class Landing(BaseLanding):
                     'title': next.title
                 }
 
-        for article in articles_to_generate:
+        # Order articles in chronological order
+        return sorted(articles_to_generate, key=lambda i: i.timestamp, reverse=True)
+
+    def prepare(self):
+        """Link and order the articles and group them into categories, before anything is written."""
+        self._articles = self.link_articles()
+        self._categories = self.generate_categories()
+
+    def generate_articles(self) -> bool:
+        """
+        Write pages of the linked articles, that changed since the last build.
+        Pages of a partial build are written, even if unchanged, e.g. with new links to their neighbours,
+        and so are all pages written to an output other than the blog directory, or with `regenerate_articles`.
+        Return whether all of them were generated.
+        """
+        articles = self.get_partial_articles()
+        self.prepare_output_dirs(articles)
+
+        force = self.regenerate_articles or self.partial_slugs is not None or not get_output(self.settings).in_workdir
+        complete = True
+        for article in articles:
             try:
-                article.generate()
+                if article.generate(force=force):
+                    self.generated_articles += 1
             except Exception as e:
                 print(f'[!] Error generating article {article.title}: {e}')
+                # Not cached, so the next build generates it again.
+                article.cacheable = False
+                complete = False
                 continue
 
-        # Order articles in chronological order
-        return sorted(articles_to_generate, key=lambda i: i.timestamp, reverse=True)
+            if self.settings.low_memory:
+                self.release_article(article)
+
+        return complete
+
+    def prepare_output_dirs(self, articles: List['Article']):
+        """Create output directories of the given articles at once, right before they are written."""
+        get_output(self.settings).make_dirs(article.output_dir for article in articles)
+
+    def release_article(self, article: 'Article'):
+        """
+        Drop the body of an already generated article in the low memory mode.
+        The translation engine and the search index still need the markdown,
+        so it is kept when translating, or when the search looks into it.
+        """
+        if self.settings.translate_articles or 'markdown' in self.settings.search_config:
+            article.release(keep_markdown=True)
+            return
+
+        # The cache must be written before the markdown it tracks is gone.
+        article.tracker.save_changes(get_output(self.settings))
+        article.release()
 
     def generate_categories(self) -> Dict[str, 'Landing']:
         """A hook returning pregenerated categories, that are ready to be generated."""
@@ -198,7 +331,6 @@ class Landing(BaseLanding):
                 # Apply max_length to slugify to prevent OS errors
                 category_slug = slugify(category, max_length=100)
                 workdir = Path(self.workdir, category_slug)
-                workdir.mkdir(exist_ok=True)
                 if not category:
                     continue
                 category_landing = category_landings.get(category,
@@ -210,19 +342,23 @@ class Landing(BaseLanding):
 
         return category_landings
 
-    def pre_generate_hook(self):
-        Path(self.workdir, 'articles').mkdir(exist_ok=True)
+    def generate_category_pages(self):
+        # A partial build regenerates just the categories of its articles.
+        categories = {category for article in self.get_partial_articles() for category in article.categories}
+
+        for category, landing in self._categories.items():
+            if category in categories:
+                landing.generate('index.html')
 
+    def pre_generate_hook(self):
         # Generate categories only for the main landing page.
-        self._articles = self.generate_articles()
-        self._categories = self.generate_categories()
+        self.prepare()
+        self.generate_articles()
 
     def post_generate_hook(self):
-        for category, landing in self._categories.items():
-            landing.generate('index.html')
+        self.generate_category_pages()
 
-        # Used for search
-        json.dump([article.to_dict() for article in self._articles], self.workdir.joinpath('data.json').open('w'))
+        self.generate_search_index()
 
         self.generate_rss()
 
@@ -0,0 +1,202 @@
+"""
+Manifest of the files produced by a build, kept in `.blogvi/manifest.json`.
+
+Files listed by the manifest of the previous build, that the current build no longer produces, are stale,
+e.g. pages of unpublished or renamed articles and of removed categories. They are reported, deleted,
+or deleted and added to a tombstone list, so a deploy step can purge their URLs from a CDN.
+Files the manifests never listed are never touched.
+
+Each file is listed with its content hash, size and content type. Files added, changed or removed since the
+previous build are written to `.blogvi/changes.json`, so a deploy step uploads and purges just those.
+"""
+import hashlib
+import json
+import mimetypes
+import tarfile
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from blog_vi._config import STATE_DIRNAME
+
+from .utils import write_atomically
+
+MANIFEST_FILENAME = 'manifest.json'
+TOMBSTONES_FILENAME = 'tombstones.json'
+CHANGES_FILENAME = 'changes.json'
+# What to do with stale files: list them, delete them, or delete them and append them to the tombstones.
+STALE_OUTPUT_MODES = ('report', 'delete', 'tombstone')
+
+
+def get_file_entry(path: Path, previous: Optional[dict] = None) -> dict:
+    """
+    Return the hash, size and content type of a file.
+    The hash of the previous entry is reused, when the size and modification time of the file did not change.
+    """
+    stat = path.stat()
+    if previous and previous.get('size') == stat.st_size and previous.get('mtime') == stat.st_mtime_ns:
+        return previous
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(1 << 16), b''):
+            digest.update(chunk)
+
+    return {
+        'hash': digest.hexdigest(),
+        'size': stat.st_size,
+        'type': mimetypes.guess_type(path.name)[0] or 'application/octet-stream',
+        'mtime': stat.st_mtime_ns,
+    }
+
+
+class BuildManifest:
+    """Files produced by a build, relative to the blog directory, with their hash, size and content type."""
+
+    def __init__(self, workdir: Path, files: Optional[Dict[str, dict]] = None):
+        self.workdir = workdir
+        self.path = Path(workdir, STATE_DIRNAME, MANIFEST_FILENAME)
+
+        self.files: Dict[str, dict] = dict(files or {})
+
+    @classmethod
+    def load(cls, workdir: Path) -> 'BuildManifest':
+        """Return the manifest of the previous build, empty if there is none."""
+        manifest = cls(workdir)
+
+        try:
+            with open(manifest.path, encoding='utf-8') as fp:
+                files = json.load(fp)['files']
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return manifest
+
+        # Manifests of earlier versions list just the paths.
+        manifest.files = files if isinstance(files, dict) else dict.fromkeys(files, {})
+
+        return manifest
+
+    def save(self) -> None:
+        write_atomically(self.path, json.dumps({'files': dict(sorted(self.files.items()))}, indent=2))
+
+    def add(self, paths: Iterable[Path], previous: Optional['BuildManifest'] = None) -> None:
+        """
+        Add the files, that exist, given by paths in the blog directory, like the ones of the landings.
+        Hashes of files, that did not change since the `previous` manifest, are reused.
+        """
+        for path in paths:
+            if path.is_file():
+                name = path.relative_to(self.workdir).as_posix()
+                self.files[name] = get_file_entry(path, previous.files.get(name) if previous else None)
+
+    def keep(self, previous: 'BuildManifest', names: Iterable[str]) -> None:
+        """Keep files of the previous manifest, that this build did not produce."""
+        for name in names:
+            self.files[name] = previous.files[name]
+
+    def get_stale(self, previous: 'BuildManifest') -> List[str]:
+        """Return files of the previous build, that this one did not produce."""
+        return sorted(previous.files.keys() - self.files.keys())
+
+    def get_changes(self, previous: 'BuildManifest') -> Dict[str, List[str]]:
+        """Return files added, changed and removed since the previous build."""
+        return {
+            'added': sorted(self.files.keys() - previous.files.keys()),
+            'changed': sorted(
+                name for name in self.files.keys() & previous.files.keys()
+                if self.files[name].get('hash') != previous.files[name].get('hash')
+            ),
+            'removed': sorted(previous.files.keys() - self.files.keys()),
+        }
+
+
+def get_output_url(settings: 'Settings', path: str) -> str:
+    """Return the public URL of an output file. Pages are served by their directory."""
+    if path == 'index.html' or path.endswith('/index.html'):
+        path = path[:-len('index.html')]
+
+    return f'{settings.domain_url.rstrip("/")}{settings.blog_root_path}{path}'
+
+
+def remove_output(workdir: Path, path: str) -> None:
+    """Delete an output file and its parent directories, as long as they are empty."""
+    filepath = Path(workdir, path)
+    if filepath.exists():
+        filepath.unlink()
+
+    directory = filepath.parent
+    while directory != workdir and workdir in directory.parents and not any(directory.iterdir()):
+        directory.rmdir()
+        directory = directory.parent
+
+
+def collect_stale_outputs(settings: 'Settings', stale: List[str], mode: str = 'report') -> None:
+    """Report, delete or tombstone the stale files, according to `mode`, see `STALE_OUTPUT_MODES`."""
+    if not stale:
+        return
+
+    if mode == 'report':
+        print(f'[-] {len(stale)} files are left over from previous builds:')
+        for path in stale:
+            print(f'    {path}')
+        return
+
+    workdir = Path(settings.workdir)
+    for path in stale:
+        # Manifests list paths relative to the blog directory, anything else is not ours to delete.
+        if workdir.resolve() in Path(workdir, path).resolve().parents:
+            remove_output(workdir, path)
+
+    if mode == 'tombstone':
+        add_tombstones(settings, stale)
+
+    print(f'[+] Removed {len(stale)} files left over from previous builds.')
+
+
+def add_tombstones(settings: 'Settings', paths: List[str]) -> None:
+    """Append removed files with their URLs to `.blogvi/tombstones.json`, for the deploy step to purge."""
+    tombstones_path = Path(settings.workdir, STATE_DIRNAME, TOMBSTONES_FILENAME)
+
+    try:
+        with open(tombstones_path, encoding='utf-8') as fp:
+            tombstones = json.load(fp)
+    except (FileNotFoundError, json.JSONDecodeError):
+        tombstones = []
+
+    removed_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    tombstones.extend(
+        {'path': path, 'url': get_output_url(settings, path), 'removed_at': removed_at} for path in paths
+    )
+
+    write_atomically(tombstones_path, json.dumps(tombstones, indent=2))
+
+
+def save_changes(settings: 'Settings', changes: Dict[str, List[str]]) -> Path:
+    """
+    Write the files added, changed and removed by the build to `.blogvi/changes.json`,
+    along with the URLs to purge from a CDN. Return the path of the file.
+    """
+    path = Path(settings.workdir, STATE_DIRNAME, CHANGES_FILENAME)
+    purge = [get_output_url(settings, name) for name in changes['changed'] + changes['removed']]
+
+    write_atomically(path, json.dumps({**changes, 'purge': purge}, indent=2))
+
+    print(f'[+] Files changed since the previous build: {len(changes["added"])} added,'
+          f' {len(changes["changed"])} changed, {len(changes["removed"])} removed.')
+
+    return path
+
+
+def write_changes_archive(workdir: Path, changes: Dict[str, List[str]], changes_path: Path, path: Path) -> None:
+    """
+    Stream the files added and changed by the build into a tar archive, gzipped if `path` ends with `.gz` or `.tgz`.
+    The list of changes is added as `changes.json`, so the removed files are known to the deploy step as well.
+    """
+    path = str(path)
+    mode = 'w|gz' if path.endswith(('.gz', '.tgz')) else 'w|'
+
+    with tarfile.open(path, mode) as archive:
+        for name in changes['added'] + changes['changed']:
+            archive.add(Path(workdir, name), arcname=name)
+        archive.add(changes_path, arcname=CHANGES_FILENAME)
+
+    print(f'[+] Wrote {len(changes["added"]) + len(changes["changed"])} changed files to {path}.')
@@ -0,0 +1,33 @@
+from markdown import Extension
+from markdown.treeprocessors import Treeprocessor
+
+
+class ImgExtractor(Treeprocessor):
+    def run(self, doc):
+        """Find all images and append to markdown.images."""
+        self.markdown.images = []
+        for image in doc.findall('.//img'):
+            self.markdown.images.append(image.get('src'))
+
+
+class ImgExtExtension(Extension):
+    def extendMarkdown(self, md):
+        img_ext = ImgExtractor(md)
+        md.treeprocessors.add('imgext', img_ext, '>inline')
+
+
+class NameDescriptionExtractor(Treeprocessor):
+    def run(self, doc):
+        """Find all h1,h2 and append to markdown.h1 and markdown.h2."""
+        self.markdown.h1s = []
+        for h1 in doc.findall('.//h1'):
+            self.markdown.h1s.append(h1.text)
+        self.markdown.h2s = []
+        for h2 in doc.findall('.//h2'):
+            self.markdown.h2s.append(h2.text)
+
+
+class H1H2Extension(Extension):
+    def extendMarkdown(self, md):
+        h1h2_ext = NameDescriptionExtractor(md)
+        md.treeprocessors.add('h1h2ext', h1h2_ext, '>inline')
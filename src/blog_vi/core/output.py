@@ -0,0 +1,223 @@
+"""
+Destinations of the files written by a build: pages, feeds, the search index and the article caches.
+
+Files are given by their paths in the blog directory. `DirectoryOutput` writes them there, as BlogVi always did.
+`TarOutput` and `ZipOutput` stream them into a single archive instead, sparing the filesystem tens of thousands
+of small files, and `MemoryOutput` keeps them in memory, e.g. for tests.
+
+Outputs other than the directory leave no pages or caches in the blog directory, so builds into them regenerate
+everything and render translations in-process.
+"""
+import io
+import tarfile
+import threading
+import time
+import zipfile
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Union
+
+# Content of a file: text, bytes, or text chunks, e.g. of a streamed template.
+Content = Union[str, bytes, Iterable[str]]
+
+# Values of the `--output` option, besides the paths of archives.
+OUTPUT_KINDS = ('directory', 'memory')
+TAR_SUFFIXES = ('.tar', '.tar.gz', '.tgz')
+ZIP_SUFFIXES = ('.zip',)
+
+
+def to_bytes(content: Content) -> bytes:
+    if isinstance(content, bytes):
+        return content
+    if isinstance(content, str):
+        return content.encode('utf-8')
+
+    return ''.join(content).encode('utf-8')
+
+
+class BuildOutput:
+    """Destination of the files written by a build, given by their paths in the blog directory."""
+    # Whether files are written to the blog directory, where the next build finds the pages and caches,
+    # and translations rendered by worker processes can be written as well.
+    in_workdir = False
+
+    def __init__(self, workdir: Path):
+        self.workdir = Path(workdir)
+
+    def get_name(self, path: Path) -> str:
+        """Return the path of the file relative to the blog directory."""
+        return Path(path).relative_to(self.workdir).as_posix()
+
+    def make_dirs(self, directories: Iterable[Path]) -> None:
+        """Create the directories, that files are about to be written to."""
+
+    def write(self, path: Path, content: Content) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+    def describe(self) -> str:
+        raise NotImplementedError
+
+
+class DirectoryOutput(BuildOutput):
+    """Writes files to the blog directory."""
+    in_workdir = True
+
+    def make_dirs(self, directories: Iterable[Path]) -> None:
+        for directory in set(directories):
+            Path(directory).mkdir(parents=True, exist_ok=True)
+
+    def write(self, path: Path, content: Content) -> None:
+        if isinstance(content, bytes):
+            Path(path).write_bytes(content)
+            return
+
+        with open(path, 'w', encoding='utf-8') as fp:
+            if isinstance(content, str):
+                fp.write(content)
+            else:
+                # Chunks are written as they come, instead of building the whole file in memory.
+                fp.writelines(content)
+
+    def describe(self) -> str:
+        return f'directory {self.workdir}'
+
+
+class ArchiveOutput(BuildOutput):
+    """Streams files into an archive, as they are written."""
+
+    def __init__(self, workdir: Path, path: Union[str, Path]):
+        super().__init__(workdir)
+        self.path = Path(path)
+        self.count = 0
+
+        # Stages and translations write concurrently, but an archive is written by one of them at a time.
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._archive = self.open_archive()
+
+    def write(self, path: Path, content: Content) -> None:
+        name, data = self.get_name(path), to_bytes(content)
+
+        with self._lock:
+            self.add_file(name, data)
+            self.count += 1
+
+    def close(self) -> None:
+        with self._lock:
+            self._archive.close()
+
+    def open_archive(self):
+        raise NotImplementedError
+
+    def add_file(self, name: str, data: bytes) -> None:
+        raise NotImplementedError
+
+    def describe(self) -> str:
+        return f'archive {self.path}'
+
+
+class TarOutput(ArchiveOutput):
+    """Streams files into a tar archive, gzipped if its name ends with `.gz` or `.tgz`."""
+
+    def open_archive(self) -> tarfile.TarFile:
+        mode = 'w|gz' if str(self.path).endswith(('.gz', '.tgz')) else 'w|'
+
+        return tarfile.open(str(self.path), mode)
+
+    def add_file(self, name: str, data: bytes) -> None:
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = time.time()
+        self._archive.addfile(info, io.BytesIO(data))
+
+
+class ZipOutput(ArchiveOutput):
+    """Streams files into a zip archive."""
+
+    def open_archive(self) -> zipfile.ZipFile:
+        return zipfile.ZipFile(self.path, 'w', compression=zipfile.ZIP_DEFLATED)
+
+    def add_file(self, name: str, data: bytes) -> None:
+        self._archive.writestr(name, data)
+
+
+class MemoryOutput(BuildOutput):
+    """Keeps files in memory, by their paths relative to the blog directory."""
+
+    def __init__(self, workdir: Path):
+        super().__init__(workdir)
+
+        self._lock = threading.Lock()
+        self.files: Dict[str, bytes] = {}
+
+    def write(self, path: Path, content: Content) -> None:
+        name, data = self.get_name(path), to_bytes(content)
+
+        with self._lock:
+            self.files[name] = data
+
+    def read(self, name: str) -> bytes:
+        return self.files[name]
+
+    def describe(self) -> str:
+        return 'memory'
+
+
+def create_output(workdir: Path, destination: Optional[str] = None) -> BuildOutput:
+    """
+    Return the output given by `destination`: `directory` (default), `memory`,
+    or the path of a tar (`.tar`, `.tar.gz`, `.tgz`) or zip (`.zip`) archive.
+    """
+    if destination is None or destination == 'directory':
+        return DirectoryOutput(workdir)
+    if destination == 'memory':
+        return MemoryOutput(workdir)
+    if destination.endswith(TAR_SUFFIXES):
+        return TarOutput(workdir, destination)
+    if destination.endswith(ZIP_SUFFIXES):
+        return ZipOutput(workdir, destination)
+
+    raise ValueError(f'Unknown output {destination}, expected {", ".join(OUTPUT_KINDS)},'
+                     f' or a path ending with {", ".join(TAR_SUFFIXES + ZIP_SUFFIXES)}.')
+
+
+def add_assets(output: BuildOutput, templates_dir: Path) -> None:
+    """Add the static assets of the templates, served along with the pages, to an output other than the directory."""
+    for path in sorted(Path(templates_dir, 'assets').rglob('*')):
+        if path.is_file():
+            output.write(path, path.read_bytes())
+
+
+_outputs: Dict[Path, BuildOutput] = {}
+_outputs_lock = threading.Lock()
+
+
+def get_output(settings: 'Settings') -> BuildOutput:
+    """Return the output of the build of the blog, the blog directory unless the build opened another one."""
+    with _outputs_lock:
+        output = _outputs.get(Path(settings.workdir))
+
+    return output or DirectoryOutput(settings.workdir)
+
+
+def open_output(settings: 'Settings', destination: Optional[str] = None) -> BuildOutput:
+    """Create the output given by `destination`, used by the build of the blog until `close_output()`."""
+    output = create_output(Path(settings.workdir), destination)
+
+    with _outputs_lock:
+        _outputs[Path(settings.workdir)] = output
+
+    return output
+
+
+def close_output(settings: 'Settings') -> Optional[BuildOutput]:
+    """Finish writing the output of the build of the blog and return it."""
+    with _outputs_lock:
+        output = _outputs.pop(Path(settings.workdir), None)
+
+    if output is not None:
+        output.close()
+
+    return output
@@ -0,0 +1,199 @@
+"""
+Dry run of a build, reporting what it would regenerate and why.
+
+The plan fetches the inputs and evaluates the stage fingerprints, article caches and the translation memory
+like a build does, but writes nothing: neither pages nor the build state.
+"""
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from blog_vi._config import STATE_DIRNAME
+
+from .article import Article
+from .build import BuildContext, BuildGraph, StageCache, regenerates_articles
+
+
+class BuildPlan:
+    """Stages, article pages and translations, that a build would regenerate, each with the reason."""
+
+    def __init__(self, context: BuildContext, graph: BuildGraph):
+        self.context = context
+        self.settings = context.settings
+        self.graph = graph
+        self.cache = StageCache.for_settings(self.settings)
+
+        # Stage name to the reason it runs, or None, if it is up to date.
+        self.stages: Dict[str, Optional[str]] = {}
+        # Slugs of the articles to be rendered, along with the reason.
+        self.articles: List[Tuple[str, str]] = []
+        # Target language to the articles to be translated, segments and characters sent to the provider.
+        self.translations: Dict[str, dict] = {}
+
+    @property
+    def index(self):
+        return self.context.index
+
+    def evaluate(self) -> 'BuildPlan':
+        # Fetching and building the landing write nothing, so they run as in a build.
+        for name in ('fetch', 'index'):
+            self.graph.stages[name].run(self.context)
+
+        for name in self.graph.order:
+            if name == 'translate' and not self.settings.translate_articles:
+                continue
+
+            self.stages[name] = self.graph.stages[name].get_reason(self.context, self.cache)
+
+        if self.stages.get('articles') is not None:
+            changed_inputs = self.graph.stages['articles'].get_changed_inputs(self.context, self.cache)
+            for article in self.index.get_articles():
+                reason = self.get_article_reason(article)
+                if reason is None and regenerates_articles(changed_inputs):
+                    reason = self.stages['articles']
+                if reason is not None:
+                    self.articles.append((article.slug, reason))
+
+        if 'translate' in self.stages:
+            self.translations = self.get_translations()
+
+        return self
+
+    @staticmethod
+    def get_article_reason(article: Article) -> Optional[str]:
+        """Return why the page of the article would be rendered, or None, if it is cached."""
+        if not article.tracker.tracked_exists():
+            return 'new'
+
+        changes = article.tracker.get_changes()
+        if changes:
+            return f'changed {", ".join(sorted(changes))}'
+
+        if not article.output_dir.joinpath('index.html').exists():
+            return 'missing page'
+
+        return None
+
+    def get_translations(self) -> Dict[str, dict]:
+        # Imported here, so plans of blogs without translations do not load the engine.
+        from .translations.engine import TranslateEngine
+        from .translations.exceptions import ProviderError, TranslateError
+
+        try:
+            engine = TranslateEngine(self.index, (self.settings.source_language or {}).get('abbreviation'),
+                                     read_only=True)
+        except (TranslateError, ProviderError, TypeError) as e:
+            print(f'[-] Translations can not be planned, the translate provider is not set up: {e}')
+            return {}
+
+        translations = {}
+        for translation in engine.translation_list:
+            target_abbreviation = translation['abbreviation']
+            pending, segments = engine.get_pending_translation(target_abbreviation)
+
+            translations[target_abbreviation] = {
+                'articles': [
+                    (article.slug, 'source changed' if translated.tracker.tracked_exists() else 'not translated yet')
+                    for article, translated in pending
+                ],
+                'segments': len(segments),
+                'characters': sum(len(text) for text in segments),
+            }
+
+        if engine.memory is not None:
+            engine.memory.close()
+
+        return translations
+
+    def get_cpu_time(self) -> Tuple[float, List[str]]:
+        """
+        Estimate the CPU time of the build from the durations of the last runs of its stages.
+        Pages are estimated with the time per page of the last run of the articles stage.
+        Return the estimate in seconds and the stages, that have no recorded run to estimate them with.
+        """
+        total, unknown = 0.0, []
+
+        last_articles = self.cache.get('articles')
+        page_time = None
+        if last_articles and last_articles.get('items'):
+            page_time = last_articles['duration'] / last_articles['items']
+
+        for name, reason in self.stages.items():
+            if reason is None:
+                continue
+
+            run = self.cache.get(name)
+
+            if name == 'articles':
+                pages = len(self.articles)
+            elif name == 'translate':
+                # Provider latency is not CPU time, only rendering of the translated pages is estimated.
+                pages = sum(len(translation['articles']) for translation in self.translations.values())
+            else:
+                pages = None
+
+            if pages is not None:
+                if pages and page_time is None:
+                    unknown.append(name)
+                total += (page_time or 0) * pages
+            elif run is None:
+                unknown.append(name)
+            else:
+                total += run['duration']
+
+        return total, unknown
+
+    def to_dict(self) -> dict:
+        cpu_time, unknown = self.get_cpu_time()
+
+        return {
+            'stages': {name: {'dirty': reason is not None, 'reason': reason} for name, reason in self.stages.items()},
+            'articles': [{'slug': slug, 'reason': reason} for slug, reason in self.articles],
+            'translations': {
+                language: {
+                    **translation,
+                    'articles': [{'slug': slug, 'reason': reason} for slug, reason in translation['articles']],
+                }
+                for language, translation in self.translations.items()
+            },
+            'provider_characters': sum(translation['characters'] for translation in self.translations.values()),
+            'cpu_time': round(cpu_time, 3),
+            'cpu_time_unknown': unknown,
+        }
+
+    def format(self) -> str:
+        lines = [f'Plan of {self.settings.blog_name}, state in {Path(self.settings.workdir, STATE_DIRNAME)}', '',
+                 'Stages:']
+        width = max(map(len, self.stages), default=0)
+        for name, reason in self.stages.items():
+            lines.append(f'    {name:<{width}}  {reason or "up to date"}')
+
+        total = len(self.index.get_articles())
+        lines += ['', f'Article pages: {len(self.articles)} of {total}']
+        lines += self.format_articles(self.articles)
+
+        if self.stages.get('categories') is not None:
+            lines.append(f'Category pages: {len(self.index.get_categories())}')
+        feeds = [
+            filename for name, filename in (('landing', 'index.html'), ('search', 'data.json'), ('rss', 'rss.xml'))
+            if self.stages.get(name) is not None
+        ]
+        lines.append(f'Landing and feeds: {", ".join(feeds) or "none"}')
+
+        for language, translation in self.translations.items():
+            lines += ['', f'Translation into {language}: {len(translation["articles"])} articles,'
+                          f' {translation["segments"]} segments, {translation["characters"]} characters']
+            lines += self.format_articles(translation['articles'])
+
+        data = self.to_dict()
+        lines += ['', f'Provider characters: {data["provider_characters"]}',
+                  f'Estimated CPU time: {data["cpu_time"]:.2f}s']
+        if data['cpu_time_unknown']:
+            lines[-1] += f' (no previous run of {", ".join(data["cpu_time_unknown"])})'
+
+        return '\n'.join(lines)
+
+    @staticmethod
+    def format_articles(articles: List[Tuple[str, str]]) -> List[str]:
+        width = max((len(slug) for slug, _ in articles), default=0)
+
+        return [f'    {slug:<{width}}  {reason}' for slug, reason in articles]
@@ -0,0 +1,158 @@
+"""
+Sources of the articles: the CSV table published by Google Sheets, or a local snapshot of it.
+
+`blog_post_location_url` is an HTTP(S) URL, a `file://` URL or a path relative to the blog directory.
+Local files are CSV, gzip-compressed CSV, Parquet or Arrow, told apart by their content, so builds run
+with no network. Parquet and Arrow files are read column-wise with pyarrow, an optional dependency.
+"""
+import csv
+import gzip
+import io
+import os
+from pathlib import Path
+from typing import Dict, List
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+from .utils import get_articles_from_csv
+
+GZIP_MAGIC = b'\x1f\x8b'
+PARQUET_MAGIC = b'PAR1'
+ARROW_MAGIC = b'ARROW1'
+
+# Extensions of the snapshots written by `write_snapshot()`.
+SNAPSHOT_FORMATS = ('.csv', '.csv.gz', '.parquet', '.arrow', '.feather')
+DEFAULT_SNAPSHOT_FILENAME = 'snapshot.csv.gz'
+
+
+class SourceError(Exception):
+    """The source of the articles can not be read."""
+
+
+def is_remote(location: str) -> bool:
+    return location.startswith(('http://', 'https://'))
+
+
+def get_source_path(location: str, workdir: Path) -> Path:
+    """Return the path of a local source, given by a `file://` URL or a path relative to the blog directory."""
+    if location.startswith('file://'):
+        return Path(url2pathname(urlparse(location).path))
+
+    return Path(workdir, location)
+
+
+def get_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise SourceError('Parquet and Arrow sources require pyarrow, install it with `pip install pyarrow`.')
+
+    return pyarrow
+
+
+def table_to_rows(table) -> List[Dict[str, str]]:
+    """Return rows of an Arrow table, with all values as text, like the ones read from CSV."""
+    names = table.column_names
+    columns = [
+        ['' if value is None else str(value) for value in table.column(name).to_pylist()]
+        for name in names
+    ]
+
+    return [dict(zip(names, values)) for values in zip(*columns)]
+
+
+def read_rows(path: Path) -> List[Dict[str, str]]:
+    """
+    Return rows of a CSV, gzip-compressed CSV, Parquet or Arrow file.
+    CSV is parsed as it is read, so only the rows, not the whole file, are held in memory.
+    A leading byte order mark, e.g. of a CSV exported from Excel, is skipped.
+    """
+    with open(path, 'rb') as fp:
+        magic = fp.read(max(len(GZIP_MAGIC), len(PARQUET_MAGIC), len(ARROW_MAGIC)))
+
+    if magic.startswith(GZIP_MAGIC):
+        with gzip.open(path, 'rt', newline='', encoding='utf-8-sig') as fp:
+            return list(csv.DictReader(fp))
+
+    if magic.startswith(PARQUET_MAGIC):
+        pyarrow = get_pyarrow()
+        import pyarrow.parquet
+
+        try:
+            return table_to_rows(pyarrow.parquet.read_table(str(path)))
+        except pyarrow.ArrowException as e:
+            raise SourceError(f'Invalid Parquet file: {e}')
+
+    if magic.startswith(ARROW_MAGIC):
+        pyarrow = get_pyarrow()
+        import pyarrow.feather
+
+        try:
+            return table_to_rows(pyarrow.feather.read_table(str(path)))
+        except pyarrow.ArrowException as e:
+            raise SourceError(f'Invalid Arrow file: {e}')
+
+    with open(path, newline='', encoding='utf-8-sig') as fp:
+        return list(csv.DictReader(fp))
+
+
+def get_articles_from_source(location: str, workdir: Path) -> list:
+    """Return rows of the articles from a URL of the published CSV table or a local snapshot."""
+    if is_remote(location):
+        return get_articles_from_csv(location)
+
+    path = get_source_path(location, workdir)
+    try:
+        rows = read_rows(path)
+    except FileNotFoundError:
+        print(f"[ERROR] Source file {path} not found.")
+        return []
+    except (SourceError, OSError, EOFError, UnicodeDecodeError, csv.Error) as e:
+        print(f"[ERROR] Failed to read source file {path}: {e}")
+        return []
+
+    if not rows:
+        print(f"[WARNING] Source file {path} has no articles.")
+
+    return rows
+
+
+def write_snapshot(rows: List[Dict[str, str]], path: Path) -> None:
+    """
+    Write rows of the articles into a local file, in the format given by its extension, see `SNAPSHOT_FORMATS`.
+    Gzip-compressed CSV is written without a timestamp, so snapshots of the same rows are identical.
+    """
+    name = path.name.lower()
+    if not name.endswith(SNAPSHOT_FORMATS):
+        raise SourceError(f'Unknown snapshot format of {path}, expected one of {", ".join(SNAPSHOT_FORMATS)}.')
+
+    # Keys of the rows are the columns of the table, in order. Cells beyond the header have no column.
+    fieldnames = [field for field in dict.fromkeys(key for row in rows for key in row) if field is not None]
+
+    # Written aside and moved in place, so a build never reads a partial snapshot.
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary_path = path.with_name(f'.{path.name}.tmp')
+
+    if name.endswith(('.csv', '.csv.gz')):
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+
+        data = buffer.getvalue().encode('utf-8')
+        if name.endswith('.gz'):
+            data = gzip.compress(data, mtime=0)
+        temporary_path.write_bytes(data)
+    else:
+        pyarrow = get_pyarrow()
+        import pyarrow.feather
+        import pyarrow.parquet
+
+        # Stored column by column, all as text, like the cells of the table.
+        table = pyarrow.table({field: [row.get(field) or '' for row in rows] for field in fieldnames})
+        if name.endswith('.parquet'):
+            pyarrow.parquet.write_table(table, str(temporary_path))
+        else:
+            pyarrow.feather.write_feather(table, str(temporary_path))
+
+    os.replace(temporary_path, path)
@@ -0,0 +1,96 @@
+"""Jinja environments shared by all landings and articles rendered in the process."""
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+from jinja2 import BytecodeCache, Environment, FileSystemLoader
+from jinja2.bccache import Bucket
+
+
+class MemoryBytecodeCache(BytecodeCache):
+    """
+    An in-memory LRU bytecode cache keyed by the template name and its source checksum.
+
+    The key does not depend on the template filename, so identical templates living in different
+    working directories (e.g. several sites built in one process) are compiled only once.
+
+    With a `directory`, compiled templates are also stored on disk, where worker processes
+    rendering translations find them, see `use_directory()`.
+    """
+
+    def __init__(self, max_size: int = 512, directory: Optional[Path] = None):
+        self.max_size = max_size
+        self.directory = directory
+
+        self._cache: 'OrderedDict[str, bytes]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_bucket(self, environment, name, filename, source):
+        checksum = self.get_source_checksum(source)
+        bucket = Bucket(environment, self.get_cache_key(f'{name}|{checksum}'), checksum)
+        self.load_bytecode(bucket)
+
+        return bucket
+
+    def use_directory(self, directory: Union[str, Path]) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def load_bytecode(self, bucket):
+        with self._lock:
+            data = self._cache.get(bucket.key)
+            if data is not None:
+                self._cache.move_to_end(bucket.key)
+
+        if data is None and self.directory is not None:
+            path = self.directory.joinpath(bucket.key)
+            if path.exists():
+                data = path.read_bytes()
+                self._store(bucket.key, data)
+
+        if data is not None:
+            bucket.bytecode_from_string(data)
+
+    def dump_bytecode(self, bucket):
+        data = bucket.bytecode_to_string()
+        self._store(bucket.key, data)
+
+        if self.directory is not None:
+            # Written aside and moved in place, so concurrent processes never read a partial file.
+            path = self.directory.joinpath(bucket.key)
+            temporary_path = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+            temporary_path.write_bytes(data)
+            os.replace(temporary_path, path)
+
+    def _store(self, key: str, data: bytes):
+        with self._lock:
+            self._cache[key] = data
+            self._cache.move_to_end(key)
+
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+bytecode_cache = MemoryBytecodeCache()
+
+_environments: Dict[Tuple[str, ...], Environment] = {}
+_environments_lock = threading.Lock()
+
+
+def get_environment(*search_path: Union[str, Path]) -> Environment:
+    """Return a Jinja environment loading templates from `search_path`, created once per process."""
+    key = tuple(str(path) for path in search_path)
+
+    with _environments_lock:
+        environment = _environments.get(key)
+        if environment is None:
+            environment = Environment(loader=FileSystemLoader(list(key)), bytecode_cache=bytecode_cache)
+            _environments[key] = environment
+
+    return environment
@@ -1,6 +1,6 @@
 import json
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 from .utils import get_md5_hash
 
@@ -13,15 +13,27 @@ class Tracker:
         self.output_dir = output_dir
         self.output_filename = output_filename
 
-    def save_changes(self) -> Path:
+    def save_changes(self, output: Optional['BuildOutput'] = None) -> Path:
+        """Write the tracked data, to the blog directory or the given output of the build."""
         tracked_data = self.get_tracking_data()
         tracker_file = self._get_tracker_file()
 
+        if output is not None:
+            output.write(tracker_file, json.dumps(tracked_data))
+            return tracker_file
+
         with open(tracker_file, 'w') as tracker_fp:
             json.dump(tracked_data, tracker_fp)
 
         return tracker_file
 
+    def discard(self) -> None:
+        """Remove the saved tracker file, so the object is treated as changed by the next build."""
+        tracker_file = self._get_tracker_file()
+
+        if tracker_file.exists():
+            tracker_file.unlink()
+
     def is_changed(self) -> bool:
         tracking_data = self.get_tracking_data()
         tracked_data = self.get_tracked_data()
@@ -1,2 +1 @@
-# We have to import providers in order to make registry wotk
-from . import providers
+# Providers are imported lazily by the registry on the first lookup, see `TranslationProviderRegistry`.
@@ -0,0 +1,144 @@
+import json
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from blog_vi._config import STATE_DIRNAME
+
+from .engine import TranslateEngine
+from .exceptions import TranslateError
+
+
+class BatchJobNotSupported(TranslateError):
+    default_message = 'The translate provider has no batch API.'
+
+
+class BatchTranslationJob:
+    """
+    Offline translation of all pending texts of a blog through the asynchronous batch API of the provider.
+
+    Texts, that a build would send to the provider, are submitted at once. The job state is saved
+    in `.blogvi/batch_job.json` right after the submission, so an interrupted run polls the same jobs
+    instead of submitting them again. Results are ingested into the translation memory,
+    from which the following build takes them.
+    """
+    state_filename = 'batch_job.json'
+    # Maximum number of requests per submitted job.
+    max_job_size = 10000
+
+    def __init__(self, engine: TranslateEngine, poll_interval: float = 60):
+        if not engine.translator.supports_batch_jobs:
+            raise BatchJobNotSupported
+
+        if engine.memory is None:
+            raise TranslateError('The batch mode stores its results in the translation memory, please enable it.')
+
+        self.engine = engine
+        self.translator = engine.translator
+        self.poll_interval = poll_interval
+        self.state_path = Path(engine.settings.workdir, STATE_DIRNAME, self.state_filename)
+
+    def run(self) -> int:
+        """Submit (or resume) the jobs, wait for them to end and ingest their results. Return the number of them."""
+        state = self.load_state()
+
+        if state is None:
+            state = self.submit()
+            if state is None:
+                print('[+] Nothing to translate.')
+                return 0
+        else:
+            print(f"[+] Resuming batch jobs {', '.join(state['jobs'])}.")
+
+        self.wait(state['jobs'])
+        ingested = self.ingest(state)
+        self.state_path.unlink()
+
+        return ingested
+
+    def submit(self) -> Optional[dict]:
+        source = self.engine.source_abbreviation
+        requests = {}
+
+        for translation in self.engine.translation_list:
+            target = translation['abbreviation']
+
+            for text in self.engine.get_pending_texts(target):
+                requests[f'segment-{len(requests)}'] = (target, text)
+
+        if not requests:
+            return None
+
+        custom_ids = list(requests)
+        state = {
+            'provider': self.translator.id,
+            'source': source,
+            'requests': requests,
+            'jobs': [],
+        }
+
+        for index in range(0, len(custom_ids), self.max_job_size):
+            chunk = custom_ids[index:index + self.max_job_size]
+            job_id = self.translator.submit_batch_job([
+                (custom_id, requests[custom_id][1], source, requests[custom_id][0]) for custom_id in chunk
+            ])
+            state['jobs'].append(job_id)
+            # Saved after every submission, so no job is submitted twice.
+            self.save_state(state)
+
+            print(f'[+] Submitted batch job {job_id} with {len(chunk)} texts.')
+
+        return state
+
+    def wait(self, jobs: List[str]) -> None:
+        pending = list(jobs)
+
+        while pending:
+            for job_id in list(pending):
+                ended, status = self.translator.get_batch_job_status(job_id)
+                print(f'[DEBUG] Batch job {job_id}: {status}')
+
+                if ended:
+                    pending.remove(job_id)
+
+            if pending:
+                time.sleep(self.poll_interval)
+
+    def ingest(self, state: dict) -> int:
+        requests: Dict[str, list] = state['requests']
+        texts = {custom_id: text for custom_id, (_, text) in requests.items()}
+        ingested = failed = 0
+
+        for job_id in state['jobs']:
+            for custom_id, result in self.translator.get_batch_job_results(job_id, texts):
+                if not result.ok:
+                    failed += 1
+                    continue
+
+                target, text = requests[custom_id]
+                self.engine.remember_translation(text, target, result.text)
+                ingested += 1
+
+        print(f'[+] Ingested {ingested} translations into the translation memory.')
+        if failed:
+            print(f'[-] {failed} texts failed to translate, they will be translated during the build.')
+
+        return ingested
+
+    def load_state(self) -> Optional[dict]:
+        if not self.state_path.exists():
+            return None
+
+        with open(self.state_path, 'r', encoding='utf-8') as fp:
+            state = json.load(fp)
+
+        if state['provider'] != self.translator.id or state['source'] != self.engine.source_abbreviation:
+            return None
+
+        return state
+
+    def save_state(self, state: dict) -> None:
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+
+        with open(self.state_path, 'w', encoding='utf-8') as fp:
+            json.dump(state, fp, ensure_ascii=False)
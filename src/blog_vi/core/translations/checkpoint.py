@@ -0,0 +1,89 @@
+import json
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from blog_vi._config import STATE_DIRNAME
+from blog_vi.core.article import Article
+from blog_vi.core.utils import get_md5_hash
+
+
+class TranslationCheckpoint:
+    """
+    Translated articles of a single language, appended as each article completes.
+
+    An interrupted build, rerun with `--resume`, takes completed articles from the checkpoint
+    instead of translating them again. Entries are keyed by the article slug and the hash of its source,
+    so articles changed since the checkpoint are translated again.
+    """
+    fields = ('title', 'summary', 'markdown', 'categories')
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._entries: Optional[Dict[Tuple[str, str], dict]] = None
+
+    @classmethod
+    def for_language(cls, settings, target_abbreviation: str) -> 'TranslationCheckpoint':
+        return cls(Path(settings.workdir, STATE_DIRNAME, 'checkpoints', f'{target_abbreviation}.jsonl'))
+
+    @staticmethod
+    def get_source_hash(article: Article) -> str:
+        tracking_data = article.tracker.get_tracking_data()
+
+        return get_md5_hash([tracking_data[field]['hash'] for field in article.tracker.fields])
+
+    @property
+    def entries(self) -> Dict[Tuple[str, str], dict]:
+        if self._entries is None:
+            self._entries = self.load()
+
+        return self._entries
+
+    def load(self) -> Dict[Tuple[str, str], dict]:
+        entries = {}
+
+        if not self.path.exists():
+            return entries
+
+        with open(self.path, 'r', encoding='utf-8') as fp:
+            for line in fp:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # The last line is cut, if the build was killed while writing it.
+                    continue
+
+                entries[(entry['slug'], entry['source_hash'])] = entry
+
+        return entries
+
+    def restore(self, article: Article, cloned_article: Article, provider: str) -> bool:
+        """Fill the cloned article with its checkpointed translation. Return False, if there is none."""
+        entry = self.entries.get((article.slug, self.get_source_hash(article)))
+        if entry is None or entry['provider'] != provider:
+            return False
+
+        for field in self.fields:
+            setattr(cloned_article, field, entry[field])
+
+        return True
+
+    def add(self, article: Article, cloned_article: Article, provider: str, model: Optional[str] = None) -> None:
+        """Append the translation of a completed article."""
+        entry = {
+            'slug': article.slug,
+            'source_hash': self.get_source_hash(article),
+            'provider': provider,
+            'model': model,
+            **{field: getattr(cloned_article, field) for field in self.fields}
+        }
+        self.entries[(entry['slug'], entry['source_hash'])] = entry
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as fp:
+            fp.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    def reset(self) -> None:
+        self._entries = {}
+
+        if self.path.exists():
+            self.path.unlink()
@@ -1,27 +1,86 @@
+import asyncio
+import os
+import time
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
+from blog_vi._config import STATE_DIRNAME
 from blog_vi.core.article import Article
 from blog_vi.core.landing import Landing
+from blog_vi.core.output import get_output
 
+from .checkpoint import TranslationCheckpoint
 from .exceptions import (
     BadProviderSettingsError,
+    ProviderRateLimited,
     TranslateEngineNotFound
 )
+from .governor import RateLimitGovernor
+from .memory import get_translation_memory
+from .metrics import TranslationMetrics
 from .registry import translation_provider_registry
-from blog_vi.core.utils import get_logger
+from .rendering import LanguageRenderer, generate_landing
+from .result import TranslationResult
+from .segmenter import MarkdownDocument, Segment
+from blog_vi.core.utils import get_logger, is_markdown_url
 
 
 class TranslateEngine:
-    def __init__(self, landing: Landing, source_abbreviation: str):
+    def __init__(self, landing: Landing, source_abbreviation: str, resume: bool = False,
+                 languages: Optional[Sequence[str]] = None, read_only: bool = False):
+        """
+        :param resume: take articles completed by an interrupted build from its checkpoints
+        :param languages: abbreviations of the target languages to translate into. All configured ones by default
+        :param read_only: only look up what a translation would do, e.g. to plan a build. Nothing is written,
+                          and the translation memory is opened read-only, if it exists
+        """
         self.landing = landing
         self.source_abbreviation = source_abbreviation
+        self.resume = resume
+        self.read_only = read_only
 
         self.settings = landing.settings
+        self.translation_list = [
+            translation for translation in self.settings.translation_list
+            if languages is None or translation['abbreviation'] in languages
+        ]
         self.translator = self.get_translate_engine(self.settings)
 
         if self.translator is None:
             raise BadProviderSettingsError
 
+        self.concurrency = self.settings.translation_concurrency
+        self.provider_concurrency = self.settings.translation_provider_concurrency.get(
+            self.translator.id, self.translator.max_concurrency
+        )
+
+        self.governor = RateLimitGovernor(
+            min(self.concurrency, self.provider_concurrency),
+            rate=self.settings.translation_provider_rate_limit.get(self.translator.id),
+            max_retries=self.settings.translation_max_retries
+        )
+        self.translator.rate_limit_listener = self.governor.update_from_headers
+
+        self.memory = get_translation_memory(self.settings, read_only=read_only)
+        self.metrics = TranslationMetrics(self.settings.blog_name)
+
+        self.render_workers = self.settings.render_workers
+        if self.render_workers is None:
+            self.render_workers = min(os.cpu_count() or 1, len(self.translation_list))
+
+        # Files of the translated landings, and whether all languages were rendered, for the build manifest.
+        self.outputs: List[Path] = []
+        self.complete = True
+
+        # Created within the running event loop, see `translate_async()`.
+        self._semaphore = None
+        self._executor = None
+        self._renderer = None
+        self._in_flight: Dict[Tuple[str, str], asyncio.Future] = {}
+
     def get_translate_engine(self, settings):
         translator_cls = translation_provider_registry.get_provider(settings.translator)
 
@@ -32,15 +91,86 @@ class TranslateEngine:
 
     def translate(self) -> None:
         """Translate landing and its articles into specified in the settings languages."""
-        for translation in self.settings.translation_list:
-            try:
-                translated_landing = self.translate_landing(translation['abbreviation'])
-                translated_landing.generate()
-                translated_landing.cache_changes()
-            except Exception as e:
-                print(f'[-] Something went wrong when translating. Error - {e}')
+        asyncio.run(self.translate_async())
+
+        if self.governor.throttled:
+            print(f'[+] Provider rate limited {self.governor.throttled} requests,'
+                  f' finished with {self.governor.get_stats()["limit"]} concurrent requests.')
+
+        self.report_metrics()
+
+        provider_stats = self.translator.get_stats()
+        if provider_stats:
+            print(f'[+] Provider {self.translator.id}: '
+                  + ', '.join(f'{key.replace("_", " ")} {value}' for key, value in provider_stats.items()) + '.')
+
+        if self.memory is not None:
+            stats = self.memory.get_stats()
+            print(f"[+] Translation memory: {stats['hits']} hits, {stats['misses']} misses,"
+                  f" {stats['entries']} segments stored.")
+            self.memory.save_stats()
+
+    def report_metrics(self) -> None:
+        """Print the metrics of the provider calls per language and write them to the configured files."""
+        for translation in self.translation_list:
+            report = self.metrics.format_series(self.translator.id, translation['abbreviation'])
+            if report is not None:
+                print(f"[+] Translation into {translation['abbreviation']}: {report}.")
+
+        if self.settings.translation_metrics:
+            self.metrics.write_json(Path(self.settings.workdir, self.settings.translation_metrics))
+
+        if self.settings.translation_metrics_prometheus:
+            self.metrics.write_prometheus(Path(self.settings.workdir, self.settings.translation_metrics_prometheus))
+
+    async def translate_async(self) -> None:
+        """
+        Translate all languages concurrently.
+        Provider calls of all articles and languages share the global concurrency limit
+        and the rate-limit governor of the provider.
+        """
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        # Providers are blocking, so their calls run in a dedicated pool of threads.
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='blogvi-translate') as executor, \
+                self.get_renderer() as renderer:
+            self._executor = executor
+            self._renderer = renderer
+
+            await asyncio.gather(*(
+                self.translate_language(translation['abbreviation'])
+                for translation in self.translation_list
+            ))
+
+    async def translate_language(self, target_abbreviation: str) -> None:
+        """Translate the landing into the target language and render it as soon as its articles are done."""
+        try:
+            translated_landing = await self.translate_landing(target_abbreviation)
+
+            if self._renderer is not None:
+                await self._renderer.render(translated_landing)
+            else:
+                # Rendering runs in the default executor, so it does not hold back provider calls.
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(None, generate_landing, translated_landing)
+        except Exception as e:
+            print(f'[-] Something went wrong when translating. Error - {e}')
+            self.complete = False
+        else:
+            self.outputs += translated_landing.get_outputs()
+
+    def get_renderer(self):
+        """Return the renderer of translated landings in worker processes, or a null context to render in-process."""
+        # Workers write to the blog directory, so other outputs of the build are written in-process.
+        if self.render_workers <= 1 or not get_output(self.settings).in_workdir:
+            return nullcontext()
 
-    def translate_landing(self, target_abbreviation: str) -> Landing:
+        return LanguageRenderer(
+            self.render_workers,
+            bytecode_directory=Path(self.settings.workdir, STATE_DIRNAME, 'templates')
+        )
+
+    async def translate_landing(self, target_abbreviation: str) -> Landing:
         """
         Translate landing and its articles into the target language,
         specified by `target_abbreviation` param.
@@ -49,75 +179,312 @@ class TranslateEngine:
 
         translated_landing = self.clone_landing_for_translation(workdir)
 
-        for article in self.landing._articles:
-            try:
-                translated_landing.add_article(self.translate_article(article, translated_landing, target_abbreviation))
-            except Exception as e:
-                print(f'[-] Something went wrong when translating article {article.title} - {e}')
+        checkpoint = TranslationCheckpoint.for_language(self.settings, target_abbreviation)
+        if not self.resume:
+            checkpoint.reset()
+
+        cloned_articles, pending = self.get_pending_articles(translated_landing, checkpoint)
+
+        # Titles, summaries and categories repeat across articles, so they are deduplicated site-wide
+        # and translated in batches before the articles.
+        strings = await self.translate_strings({
+            text
+            for _, cloned_article in pending
+            for text in (cloned_article.title, cloned_article.summary, *cloned_article.categories)
+            if text
+        }, target_abbreviation)
+
+        results = await asyncio.gather(
+            *(
+                self.translate_article(cloned_article, strings, target_abbreviation, checkpoint, article)
+                for article, cloned_article in pending
+            ),
+            return_exceptions=True
+        )
+
+        failed = set()
+        for (article, cloned_article), result in zip(pending, results):
+            if isinstance(result, Exception):
+                print(f'[-] Something went wrong when translating article {article.title} - {result}')
+                failed.add(id(cloned_article))
+                cloned_article.tracker.discard()
+                # The page translated by an earlier build stays, until the article is translated again.
+                self.outputs.append(cloned_article.output_dir / 'index.html')
+            elif not result:
+                # Rendered with the source text in place of the failed parts, and translated again next time.
+                print(f'[-] Some parts of article {article.title} failed to translate, they will be retried'
+                      f' on the next build.')
+                cloned_article.cacheable = False
+                cloned_article.tracker.discard()
+
+        # Keep the order of the source landing.
+        for cloned_article in cloned_articles:
+            if id(cloned_article) not in failed:
+                translated_landing.add_article(cloned_article)
 
         return translated_landing
 
-    def translate_article(self, article: Article, landing, target_abbreviation: str) -> Article:
+    def get_pending_articles(self, translated_landing: Landing, checkpoint: TranslationCheckpoint
+                             ) -> Tuple[List[Article], List[Tuple[Article, Article]]]:
+        """
+        Clone all articles into the translated landing, filling the ones translated before.
+        Return the clones, and the source articles paired with the clones, that still have to be translated.
+        """
+        partial_slugs = self.landing.partial_slugs
+        translated_landing.partial_slugs = partial_slugs
+
+        cloned_articles, pending = [], []
+        for article in self.landing.get_articles():
+            cloned_article = self.clone_article_for_translation(article, translated_landing)
+
+            if partial_slugs is not None and article.slug not in partial_slugs:
+                # Articles out of a partial build keep their last translation, the ones never translated are left out.
+                if self.restore_article_from_cache(article, cloned_article, check_source=False):
+                    cloned_articles.append(cloned_article)
+                continue
+
+            cloned_articles.append(cloned_article)
+            if not self.restore_article_from_cache(article, cloned_article) \
+                    and not (self.resume and checkpoint.restore(article, cloned_article, self.translator.id)):
+                pending.append((article, cloned_article))
+
+        return cloned_articles, pending
+
+    def get_pending_texts(self, target_abbreviation: str) -> List[str]:
+        """
+        Return the unique texts, that a translation into the target language would send to the provider:
+        titles, summaries, categories and markdown segments of changed articles, missing in the translation memory.
+        """
+        _, texts = self.get_pending_translation(target_abbreviation)
+
+        return texts
+
+    def get_pending_translation(self, target_abbreviation: str) -> Tuple[List[Tuple[Article, Article]], List[str]]:
+        """
+        Return the source articles paired with their clones, that a translation into the target language
+        would translate, and the texts it would send to the provider, see `get_pending_texts()`.
+        """
+        translated_landing = self.clone_landing_for_translation(self.get_translation_workdir(target_abbreviation))
+        checkpoint = TranslationCheckpoint.for_language(self.settings, target_abbreviation)
+        _, pending = self.get_pending_articles(translated_landing, checkpoint)
+
+        texts = set()
+        for article, cloned_article in pending:
+            texts.update((cloned_article.title, cloned_article.summary, *cloned_article.categories))
+            markdown = article.get_markdown_body()
+            if markdown:
+                texts.update(segment.text for segment in MarkdownDocument.parse(markdown).segments)
+
+        texts = [text for text in sorted(texts) if text and self.lookup_translation(text, target_abbreviation) is None]
+
+        return pending, texts
+
+    def restore_article_from_cache(self, article: Article, cloned_article: Article, check_source: bool = True) -> bool:
+        """Fill the cloned article with its cached translation, if the source article has not changed."""
+        if (check_source and article.tracker.is_changed()) or not cloned_article.tracker.tracked_exists():
+            return False
+
+        tracked_data = cloned_article.tracker.get_tracked_data()
+
+        cloned_article.title = tracked_data['title']['content']
+        cloned_article.summary = tracked_data['summary']['content']
+        cloned_article.markdown = tracked_data['markdown']['content']
+        cloned_article.categories = tracked_data['categories']['content']
+        get_logger().info("Article from cache %r", cloned_article.title)
+
+        return True
+
+    async def translate_article(self, cloned_article: Article, strings: Dict[str, str],
+                                target_abbreviation: str, checkpoint: TranslationCheckpoint,
+                                article: Article) -> bool:
         """
         Translate article title, summary and text into the target language,
         specified by `target_abbreviation` param.
-        """
-        logger = get_logger()
-        cloned_article = self.clone_article_for_translation(article, landing)
+        Return whether all of them were translated. Only complete articles are checkpointed.
 
-        if not article.tracker.is_changed() and cloned_article.tracker.tracked_exists():
-            tracked_data = cloned_article.tracker.get_tracked_data()
+        :param strings: translations of titles, summaries and categories, see `translate_strings()`
+        """
+        texts = (cloned_article.title, cloned_article.summary, *cloned_article.categories)
+        complete = all(text in strings for text in texts if text)
 
-            cloned_article.title = tracked_data['title']['content']
-            cloned_article.summary = tracked_data['summary']['content']
-            cloned_article.markdown = tracked_data['markdown']['content']
-            logger.info("Article from cache %r", cloned_article.title)
-            return cloned_article
+        cloned_article.title = strings.get(cloned_article.title, cloned_article.title)
+        cloned_article.summary = strings.get(cloned_article.summary, cloned_article.summary)
+        cloned_article.categories = [strings.get(category, category) for category in cloned_article.categories]
 
-        title = cloned_article.title
-        summary = cloned_article.summary
+        # The body is translated, rather than the URL it may be given by. It is fetched once for all languages,
+        # and the translated article renders from the translated text without touching the network.
         markdown = cloned_article.markdown
-        if title:
-            cloned_article.title = self.translator.translate(
-                text=title,
-                source_abbreviation=self.source_abbreviation,
-                target_abbreviation=target_abbreviation
-            )
-            logger.info("Article %r. Translate Article title from %r to %r", cloned_article.title,
-                        self.source_abbreviation, target_abbreviation)
-        if summary:
-            cloned_article.summary = self.translator.translate(
-                text=summary,
-                source_abbreviation=self.source_abbreviation,
-                target_abbreviation=target_abbreviation
-            )
-            logger.info("Article %r. Translate Article summary from %r to %r", cloned_article.title,
-                        self.source_abbreviation, target_abbreviation)
-        if markdown:
-            cloned_article.markdown = self.translator.translate(
-                text=markdown,
+        if is_markdown_url(markdown):
+            loop = asyncio.get_running_loop()
+            markdown = await loop.run_in_executor(None, article.get_markdown_body)
+
+        result = await self.translate_markdown(markdown, target_abbreviation)
+        cloned_article.markdown = result.text
+
+        if not (complete and result.ok):
+            return False
+
+        checkpoint.add(article, cloned_article, self.translator.id, self.translator.model)
+        get_logger().info("Article %r. Translated from %r to %r", cloned_article.title,
+                          self.source_abbreviation, target_abbreviation)
+
+        return True
+
+    async def translate_markdown(self, markdown: str, target_abbreviation: str) -> TranslationResult:
+        """
+        Translate markdown segment by segment. Code, tables, URLs and other markup are never sent to the provider,
+        and segments unchanged since the previous build are served from the translation memory.
+        Failed segments keep their source text, and fail the result. So do segments, whose translation lost
+        or repeated any of their placeholders.
+        """
+        if not markdown:
+            return TranslationResult(markdown, provider=self.translator.id)
+
+        document = MarkdownDocument.parse(markdown)
+        results = await asyncio.gather(*(
+            self.translate_text(segment.text, target_abbreviation, segment) for segment in document.segments
+        ))
+
+        return TranslationResult(
+            document.render([result.text if result.ok else None for result in results]),
+            ok=all(result.ok for result in results),
+            provider=self.translator.id,
+            model=self.translator.model
+        )
+
+    async def translate_strings(self, texts: Iterable[str], target_abbreviation: str) -> Dict[str, str]:
+        """
+        Translate unique short texts with batched provider calls and return them mapped to their translations.
+        Texts, that failed to translate, are left out.
+        """
+        translations = {}
+        missing = []
+
+        for text in sorted(texts):
+            translation = self.lookup_translation(text, target_abbreviation)
+            if translation is None:
+                missing.append(text)
+            else:
+                translations[text] = translation
+
+        size = self.translator.max_batch_size
+        batches = [missing[index:index + size] for index in range(0, len(missing), size)]
+        results = await asyncio.gather(
+            *(self.translate_batch(batch, target_abbreviation) for batch in batches),
+            return_exceptions=True
+        )
+
+        for batch, result in zip(batches, results):
+            if isinstance(result, Exception):
+                print(f'[-] Something went wrong when translating a batch of {len(batch)} texts - {result}')
+                continue
+
+            for text, translation in zip(batch, result):
+                if translation.ok:
+                    translations[text] = translation.text
+                    self.remember_translation(text, target_abbreviation, translation.text)
+
+        return translations
+
+    async def translate_batch(self, texts: List[str], target_abbreviation: str) -> List[TranslationResult]:
+        return await self.call_provider(partial(
+            self.translator.translate_batch_results,
+            texts=texts,
+            source_abbreviation=self.source_abbreviation,
+            target_abbreviation=target_abbreviation
+        ), target_abbreviation, texts)
+
+    async def translate_text(self, text: str, target_abbreviation: str,
+                             segment: Optional[Segment] = None) -> TranslationResult:
+        """
+        Translate a single text, looking it up in the translation memory first.
+        Provider calls run within the concurrency limits. Empty texts are kept as is.
+
+        :param segment: the markdown segment of the text. Translations, that lost any of its placeholders, fail
+        """
+        if not text:
+            return TranslationResult(text, provider=self.translator.id)
+
+        translation = self.lookup_translation(text, target_abbreviation)
+        # Memories written before the placeholders were checked may hold broken translations, they are replaced.
+        if translation is not None and (segment is None or segment.restore(translation) is not None):
+            return TranslationResult(translation, provider=self.translator.id)
+
+        # Identical texts requested at the same time (e.g. by legacy copies of an article) share one provider call.
+        # Segments of the same text have the same placeholders, so they share the check as well.
+        key = (target_abbreviation, text)
+        if key not in self._in_flight:
+            self._in_flight[key] = asyncio.ensure_future(self._translate_text(text, target_abbreviation, segment))
+
+        try:
+            return await asyncio.shield(self._in_flight[key])
+        finally:
+            if key in self._in_flight and self._in_flight[key].done():
+                del self._in_flight[key]
+
+    async def _translate_text(self, text: str, target_abbreviation: str,
+                              segment: Optional[Segment] = None) -> TranslationResult:
+        try:
+            result = await self.call_provider(partial(
+                self.translator.translate_result,
+                text=text,
                 source_abbreviation=self.source_abbreviation,
                 target_abbreviation=target_abbreviation
+            ), target_abbreviation, [text])
+        except Exception as e:
+            # Out of retries on rate limits.
+            return TranslationResult.failed(text, e, provider=self.translator.id)
+
+        if result.ok and segment is not None and segment.restore(result.text) is None:
+            result = TranslationResult.failed(text, 'Placeholders lost in the translation',
+                                              provider=result.provider, model=result.model)
+
+        # Failures are never remembered, so the next build asks the provider again.
+        if result.ok:
+            self.remember_translation(text, target_abbreviation, result.text)
+
+        return result
+
+    async def call_provider(self, func, target_abbreviation: str, texts: List[str]):
+        """
+        Run a blocking provider call in the executor, governed by the rate limits of the provider.
+        Rate-limited calls are retried with backoff, without holding a slot of the global limit while waiting.
+        Every attempt is recorded in the metrics.
+        """
+        loop = asyncio.get_running_loop()
+
+        async def run():
+            async with self._semaphore:
+                started = time.perf_counter()
+                try:
+                    result = await loop.run_in_executor(self._executor, func)
+                except ProviderRateLimited:
+                    self.metrics.record_rate_limited(
+                        self.translator.id, target_abbreviation, time.perf_counter() - started
+                    )
+                    raise
+
+            self.metrics.record_call(
+                self.translator.id, target_abbreviation, texts,
+                result if isinstance(result, list) else [result], time.perf_counter() - started
             )
-            logger.info("Article %r. Translate Article markdown from %r to %r", cloned_article.title,
-                        self.source_abbreviation, target_abbreviation)
 
-        translated_categories = []
-        for category in cloned_article.categories:
-            if category:
-                category = self.translator.translate(
-                    text=category,
-                    source_abbreviation=self.source_abbreviation,
-                    target_abbreviation=target_abbreviation
-                )
-                logger.info("Category %r. Translate Article markdown from %r to %r", category,
-                            self.source_abbreviation, target_abbreviation)
+            return result
+
+        return await self.governor.call(run)
+
+    def lookup_translation(self, text: str, target_abbreviation: str) -> Optional[str]:
+        if self.memory is None:
+            return None
 
-            translated_categories.append(category)
+        translation = self.memory.get(self.translator.id, self.source_abbreviation, target_abbreviation, text)
+        self.metrics.record_lookup(self.translator.id, target_abbreviation, translation is not None)
 
-        cloned_article.categories = translated_categories
+        return translation
 
-        return cloned_article
+    def remember_translation(self, text: str, target_abbreviation: str, translation: str) -> None:
+        if self.memory is not None:
+            self.memory.set(self.translator.id, self.source_abbreviation, target_abbreviation, text, translation)
 
     def clone_landing_for_translation(self, workdir: Path) -> Landing:
         return Landing(
@@ -149,6 +516,7 @@ class TranslateEngine:
 
     def get_translation_workdir(self, folder_name: str) -> Path:
         workdir = Path(self.landing.workdir, folder_name)
-        workdir.mkdir(exist_ok=True)
+        if not self.read_only:
+            get_output(self.settings).make_dirs([workdir])
 
         return workdir
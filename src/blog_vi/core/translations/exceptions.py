@@ -21,7 +21,7 @@ class TranslateEngineNotFound(TranslateError):
         from .registry import translation_provider_registry
 
         return (f'Translate provider not found.'
-                f' Possible engines are: {",".join(translation_provider_registry.get_registry().keys())}')
+                f' Possible engines are: {",".join(translation_provider_registry.get_provider_ids())}')
 
 
 # More exceptions, derived from `TranslateError`, here...
@@ -47,3 +47,13 @@ class ProviderSettingsNotFound(ProviderError):
 
 class BadProviderSettingsError(ProviderError):
     default_message = "Provider settings filled incorrect"
+
+
+class ProviderRateLimited(ProviderError):
+    """The provider rejected a request due to rate limits. The request may be retried after `retry_after` seconds."""
+    default_message = "Provider rate limit exceeded"
+
+    def __init__(self, message: str = None, *args, retry_after: float = None):
+        self.retry_after = retry_after
+
+        super().__init__(message, *args)
@@ -0,0 +1,216 @@
+"""
+Rate-limit governor of provider calls.
+
+Calls pass a token bucket limiting the request rate and an adaptive concurrency limit:
+the limit grows by one for every window of successful calls and halves on a rate-limit response.
+Rejected calls are retried after the delay requested by the provider, or with jittered exponential backoff.
+"""
+import asyncio
+import random
+import threading
+import time
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Mapping, Optional, TypeVar
+
+from .exceptions import ProviderRateLimited
+from blog_vi.core.utils import get_logger
+
+T = TypeVar('T')
+
+# Headers with the seconds (or the date) after which requests are accepted again.
+RETRY_AFTER_HEADERS = ('retry-after', 'x-ratelimit-reset-after')
+# Headers with the remaining requests and the time they are replenished at, most specific first.
+REMAINING_HEADERS = ('anthropic-ratelimit-requests-remaining', 'x-ratelimit-remaining-requests', 'x-ratelimit-remaining')
+RESET_HEADERS = ('anthropic-ratelimit-requests-reset', 'x-ratelimit-reset-requests', 'x-ratelimit-reset')
+
+
+def parse_delay(value: Optional[str]) -> Optional[float]:
+    """Parse a delay in seconds from a number of seconds, an HTTP date or an RFC 3339 timestamp."""
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        pass
+
+    try:
+        return max(0.0, datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp() - time.time())
+    except ValueError:
+        return None
+
+
+def get_header(headers: Mapping[str, str], names) -> Optional[str]:
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            return value
+
+    return None
+
+
+class RateLimitGovernor:
+    """
+    Governs calls to a single provider.
+
+    :param max_concurrency: upper bound of the adaptive concurrency limit
+    :param rate: maximum number of requests per second, unlimited if None
+    :param burst: number of requests allowed at once by the token bucket, defaults to `max_concurrency`
+    :param max_retries: number of retries of a rate-limited call before its error is raised
+    """
+
+    def __init__(self, max_concurrency: int, rate: Optional[float] = None, burst: Optional[int] = None,
+                 max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 60.0):
+        self.max_concurrency = max(1, max_concurrency)
+        self.limit = float(self.max_concurrency)
+        self.rate = rate
+        self.burst = burst or self.max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self.in_flight = 0
+        self.throttled = 0
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+
+        # Provider responses are reported from worker threads, see `update_from_headers()`.
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+
+        # Created within the running event loop.
+        self._condition = None
+
+    @property
+    def condition(self) -> asyncio.Condition:
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+
+        return self._condition
+
+    async def call(self, func: Callable[[], Awaitable[T]]) -> T:
+        """Run `func` within the limits, retrying it while the provider responds with `ProviderRateLimited`."""
+        attempt = 0
+
+        while True:
+            await self.acquire()
+            try:
+                result = await func()
+            except ProviderRateLimited as e:
+                await self.release(throttled=True, retry_after=e.retry_after)
+
+                if attempt >= self.max_retries:
+                    raise
+
+                delay = self.get_backoff(attempt, e.retry_after)
+                get_logger().info('Rate limited, retrying in %.1fs (attempt %d of %d)',
+                                  delay, attempt + 1, self.max_retries)
+                attempt += 1
+                await asyncio.sleep(delay)
+            except BaseException:
+                await self.release()
+                raise
+            else:
+                await self.release(succeeded=True)
+                return result
+
+    async def acquire(self) -> None:
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+        try:
+            await self.wait_for_token()
+        except BaseException:
+            await self.release()
+            raise
+
+    async def release(self, succeeded: bool = False, throttled: bool = False,
+                      retry_after: Optional[float] = None) -> None:
+        async with self.condition:
+            self.in_flight -= 1
+
+            if throttled:
+                # Multiplicative decrease.
+                self.throttled += 1
+                self.limit = max(1.0, self.limit / 2)
+                self.pause(retry_after if retry_after is not None else self.base_delay)
+            elif succeeded:
+                # Additive increase: about one more concurrent call per `limit` successful calls.
+                self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+
+            self.condition.notify_all()
+
+    async def wait_for_token(self) -> None:
+        while True:
+            delay = self.take_token()
+            if delay <= 0:
+                return
+
+            await asyncio.sleep(delay)
+
+    def take_token(self) -> float:
+        """Take a token from the bucket. Return 0 on success, otherwise the seconds to wait before retrying."""
+        with self._lock:
+            now = time.monotonic()
+
+            if self._paused_until > now:
+                return self._paused_until - now
+
+            if self.rate is None:
+                return 0.0
+
+            self._tokens = min(float(self.burst), self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+
+            return (1 - self._tokens) / self.rate
+
+    def pause(self, seconds: float) -> None:
+        """Hold back new calls for `seconds`."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def get_backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Delay before the retry `attempt`: the requested delay, or full-jitter exponential backoff."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+        if retry_after is not None:
+            # A bit of jitter keeps the retries of concurrent calls from arriving at once.
+            delay = retry_after + delay / 4
+
+        return delay
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        """
+        Adjust to the rate-limit headers of a provider response.
+        When no requests remain in the current window, new calls wait until it is reset.
+        Safe to call from the threads running provider calls.
+        """
+        retry_after = parse_delay(get_header(headers, RETRY_AFTER_HEADERS))
+        if retry_after:
+            self.pause(retry_after)
+            return
+
+        remaining = get_header(headers, REMAINING_HEADERS)
+        try:
+            remaining = int(remaining) if remaining is not None else None
+        except ValueError:
+            remaining = None
+
+        if remaining == 0:
+            reset = parse_delay(get_header(headers, RESET_HEADERS))
+            if reset:
+                self.pause(min(reset, self.max_delay))
+
+    def get_stats(self) -> dict:
+        return {'limit': int(self.limit), 'throttled': self.throttled}
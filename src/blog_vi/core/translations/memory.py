@@ -0,0 +1,211 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Dict, IO, Optional, Union
+
+
+class TranslationMemory:
+    """
+    Persistent segment-level translation memory, backed by SQLite.
+
+    Translations are keyed by (provider, source language, target language, normalized segment hash),
+    so they survive deleted article caches and are reused across builds and sites.
+    """
+    schema = '''
+        CREATE TABLE IF NOT EXISTS segments (
+            provider TEXT NOT NULL,
+            source_lang TEXT NOT NULL,
+            target_lang TEXT NOT NULL,
+            hash TEXT NOT NULL,
+            source TEXT NOT NULL,
+            target TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (provider, source_lang, target_lang, hash)
+        )
+    '''
+    # Lookups of the last translation run and of all of them, see `save_stats()`.
+    stats_schema = '''
+        CREATE TABLE IF NOT EXISTS stats (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+    '''
+    stored_stats = ('last_hits', 'last_misses', 'total_hits', 'total_misses')
+
+    def __init__(self, path: Union[str, Path], read_only: bool = False):
+        """
+        :param read_only: open an existing memory without ever writing to it, e.g. to plan a build
+        """
+        self.path = Path(path)
+
+        self.hits = 0
+        self.misses = 0
+        self._saved_hits = 0
+        self._saved_misses = 0
+
+        # The memory is shared by the threads of a build (and by the sites of `build-many`).
+        self._lock = threading.Lock()
+
+        if read_only:
+            self._connection = sqlite3.connect(f'{self.path.resolve().as_uri()}?mode=ro', uri=True,
+                                               check_same_thread=False, isolation_level=None)
+            return
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute(self.schema)
+        self._connection.execute(self.stats_schema)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Normalize unicode and trailing whitespace, which do not affect the translation."""
+        text = unicodedata.normalize('NFC', text)
+
+        return '\n'.join(line.rstrip() for line in text.strip().splitlines())
+
+    @classmethod
+    def get_hash(cls, text: str) -> str:
+        return hashlib.sha256(cls.normalize(text).encode()).hexdigest()
+
+    def get(self, provider: str, source_lang: str, target_lang: str, text: str) -> Optional[str]:
+        """Return the stored translation of `text`, or None, if there is none."""
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT target FROM segments WHERE provider = ? AND source_lang = ? AND target_lang = ? AND hash = ?',
+                (provider, source_lang, target_lang, self.get_hash(text))
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return row[0]
+
+    def set(self, provider: str, source_lang: str, target_lang: str, text: str, translation: str) -> None:
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO segments VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (provider, source_lang, target_lang, self.get_hash(text), text, translation, time.time())
+            )
+
+    def get_stats(self) -> Dict[str, Union[int, float]]:
+        with self._lock:
+            entries = self._connection.execute('SELECT COUNT(*) FROM segments').fetchone()[0]
+
+        lookups = self.hits + self.misses
+
+        return {
+            'entries': entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+        }
+
+    def save_stats(self) -> None:
+        """Store the lookups made since the last call as the last run, and add them to the totals of all runs."""
+        with self._lock:
+            hits, misses = self.hits - self._saved_hits, self.misses - self._saved_misses
+            self._saved_hits, self._saved_misses = self.hits, self.misses
+
+            self._connection.execute('BEGIN')
+            try:
+                self._connection.executemany('INSERT OR IGNORE INTO stats VALUES (?, 0)',
+                                             [(name,) for name in self.stored_stats])
+                self._connection.executemany('UPDATE stats SET value = ? WHERE name = ?',
+                                             [(hits, 'last_hits'), (misses, 'last_misses')])
+                self._connection.executemany('UPDATE stats SET value = value + ? WHERE name = ?',
+                                             [(hits, 'total_hits'), (misses, 'total_misses')])
+            except BaseException:
+                self._connection.execute('ROLLBACK')
+                raise
+            self._connection.execute('COMMIT')
+
+    def get_stored_stats(self) -> Dict[str, int]:
+        """Return the lookups of the last translation run and of all of them, stored with `save_stats()`."""
+        with self._lock:
+            try:
+                rows = self._connection.execute('SELECT name, value FROM stats').fetchall()
+            except sqlite3.OperationalError:
+                # A memory written before the statistics were stored, opened read-only.
+                rows = []
+
+        stats = dict.fromkeys(self.stored_stats, 0)
+        stats.update(rows)
+
+        return stats
+
+    def export(self, fp: IO[str]) -> int:
+        """Write all segments to `fp` as JSON lines and return their number."""
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT provider, source_lang, target_lang, hash, source, target, created_at FROM segments'
+            ).fetchall()
+
+        keys = ('provider', 'source_lang', 'target_lang', 'hash', 'source', 'target', 'created_at')
+        for row in rows:
+            fp.write(json.dumps(dict(zip(keys, row)), ensure_ascii=False) + '\n')
+
+        return len(rows)
+
+    def import_(self, fp: IO[str]) -> int:
+        """Load segments exported with `export()`, keeping the existing ones. Return the number of added segments."""
+        added = 0
+
+        with self._lock:
+            self._connection.execute('BEGIN')
+            try:
+                for line in fp:
+                    if not line.strip():
+                        continue
+
+                    segment = json.loads(line)
+                    cursor = self._connection.execute(
+                        'INSERT OR IGNORE INTO segments VALUES (?, ?, ?, ?, ?, ?, ?)',
+                        (segment['provider'], segment['source_lang'], segment['target_lang'],
+                         segment.get('hash') or self.get_hash(segment['source']),
+                         segment['source'], segment['target'], segment.get('created_at', time.time()))
+                    )
+                    added += cursor.rowcount
+            except BaseException:
+                # A malformed line imports nothing, and leaves the shared connection usable.
+                self._connection.execute('ROLLBACK')
+                raise
+            self._connection.execute('COMMIT')
+
+        return added
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+_memories: Dict[Path, TranslationMemory] = {}
+_memories_lock = threading.Lock()
+
+
+def get_translation_memory(settings: 'Settings', read_only: bool = False) -> Optional[TranslationMemory]:
+    """
+    Return the translation memory configured in the settings, or None, if it is disabled.
+    Memories are opened once per process, so all builds using the same file share it.
+
+    :param read_only: open the memory read-only, on its own, or return None, if it does not exist yet
+    """
+    if not settings.translation_memory:
+        return None
+
+    path = Path(settings.workdir, settings.translation_memory).resolve()
+
+    if read_only:
+        return TranslationMemory(path, read_only=True) if path.exists() else None
+
+    with _memories_lock:
+        if path not in _memories:
+            _memories[path] = TranslationMemory(path)
+
+        return _memories[path]
@@ -0,0 +1,163 @@
+import json
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+from blog_vi.core.utils import write_atomically
+
+from .result import TranslationResult
+
+# Upper bounds of the latency histogram buckets, in seconds.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# Token counters of the Anthropic usage fields.
+TOKEN_FIELDS = ('input_tokens', 'output_tokens', 'cache_read_input_tokens', 'cache_creation_input_tokens')
+
+
+class TranslationMetrics:
+    """
+    Counters of the provider calls of a translation run, per provider and target language:
+    calls, texts, characters and tokens in and out, a latency histogram and translation memory hits.
+    """
+
+    def __init__(self, blog_name: str = ''):
+        self.blog_name = blog_name
+        self.started_at = time.time()
+
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, str], dict] = {}
+
+    def get_series(self, provider: str, target_abbreviation: str) -> dict:
+        key = (provider, target_abbreviation)
+
+        if key not in self._series:
+            self._series[key] = {
+                'calls': 0,
+                'texts': 0,
+                'failed': 0,
+                'rate_limited': 0,
+                'chars_in': 0,
+                'chars_out': 0,
+                **{field: 0 for field in TOKEN_FIELDS},
+                'cache_hits': 0,
+                'cache_misses': 0,
+                'latency_buckets': [0] * (len(LATENCY_BUCKETS) + 1),
+                'latency_sum': 0.0,
+            }
+
+        return self._series[key]
+
+    def record_call(self, provider: str, target_abbreviation: str, texts: Iterable[str],
+                    results: Iterable[TranslationResult], latency: float) -> None:
+        """Record a completed provider call, translating `texts` into `results`."""
+        texts, results = list(texts), list(results)
+
+        with self._lock:
+            series = self.get_series(provider, target_abbreviation)
+            series['calls'] += 1
+            series['texts'] += len(texts)
+            series['chars_in'] += sum(len(text) for text in texts)
+            self.add_latency(series, latency)
+
+            for result in results:
+                if result.ok:
+                    series['chars_out'] += len(result.text)
+                else:
+                    series['failed'] += 1
+
+                for field in TOKEN_FIELDS:
+                    series[field] += result.usage.get(field, 0)
+
+    def record_rate_limited(self, provider: str, target_abbreviation: str, latency: float) -> None:
+        with self._lock:
+            series = self.get_series(provider, target_abbreviation)
+            series['rate_limited'] += 1
+            self.add_latency(series, latency)
+
+    def record_lookup(self, provider: str, target_abbreviation: str, hit: bool) -> None:
+        with self._lock:
+            self.get_series(provider, target_abbreviation)['cache_hits' if hit else 'cache_misses'] += 1
+
+    @staticmethod
+    def add_latency(series: dict, latency: float) -> None:
+        series['latency_buckets'][bisect_left(LATENCY_BUCKETS, latency)] += 1
+        series['latency_sum'] += latency
+
+    def get_summary(self) -> dict:
+        with self._lock:
+            providers = {}
+
+            for (provider, target_abbreviation), series in sorted(self._series.items()):
+                lookups = series['cache_hits'] + series['cache_misses']
+                latency_count = sum(series['latency_buckets'])
+
+                providers.setdefault(provider, {})[target_abbreviation] = {
+                    **{key: value for key, value in series.items() if not key.startswith('latency')},
+                    'cache_hit_ratio': round(series['cache_hits'] / lookups, 4) if lookups else None,
+                    'latency': {
+                        'count': latency_count,
+                        'sum': round(series['latency_sum'], 6),
+                        'mean': round(series['latency_sum'] / latency_count, 6) if latency_count else None,
+                        'buckets': {
+                            str(bound): count
+                            for bound, count in zip((*LATENCY_BUCKETS, '+Inf'), series['latency_buckets'])
+                        },
+                    },
+                }
+
+        return {
+            'blog': self.blog_name,
+            'started_at': self.started_at,
+            'duration': round(time.time() - self.started_at, 3),
+            'providers': providers,
+        }
+
+    def write_json(self, path: Union[str, Path]) -> None:
+        write_atomically(path, json.dumps(self.get_summary(), indent=2, ensure_ascii=False))
+
+    def write_prometheus(self, path: Union[str, Path]) -> None:
+        """Write the counters in the Prometheus text format, e.g. for the textfile collector of node_exporter."""
+        summary = self.get_summary()
+        counters = ('calls', 'texts', 'failed', 'rate_limited', 'chars_in', 'chars_out', *TOKEN_FIELDS,
+                    'cache_hits', 'cache_misses')
+        lines = []
+
+        for name in counters:
+            lines.append(f'# TYPE blogvi_translation_{name}_total counter')
+            for labels, series in self.iter_series(summary):
+                lines.append(f'blogvi_translation_{name}_total{{{labels}}} {series[name]}')
+
+        lines.append('# TYPE blogvi_translation_latency_seconds histogram')
+        for labels, series in self.iter_series(summary):
+            cumulative = 0
+            for bound, count in series['latency']['buckets'].items():
+                cumulative += count
+                lines.append(f'blogvi_translation_latency_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'blogvi_translation_latency_seconds_sum{{{labels}}} {series["latency"]["sum"]}')
+            lines.append(f'blogvi_translation_latency_seconds_count{{{labels}}} {series["latency"]["count"]}')
+
+        write_atomically(path, '\n'.join(lines) + '\n')
+
+    @staticmethod
+    def iter_series(summary: dict):
+        blog = summary['blog'].replace('\\', '\\\\').replace('"', '\\"')
+
+        for provider, languages in summary['providers'].items():
+            for target_abbreviation, series in languages.items():
+                yield f'blog="{blog}",provider="{provider}",lang="{target_abbreviation}"', series
+
+    def format_series(self, provider: str, target_abbreviation: str) -> Optional[str]:
+        """Return a one-line report of the series, or None, if nothing was recorded."""
+        summary = self.get_summary()['providers'].get(provider, {}).get(target_abbreviation)
+        if summary is None:
+            return None
+
+        ratio = summary['cache_hit_ratio']
+        mean = summary['latency']['mean']
+
+        return (f"{summary['calls']} calls, {summary['chars_in']} chars in, {summary['chars_out']} chars out,"
+                f" {summary['input_tokens']}/{summary['output_tokens']} tokens in/out,"
+                f" {summary['failed']} failed, {summary['rate_limited']} rate limited,"
+                f" mean latency {f'{mean:.3f}s' if mean is not None else '-'},"
+                f" cache hit ratio {f'{ratio:.0%}' if ratio is not None else '-'}")
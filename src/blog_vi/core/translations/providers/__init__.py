@@ -1,3 +1,18 @@
-from .deepl import DeeplTranslateProvider
-from .google import GoogleTranslateProvider
-from .claude import ClaudeTranslateProvider
+# Provider modules pull heavy client libraries (`deepl`, `anthropic`), so they are imported on first access only.
+from importlib import import_module
+
+_PROVIDERS = {
+    'DeeplTranslateProvider': '.deepl',
+    'GoogleTranslateProvider': '.google',
+    'ClaudeTranslateProvider': '.claude',
+    'PseudoTranslateProvider': '.pseudo',
+}
+
+
+def __getattr__(name):
+    try:
+        module = _PROVIDERS[name]
+    except KeyError:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    return getattr(import_module(module, __name__), name)
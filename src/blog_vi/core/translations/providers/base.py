@@ -1,7 +1,13 @@
+import threading
 from abc import ABC, abstractmethod, ABCMeta
+from typing import Callable, Dict, Hashable, Iterator, List, Mapping, Optional, Tuple
 
-from ..exceptions import ProviderSettingsNotFound, BadProviderSettingsError
+from ..exceptions import ProviderSettingsNotFound, BadProviderSettingsError, ProviderRateLimited
 from ..registry import translation_provider_registry
+from ..result import TranslationResult
+
+# A request of a batch job: custom id, text, source and target language abbreviations.
+BatchRequest = Tuple[str, str, str, str]
 
 
 class TranslateProviderMeta(ABCMeta):
@@ -15,6 +21,22 @@ class TranslateProviderMeta(ABCMeta):
 
 class BaseTranslateProvider(ABC, metaclass=TranslateProviderMeta):
     settings_key = ''
+    # Model used by the provider, recorded along with its translations.
+    model: Optional[str] = None
+    # Default maximum number of concurrent requests to the provider.
+    # Overridden per provider id with the `translation_provider_concurrency` setting.
+    max_concurrency = 4
+    # Maximum number of texts sent in a single `translate_batch()` call.
+    max_batch_size = 50
+    # Whether the provider has an asynchronous batch API, see `BatchJobsMixin`.
+    supports_batch_jobs = False
+
+    # API clients shared by all instances of a provider, see `get_shared_client()`.
+    _clients: Dict[Hashable, object] = {}
+    _clients_lock = threading.Lock()
+
+    # Called with the headers of every provider response, see `report_rate_limits()`.
+    rate_limit_listener: Optional[Callable[[Mapping[str, str]], None]] = None
 
     def __init__(self, *args, **kwargs):
         pass
@@ -28,6 +50,62 @@ class BaseTranslateProvider(ABC, metaclass=TranslateProviderMeta):
     def translate(self, text: str, source_abbreviation: str, target_abbreviation: str) -> str:
         """Translate `text` into the given language."""
 
+    def translate_batch(self, texts: List[str], source_abbreviation: str, target_abbreviation: str) -> List[str]:
+        """
+        Translate `texts` into the given language, keeping their order.
+        Providers able to translate several texts in a single request should override it.
+        """
+        return [self.translate(text, source_abbreviation, target_abbreviation) for text in texts]
+
+    def translate_result(self, text: str, source_abbreviation: str, target_abbreviation: str) -> TranslationResult:
+        """
+        Translate `text`, reporting a failure as a result instead of raising it.
+        Rate limits are still raised, so that the call is retried.
+        """
+        try:
+            translation = self.translate(text, source_abbreviation, target_abbreviation)
+        except ProviderRateLimited:
+            raise
+        except Exception as e:
+            return TranslationResult.failed(text, e, provider=self.id, model=self.model)
+
+        return TranslationResult(translation, provider=self.id, model=self.model)
+
+    def translate_batch_results(self, texts: List[str], source_abbreviation: str,
+                                target_abbreviation: str) -> List[TranslationResult]:
+        """Like `translate_result()`, for `translate_batch()`. A failed batch fails all of its texts."""
+        try:
+            translations = self.translate_batch(texts, source_abbreviation, target_abbreviation)
+        except ProviderRateLimited:
+            raise
+        except Exception as e:
+            return [TranslationResult.failed(text, e, provider=self.id, model=self.model) for text in texts]
+
+        return [TranslationResult(translation, provider=self.id, model=self.model) for translation in translations]
+
+    def get_stats(self) -> dict:
+        """Counters of the provider calls, if the provider keeps any."""
+        return {}
+
+    @classmethod
+    def get_shared_client(cls, key: Hashable, factory: Callable[[], object]):
+        """
+        Return the API client stored under `key`, created by `factory` on the first call.
+        Clients keep their connection pools, so they live as long as the process.
+        """
+        key = (cls.__name__, key)
+
+        with cls._clients_lock:
+            if key not in cls._clients:
+                cls._clients[key] = factory()
+
+            return cls._clients[key]
+
+    def report_rate_limits(self, headers: Mapping[str, str]) -> None:
+        """Pass the rate-limit headers of a provider response to the listener, if any."""
+        if self.rate_limit_listener is not None and headers is not None:
+            self.rate_limit_listener(headers)
+
     @classmethod
     def from_settings(cls, settings):
         engine_settings = getattr(settings, cls.settings_key)
@@ -39,3 +117,27 @@ class BaseTranslateProvider(ABC, metaclass=TranslateProviderMeta):
     @abstractmethod
     def get_provider(self):
         pass
+
+
+class BatchJobsMixin(ABC):
+    """
+    Asynchronous batch API of a provider, used by `blogvi translate --batch`.
+    Mixed in before `BaseTranslateProvider`, e.g. `class Provider(BatchJobsMixin, BaseTranslateProvider)`.
+    """
+    supports_batch_jobs = True
+
+    @abstractmethod
+    def submit_batch_job(self, requests: List[BatchRequest]) -> str:
+        """Submit translations to the asynchronous batch API of the provider and return the job id."""
+
+    @abstractmethod
+    def get_batch_job_status(self, job_id: str) -> Tuple[bool, str]:
+        """Return whether the job has ended, and its status in a human readable form."""
+
+    @abstractmethod
+    def get_batch_job_results(self, job_id: str, texts: Dict[str, str]) -> Iterator[Tuple[str, TranslationResult]]:
+        """
+        Yield custom ids of the requests of an ended job along with their results.
+
+        :param texts: source texts of the requests, by their custom ids
+        """
@@ -1,85 +1,278 @@
 # src/blog_vi/core/translations/providers/claude.py
 import os
+import json
 import anthropic
-from typing import Optional
+from typing import Dict, Iterator, List, Optional, Tuple
 import logging
 
-from .base import BaseTranslateProvider
-from ..exceptions import TranslateError
+from .base import BaseTranslateProvider, BatchJobsMixin, BatchRequest
+from ..result import TranslationResult
+from ..exceptions import ProviderRateLimited, TranslateError
 
 logger = logging.getLogger(__name__)
 
-class ClaudeTranslateProvider(BaseTranslateProvider):
+# Status of responses telling the API is temporarily overloaded.
+OVERLOADED_STATUS = 529
+
+# Static system prompts, the languages are given in the messages. They are not marked for prompt caching,
+# as they are far shorter than the minimum cacheable prompt of 1024 tokens, which the API would ignore the mark for.
+SYSTEM_PROMPT = """You are a professional translator specializing in technical and blog content translation.
+Your task is to translate the content given by the user into the requested language while:
+1. Preserving all markdown formatting, links, and special characters exactly as they appear
+2. Only translating the actual text content, not markdown syntax or URLs
+3. Maintaining the original structure and formatting
+4. Ensuring technical terms are translated accurately
+5. Preserving code blocks and their content
+6. Maintaining proper spacing and line breaks
+7. Keeping placeholders like ⟦0⟧ exactly as they are
+
+Respond with ONLY the translated text, maintaining all original formatting."""
+
+BATCH_SYSTEM_PROMPT = """You are a professional translator specializing in technical and blog content translation.
+You receive a JSON array of strings. Translate every string into the requested language.
+Respond with ONLY a JSON array of the translated strings, in the same order and of the same length."""
+
+
+class ClaudeTranslateProvider(BatchJobsMixin, BaseTranslateProvider):
     """
     Translation provider using the Anthropic Claude API.
     Uses Claude 3.7 Sonnet which has a 200K token context window and 128K output tokens with beta header.
+
+    Requests are sized from the input: `max_tokens` follows the text length, and only long texts are streamed
+    or ask for the 128K output beta. Texts up to `short_text_length` characters go to `fast_model`, if set.
     """
     id = 'claude'
     settings_key = 'claude_translator'
-    
-    def __init__(self, api_key: str, model: str = "claude-3-7-sonnet-20250219"):
+
+    # Output tokens allowed per input character, with room for languages longer than the source.
+    output_tokens_per_char = 0.75
+    min_output_tokens = 256
+    # Limits of the output tokens without streaming, and without the 128K output beta.
+    max_tokens_without_streaming = 16000
+    max_tokens_without_beta = 64000
+    max_output_tokens = 128000
+
+    def __init__(self, api_key: str, model: str = "claude-3-7-sonnet-20250219", fast_model: Optional[str] = None,
+                 short_text_length: int = 300, base_url: Optional[str] = None):
         self.__api_key = api_key
+        # Alternative API location, e.g. a proxy or a local stub server
+        self.__base_url = base_url
         self.__model = model
+        self.__fast_model = fast_model
+        self.__short_text_length = short_text_length
         self.__client = None
 
+    @property
+    def model(self) -> str:
+        return self.__model
+
+    def get_model(self, length: int) -> str:
+        """Return the model for an input of `length` characters."""
+        if self.__fast_model and length <= self.__short_text_length:
+            return self.__fast_model
+
+        return self.__model
+
+    def get_max_tokens(self, length: int) -> int:
+        """Return `max_tokens` for an input of `length` characters."""
+        return min(self.max_output_tokens, self.min_output_tokens + int(length * self.output_tokens_per_char))
+
+    def get_request(self, text: str, source_abbreviation: str, target_abbreviation: str) -> dict:
+        """Return the parameters of a request translating `text`."""
+        return dict(
+            model=self.get_model(len(text)),
+            max_tokens=self.get_max_tokens(len(text)),
+            system=SYSTEM_PROMPT,
+            messages=[
+                {"role": "user", "content": f"Translate the following text from {source_abbreviation}"
+                                            f" to {target_abbreviation}:\n\n{text}"}
+            ],
+        )
+
+    def get_message_result(self, text: str, message, model: str) -> TranslationResult:
+        """Return the result of the response `message` to the translation of `text`."""
+        if message.stop_reason == 'max_tokens':
+            # A cut off translation must not end up in the translation memory and the pages.
+            return self.get_failed_result(text, 'Translation cut off at max_tokens', model)
+
+        # Ensure markdown links are preserved
+        final_text = ''.join(block.text for block in message.content if block.type == 'text').strip()
+        final_text = final_text.replace('] (', '](')
+
+        if not final_text:
+            return self.get_failed_result(text, 'Empty response', model)
+
+        return TranslationResult(final_text, provider=self.id, model=model, usage=self.get_usage(message))
+
     def translate(self, text: str, source_abbreviation: str, target_abbreviation: str) -> str:
+        """Translate text, falling back to the source text on errors."""
+        return self.translate_result(text, source_abbreviation, target_abbreviation).text
+
+    def translate_result(self, text: str, source_abbreviation: str, target_abbreviation: str) -> TranslationResult:
         """
-        Translate text using Claude 3.7 Sonnet API with 128K output tokens.
+        Translate text with a request sized for it.
         No chunking needed due to large context window (200K tokens).
         """
         client = self.get_provider()
-        
-        # System message to set the context and requirements
-        system_message = f"""You are a professional translator specializing in technical and blog content translation.
-        Your task is to translate content from {source_abbreviation} to {target_abbreviation} while:
-        1. Preserving all markdown formatting, links, and special characters exactly as they appear
-        2. Only translating the actual text content, not markdown syntax or URLs
-        3. Maintaining the original structure and formatting
-        4. Ensuring technical terms are translated accurately
-        5. Preserving code blocks and their content
-        6. Maintaining proper spacing and line breaks
-        
-        Respond with ONLY the translated text, maintaining all original formatting."""
-        
+
+        request = self.get_request(text, source_abbreviation, target_abbreviation)
+        model, max_tokens = request['model'], request['max_tokens']
+        if max_tokens > self.max_tokens_without_beta:
+            # Enable 128K output tokens
+            request['extra_headers'] = {"anthropic-beta": "output-128k-2025-02-19"}
+
         try:
-            # Create a streaming response with beta header for 128K output tokens
-            with client.messages.stream(
-                model=self.__model,
-                max_tokens=128000,  # Maximum output tokens with beta header
-                system=system_message,
-                messages=[
-                    {"role": "user", "content": f"Please translate the following text while preserving all formatting:\n\n{text}"}
-                ],
-                extra_headers={
-                    "anthropic-beta": "output-128k-2025-02-19"  # Enable 128K output tokens
-                }
-            ) as stream:
-                translated_text = []
-                for text in stream.text_stream:
-                    translated_text.append(text)
-                
-                # Join the streamed text and ensure markdown links are preserved
-                final_text = ''.join(translated_text).strip()
-                final_text = final_text.replace('] (', '](')
-                
-                return final_text
-            
+            if max_tokens > self.max_tokens_without_streaming:
+                # Long requests must be streamed
+                with client.messages.stream(**request) as stream:
+                    self.report_rate_limits(stream.response.headers)
+                    for _ in stream.text_stream:
+                        pass
+                    message = stream.get_final_message()
+            else:
+                raw_response = client.messages.with_raw_response.create(**request)
+                self.report_rate_limits(raw_response.headers)
+                message = raw_response.parse()
+
+            return self.get_message_result(text, message, model)
+
         except anthropic.APIConnectionError as e:
             logger.error(f"Connection error during translation: {e}")
-            return text
+            return self.get_failed_result(text, e, model)
         except anthropic.RateLimitError as e:
-            logger.error(f"Rate limit exceeded during translation: {e}")
-            return text
+            raise self.get_rate_limited_error(e) from e
         except anthropic.APIStatusError as e:
+            if e.status_code == OVERLOADED_STATUS:
+                raise self.get_rate_limited_error(e) from e
             logger.error(f"API error during translation: {e}")
-            return text
+            return self.get_failed_result(text, e, model)
         except Exception as e:
             logger.error(f"Unexpected error during translation: {e}")
-            return text
+            return self.get_failed_result(text, e, model)
+
+    def translate_batch(self, texts: List[str], source_abbreviation: str, target_abbreviation: str) -> List[str]:
+        results = self.translate_batch_results(texts, source_abbreviation, target_abbreviation)
+
+        return [result.text for result in results]
+
+    def translate_batch_results(self, texts: List[str], source_abbreviation: str,
+                                target_abbreviation: str) -> List[TranslationResult]:
+        """
+        Translate short texts with a single structured request: a JSON array in, a JSON array out.
+        Falls back to one request per text, if the response does not match the input.
+        """
+        client = self.get_provider()
+
+        content = json.dumps(texts, ensure_ascii=False)
+        # Texts of a batch are short, so the batch goes to the fast model, if there is one.
+        model = self.get_model(max(len(text) for text in texts))
+
+        try:
+            raw_response = client.messages.with_raw_response.create(
+                model=model,
+                max_tokens=min(self.max_tokens_without_streaming, self.get_max_tokens(len(content))),
+                system=BATCH_SYSTEM_PROMPT,
+                messages=[
+                    {"role": "user", "content": f"Translate from {source_abbreviation} to {target_abbreviation}:"
+                                                f"\n\n{content}"}
+                ],
+            )
+            self.report_rate_limits(raw_response.headers)
+            response = raw_response.parse()
+            if response.stop_reason == 'max_tokens':
+                raise ValueError('Translations cut off at max_tokens')
+            content = ''.join(block.text for block in response.content if block.type == 'text').strip()
+            # The model may wrap the array into a markdown code block.
+            content = content[content.find('['):content.rfind(']') + 1]
+            translations = json.loads(content)
+        except anthropic.RateLimitError as e:
+            raise self.get_rate_limited_error(e) from e
+        except anthropic.APIStatusError as e:
+            if e.status_code == OVERLOADED_STATUS:
+                raise self.get_rate_limited_error(e) from e
+            logger.error(f"Batch translation failed, translating texts one by one: {e}")
+            translations = None
+        except (anthropic.APIError, ValueError) as e:
+            logger.error(f"Batch translation failed, translating texts one by one: {e}")
+            translations = None
+
+        if (not isinstance(translations, list) or len(translations) != len(texts)
+                or not all(isinstance(translation, str) for translation in translations)):
+            return [self.translate_result(text, source_abbreviation, target_abbreviation) for text in texts]
+
+        # The usage of the request is recorded once, on its first result.
+        usage = self.get_usage(response)
+        return [
+            TranslationResult(translation, provider=self.id, model=model, usage=usage if index == 0 else None)
+            for index, translation in enumerate(translations)
+        ]
+
+    def submit_batch_job(self, requests: List[BatchRequest]) -> str:
+        """Submit translations with the Message Batches API and return the batch id."""
+        batch = self.get_provider().messages.batches.create(requests=[
+            {
+                "custom_id": custom_id,
+                # The output beta is not available in batches.
+                "params": {**request, "max_tokens": min(request['max_tokens'], self.max_tokens_without_beta)},
+            }
+            for custom_id, request in (
+                (custom_id, self.get_request(text, source_abbreviation, target_abbreviation))
+                for custom_id, text, source_abbreviation, target_abbreviation in requests
+            )
+        ])
+
+        return batch.id
+
+    def get_batch_job_status(self, job_id: str) -> Tuple[bool, str]:
+        batch = self.get_provider().messages.batches.retrieve(job_id)
+        counts = batch.request_counts
+
+        return batch.processing_status == 'ended', (
+            f'{batch.processing_status}: {counts.processing} processing, {counts.succeeded} succeeded,'
+            f' {counts.errored + counts.canceled + counts.expired} failed'
+        )
+
+    def get_batch_job_results(self, job_id: str, texts: Dict[str, str]) -> Iterator[Tuple[str, TranslationResult]]:
+        for response in self.get_provider().messages.batches.results(job_id):
+            text = texts.get(response.custom_id)
+            if text is None:
+                continue
+
+            if response.result.type == 'succeeded':
+                message = response.result.message
+                yield response.custom_id, self.get_message_result(text, message, message.model)
+            else:
+                yield response.custom_id, self.get_failed_result(text, response.result.type)
+
+    def get_failed_result(self, text: str, error, model: Optional[str] = None) -> TranslationResult:
+        return TranslationResult.failed(text, error, provider=self.id, model=model or self.__model)
+
+    @staticmethod
+    def get_usage(message) -> dict:
+        usage = message.usage
+        return {
+            'input_tokens': usage.input_tokens,
+            'output_tokens': usage.output_tokens,
+            'cache_read_input_tokens': getattr(usage, 'cache_read_input_tokens', None) or 0,
+            'cache_creation_input_tokens': getattr(usage, 'cache_creation_input_tokens', None) or 0,
+        }
+
+    def get_rate_limited_error(self, error: anthropic.APIStatusError) -> ProviderRateLimited:
+        """Convert a rate-limit or overload response into a retriable error, reporting its headers."""
+        from ..governor import parse_delay
+
+        headers = error.response.headers
+        self.report_rate_limits(headers)
+
+        return ProviderRateLimited(str(error), retry_after=parse_delay(headers.get('retry-after')))
 
     def get_provider(self):
         if self.__client is None:
-            self.__client = anthropic.Anthropic(api_key=self.__api_key)
+            # Retries are left to the rate-limit governor of the translate engine.
+            self.__client = self.get_shared_client(
+                (self.__api_key, self.__base_url),
+                lambda: anthropic.Anthropic(api_key=self.__api_key, base_url=self.__base_url, max_retries=0)
+            )
         return self.__client
 
     @classmethod
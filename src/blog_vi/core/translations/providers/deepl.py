@@ -1,4 +1,7 @@
+from typing import List
+
 from .base import BaseTranslateProvider
+from ..exceptions import ProviderRateLimited
 import deepl
 
 
@@ -11,11 +14,24 @@ class DeeplTranslateProvider(BaseTranslateProvider):
 
     def translate(self, text: str, source_abbreviation: str, target_abbreviation: str) -> str:
         provider = self.get_provider()
-        result = provider.translate_text(text, source_lang=source_abbreviation, target_lang=target_abbreviation)
+        try:
+            result = provider.translate_text(text, source_lang=source_abbreviation, target_lang=target_abbreviation)
+        except deepl.TooManyRequestsException as e:
+            raise ProviderRateLimited(str(e)) from e
         text = result.text
         text = text.replace('] (', '](')
 
         return text
 
+    def translate_batch(self, texts: List[str], source_abbreviation: str, target_abbreviation: str) -> List[str]:
+        """Translate all texts with a single list-input request."""
+        provider = self.get_provider()
+        try:
+            results = provider.translate_text(texts, source_lang=source_abbreviation, target_lang=target_abbreviation)
+        except deepl.TooManyRequestsException as e:
+            raise ProviderRateLimited(str(e)) from e
+
+        return [result.text.replace('] (', '](') for result in results]
+
     def get_provider(self):
-        return deepl.Translator(auth_key=self.__api_key)
+        return self.get_shared_client(self.__api_key, lambda: deepl.Translator(auth_key=self.__api_key))
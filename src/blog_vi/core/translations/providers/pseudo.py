@@ -0,0 +1,123 @@
+import random
+import re
+import threading
+import time
+from collections import deque
+from typing import List, Optional
+
+from .base import BaseTranslateProvider
+from ..exceptions import ProviderRateLimited, TranslateError
+
+# Accented look-alikes of ASCII letters, so pseudo-translated text stays readable.
+ACCENTS = str.maketrans(
+    'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ',
+    'àƀçđéƒĝĥîĵķĺɱñöþǫŕšţûṽŵẋýžÀßÇĐÉƑĜĤÎĴĶĹṀÑÖÞǪŔŠŢÛṼŴẊÝŽ'
+)
+# Parts of a text, that are kept as they are: placeholders of the segmenter, URLs, HTML tags and entities.
+PROTECTED_RE = re.compile(r'⟦\s*\d+\s*⟧|(?:https?|ftp)://\S+|</?[A-Za-z][^>]*>|&(?:[A-Za-z]+|#\d+);')
+
+
+class PseudoTranslateProvider(BaseTranslateProvider):
+    """
+    Deterministic, local pseudo-translation, for benchmarks and CI.
+
+    Letters are replaced with accented look-alikes, and the text is padded by `expansion`,
+    like real translations are usually longer. Latency, rate limits and failures of a real provider
+    are simulated with the settings below. Calls and characters are counted, see `get_stats()`.
+
+    :param latency: mean seconds per request
+    :param jitter: maximum seconds added to or removed from the latency
+    :param requests_per_second: requests above this rate are rejected with a rate-limit error
+    :param failure_rate: share of requests failing with an error
+    :param seed: seed of the simulated jitter and failures
+    """
+    id = 'pseudo'
+    settings_key = 'pseudo_translator'
+    max_concurrency = 16
+
+    def __init__(self, latency: float = 0, jitter: float = 0, requests_per_second: Optional[float] = None,
+                 failure_rate: float = 0, expansion: float = 0.3, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.requests_per_second = requests_per_second
+        self.failure_rate = failure_rate
+        self.expansion = expansion
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._requests = deque()
+        self.stats = {'calls': 0, 'batch_calls': 0, 'chars_in': 0, 'chars_out': 0, 'rate_limited': 0, 'failed': 0}
+
+    def translate(self, text: str, source_abbreviation: str, target_abbreviation: str) -> str:
+        self.request(1, len(text))
+        translation = self.pseudo_translate(text)
+        self.count('chars_out', len(translation))
+
+        return translation
+
+    def translate_batch(self, texts: List[str], source_abbreviation: str, target_abbreviation: str) -> List[str]:
+        self.request(len(texts), sum(len(text) for text in texts), batch=True)
+        translations = [self.pseudo_translate(text) for text in texts]
+        self.count('chars_out', sum(len(translation) for translation in translations))
+
+        return translations
+
+    def pseudo_translate(self, text: str) -> str:
+        parts = []
+        position = 0
+
+        for match in PROTECTED_RE.finditer(text):
+            parts.append(text[position:match.start()].translate(ACCENTS))
+            parts.append(match.group(0))
+            position = match.end()
+        parts.append(text[position:].translate(ACCENTS))
+
+        padding = int(len(text) * self.expansion)
+
+        return ''.join(parts) + (' ' + '·' * padding if padding else '')
+
+    def request(self, texts: int, chars: int, batch: bool = False) -> None:
+        """Simulate a request: reject it over the rate limit, wait for the latency, and fail it by chance."""
+        with self._lock:
+            now = time.monotonic()
+
+            if self.requests_per_second is not None:
+                # Requests of the last second.
+                while self._requests and self._requests[0] <= now - 1:
+                    self._requests.popleft()
+
+                if len(self._requests) >= self.requests_per_second:
+                    self.stats['rate_limited'] += 1
+                    raise ProviderRateLimited(retry_after=self._requests[0] + 1 - now)
+
+                self._requests.append(now)
+
+            self.stats['batch_calls' if batch else 'calls'] += 1
+            self.stats['chars_in'] += chars
+
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            failed = self._random.random() < self.failure_rate
+            if failed:
+                self.stats['failed'] += texts
+
+        if delay:
+            time.sleep(delay)
+
+        if failed:
+            raise TranslateError('Simulated provider failure.')
+
+    def count(self, key: str, value: int) -> None:
+        with self._lock:
+            self.stats[key] += value
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return dict(self.stats)
+
+    def get_provider(self):
+        return None
+
+    @classmethod
+    def from_settings(cls, settings):
+        engine_settings = getattr(settings, cls.settings_key, None) or {}
+        return cls(**engine_settings)
@@ -1,15 +1,36 @@
-from typing import Dict, Type
+from importlib import import_module
+from importlib.metadata import entry_points
+from typing import Dict, List, Type
 
 from .exceptions import TranslateEngineNotFound
 
 
 class TranslationProviderRegistry:
+    """
+    Registry of translation providers.
+
+    Providers register themselves on class creation (see `TranslateProviderMeta`),
+    so a provider module is imported only when its provider is looked up.
+    Third-party providers are discovered through the `entry_point_group` entry points.
+    """
     _registry: Dict[str, Type['BaseTranslateProvider']] = {}
 
+    # Built-in providers, mapped to the modules defining them.
+    builtin_providers: Dict[str, str] = {
+        'deepl': 'blog_vi.core.translations.providers.deepl',
+        'google': 'blog_vi.core.translations.providers.google',
+        'claude': 'blog_vi.core.translations.providers.claude',
+        'pseudo': 'blog_vi.core.translations.providers.pseudo',
+    }
+    entry_point_group: str = 'blog_vi.translation_providers'
+
     def register_provider(self, provider: Type['BaseTranslateProvider']) -> None:
         self._registry[provider.id] = provider
 
     def get_provider(self, id_: str) -> Type['BaseTranslateProvider']:
+        if id_ not in self._registry:
+            self._load_provider(id_)
+
         try:
             return self._registry[id_]
         except KeyError:
@@ -18,5 +39,34 @@ class TranslationProviderRegistry:
     def get_registry(self) -> Dict[str, Type['BaseTranslateProvider']]:
         return self._registry.copy()
 
+    def get_provider_ids(self) -> List[str]:
+        """Return ids of all known providers, without importing them."""
+        # The abstract base provider is registered too, with its `id` property as a key.
+        ids = {*self.builtin_providers, *(id_ for id_ in self._registry if isinstance(id_, str))}
+        ids.update(entry_point.name for entry_point in self._get_entry_points())
+
+        return sorted(ids)
+
+    def _load_provider(self, id_: str) -> None:
+        """Import the module defining the provider `id_`, which registers the provider."""
+        if id_ in self.builtin_providers:
+            import_module(self.builtin_providers[id_])
+            return
+
+        for entry_point in self._get_entry_points():
+            if entry_point.name == id_:
+                provider = entry_point.load()
+                # Entry points may point either to a module or to the provider class itself.
+                if isinstance(provider, type):
+                    self.register_provider(provider)
+                return
+
+    def _get_entry_points(self):
+        points = entry_points()
+        if hasattr(points, 'select'):
+            return points.select(group=self.entry_point_group)
+
+        return points.get(self.entry_point_group, [])
+
 
 translation_provider_registry = TranslationProviderRegistry()
@@ -0,0 +1,156 @@
+"""
+Rendering of translated landings in worker processes.
+
+Markdown conversion and templating are CPU bound, so languages rendered in threads hold back each other.
+Workers receive an immutable snapshot of a translated landing, plain data only, and rebuild it.
+Compiled templates are shared through the on-disk bytecode cache.
+"""
+import asyncio
+import heapq
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Set, Tuple
+
+from blog_vi.core.article import Article
+from blog_vi.core.landing import Landing
+from blog_vi.core.templates import bytecode_cache
+
+# Constructor arguments of the translated articles, see `TranslateEngine.clone_article_for_translation()`.
+ARTICLE_FIELDS = ('title', 'author_name', 'author_email', 'author_info', 'author_image', 'author_social',
+                  'header_image', 'summary', 'categories', 'status', 'timestamp', 'markdown', 'slug')
+
+
+class LandingSnapshot:
+    """Picklable data of a translated landing and its articles."""
+    __slots__ = ('settings', 'name', 'link_menu', 'search_config', 'workdir', 'articles', 'partial_slugs')
+
+    def __init__(self, settings, name: str, link_menu: dict, search_config: dict, workdir: Path,
+                 articles: List[Tuple[dict, bool]], partial_slugs: Optional[Set[str]] = None):
+        self.settings = settings
+        self.name = name
+        self.link_menu = link_menu
+        self.search_config = search_config
+        self.workdir = workdir
+        # Constructor arguments of the articles, along with their `cacheable` flag.
+        self.articles = articles
+        self.partial_slugs = partial_slugs
+
+    @classmethod
+    def from_landing(cls, landing: Landing) -> 'LandingSnapshot':
+        return cls(
+            landing.settings,
+            landing.name,
+            landing.link_menu,
+            landing.search_config,
+            landing.workdir,
+            [
+                ({field: getattr(article, field) for field in ARTICLE_FIELDS}, article.cacheable)
+                for article in landing.get_articles()
+            ],
+            partial_slugs=landing.partial_slugs
+        )
+
+    @property
+    def size(self) -> int:
+        """Rough rendering cost of the landing."""
+        return sum(len(kwargs['markdown'] or '') + 1000 for kwargs, _ in self.articles)
+
+    def to_landing(self) -> Landing:
+        landing = Landing(
+            self.settings,
+            self.name,
+            link_menu=self.link_menu,
+            search_config=self.search_config,
+            workdir=self.workdir
+        )
+        landing.partial_slugs = self.partial_slugs
+
+        for kwargs, cacheable in self.articles:
+            article = Article(self.settings, landing=landing, **kwargs)
+            article.cacheable = cacheable
+            landing.add_article(article)
+
+        return landing
+
+
+def generate_landing(landing: Landing) -> None:
+    landing.generate()
+    landing.cache_changes()
+
+
+def render_snapshot(snapshot: LandingSnapshot) -> None:
+    generate_landing(snapshot.to_landing())
+
+
+def init_worker(bytecode_directory: Optional[Path]) -> None:
+    if bytecode_directory is not None:
+        bytecode_cache.use_directory(bytecode_directory)
+
+
+class LanguageRenderer:
+    """
+    Renders translated landings in a pool of worker processes.
+    Landings ready at the same time are rendered largest first, so the slowest language starts early.
+    """
+
+    def __init__(self, workers: int, bytecode_directory: Optional[Path] = None):
+        self.workers = workers
+        self.bytecode_directory = bytecode_directory
+
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._ready = []
+        self._running = 0
+        self._order = itertools.count()
+
+    def __enter__(self) -> 'LanguageRenderer':
+        if self.bytecode_directory is not None:
+            # Templates compiled by this process are found by the workers, and the other way round.
+            bytecode_cache.use_directory(self.bytecode_directory)
+
+        # Workers are spawned rather than forked, as the parent process runs threads.
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_worker,
+            initargs=(self.bytecode_directory,)
+        )
+
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._pool.shutdown()
+
+    async def render(self, landing: Landing) -> None:
+        """Render the landing in a worker, once one is free and no larger landing is waiting."""
+        snapshot = LandingSnapshot.from_landing(landing)
+        future = asyncio.get_running_loop().create_future()
+
+        heapq.heappush(self._ready, (-snapshot.size, next(self._order), snapshot, future))
+        self._dispatch()
+
+        await future
+
+    def _dispatch(self) -> None:
+        loop = asyncio.get_running_loop()
+
+        while self._running < self.workers and self._ready:
+            _, _, snapshot, future = heapq.heappop(self._ready)
+            self._running += 1
+
+            task = loop.run_in_executor(self._pool, render_snapshot, snapshot)
+            task.add_done_callback(lambda task, future=future: self._done(task, future))
+
+    def _done(self, task: asyncio.Future, future: asyncio.Future) -> None:
+        self._running -= 1
+
+        if not future.done():
+            if task.cancelled():
+                future.cancel()
+            elif task.exception() is not None:
+                future.set_exception(task.exception())
+            else:
+                future.set_result(None)
+
+        self._dispatch()
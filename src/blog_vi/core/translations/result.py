@@ -0,0 +1,29 @@
+from typing import Dict, Optional
+
+
+class TranslationResult:
+    """
+    Outcome of a translation by a provider.
+
+    A failed result carries the source text, so it can still be rendered,
+    but it must never be cached as a translation.
+    """
+    __slots__ = ('text', 'ok', 'provider', 'model', 'error', 'usage')
+
+    def __init__(self, text: str, ok: bool = True, provider: Optional[str] = None, model: Optional[str] = None,
+                 error: Optional[str] = None, usage: Optional[Dict[str, int]] = None):
+        self.text = text
+        self.ok = ok
+        self.provider = provider
+        self.model = model
+        self.error = error
+        self.usage = usage or {}
+
+    @classmethod
+    def failed(cls, source: str, error, provider: Optional[str] = None,
+               model: Optional[str] = None) -> 'TranslationResult':
+        return cls(source, ok=False, provider=provider, model=model, error=str(error))
+
+    def __repr__(self):
+        status = 'ok' if self.ok else f'failed: {self.error}'
+        return f'TranslationResult({self.text!r}, {status})'
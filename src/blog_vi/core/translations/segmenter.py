@@ -0,0 +1,217 @@
+"""
+Markdown-aware segmentation of article bodies for translation.
+
+A document is split into verbatim parts (code, tables, front matter, markup) and translatable text segments.
+Inline code, URLs, link targets and HTML tags inside a segment are replaced with placeholders,
+so providers never see (nor bill for) them, and restored after the translation.
+"""
+import re
+from typing import List, Optional, Sequence, Union
+
+PLACEHOLDER = '⟦{}⟧'
+PLACEHOLDER_RE = re.compile(r'⟦\s*(\d+)\s*⟧')
+
+FENCE_RE = re.compile(r'^ {0,3}(`{3,}|~{3,})')
+FRONT_MATTER_RE = re.compile(r'^(-{3}|\.{3})\s*$')
+TABLE_SEPARATOR_RE = re.compile(r'^\s*\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)+\|?\s*$')
+HORIZONTAL_RULE_RE = re.compile(r'^ {0,3}([-*_])(\s*\1){2,}\s*$')
+SETEXT_UNDERLINE_RE = re.compile(r'^ {0,3}(=+|-+)\s*$')
+REFERENCE_DEFINITION_RE = re.compile(r'^ {0,3}\[[^\]]+\]:\s*\S+')
+# Markup preceding the text of a line: headings, blockquotes, list items.
+LINE_PREFIX_RE = re.compile(r'^\s*(?:#{1,6}\s+|>\s?|[-*+]\s+|\d+[.)]\s+)+')
+
+# Inline parts, that must not be translated. Applied in order, so URLs inside code spans stay in the code.
+INLINE_PATTERNS = (
+    re.compile(r'(`+)[\s\S]+?\1'),  # inline code
+    re.compile(r'\]\((?:[^()\s]|\([^()]*\))*(?:\s+"[^"]*")?\)'),  # link and image targets
+    re.compile(r'\]\[[^\]]*\]'),  # reference link labels
+    re.compile(r'</?[A-Za-z][^>]*>'),  # HTML tags and autolinks
+    re.compile(r'(?:https?|ftp)://[^\s<>)\]]+'),  # bare URLs
+    re.compile(r'&(?:[A-Za-z]+|#\d+);'),  # HTML entities
+    re.compile(r'\{[#.][^}]*\}'),  # attribute lists, e.g. heading ids
+)
+LETTER_RE = re.compile(r'[^\W\d_]')
+
+
+class Segment:
+    """A translatable piece of text, with its untranslatable inline parts replaced by placeholders."""
+    __slots__ = ('text', 'placeholders')
+
+    def __init__(self, text: str, placeholders: Sequence[str] = ()):
+        self.text = text
+        self.placeholders = tuple(placeholders)
+
+    @property
+    def source(self) -> str:
+        """The original text of the segment."""
+        return self.restore(self.text)
+
+    def restore(self, translation: str) -> Optional[str]:
+        """Put the placeholders back into the translation. Return None, if the provider lost any of them."""
+        translation = PLACEHOLDER_RE.sub(lambda match: PLACEHOLDER.format(match.group(1)), translation)
+
+        # Later placeholders may wrap earlier ones, so they are restored first.
+        for index, value in reversed(list(enumerate(self.placeholders))):
+            placeholder = PLACEHOLDER.format(index)
+            if translation.count(placeholder) != 1:
+                return None
+
+            translation = translation.replace(placeholder, value)
+
+        return translation
+
+    def __repr__(self):
+        return f'Segment({self.text!r})'
+
+
+class MarkdownDocument:
+    """A markdown document split into verbatim parts and translatable segments."""
+
+    def __init__(self, parts: List[Union[str, Segment]]):
+        self.parts = parts
+
+    @property
+    def segments(self) -> List[Segment]:
+        return [part for part in self.parts if isinstance(part, Segment)]
+
+    @classmethod
+    def parse(cls, markdown: str) -> 'MarkdownDocument':
+        parser = _Parser()
+        parser.parse(markdown)
+
+        return cls(parser.parts)
+
+    def render(self, translations: Sequence[Optional[str]]) -> str:
+        """
+        Assemble the document with translations of its segments, given in the order of `segments`.
+        A segment without a usable translation keeps its source text.
+        """
+        translations = iter(translations)
+        rendered = []
+
+        for part in self.parts:
+            if isinstance(part, Segment):
+                translation = next(translations)
+                restored = part.restore(translation) if translation is not None else None
+                rendered.append(restored if restored is not None else part.source)
+            else:
+                rendered.append(part)
+
+        return ''.join(rendered)
+
+
+class _Parser:
+    def __init__(self):
+        self.parts: List[Union[str, Segment]] = []
+
+    def parse(self, markdown: str):
+        lines = markdown.splitlines(keepends=True)
+        index = self.parse_front_matter(lines)
+
+        while index < len(lines):
+            line = lines[index]
+
+            if not line.strip():
+                self.add_verbatim(line)
+                index += 1
+                continue
+
+            fence = FENCE_RE.match(line)
+            if fence:
+                end = index + 1
+                while end < len(lines) and not lines[end].strip().startswith(fence.group(1)):
+                    end += 1
+
+                self.add_verbatim(''.join(lines[index:end + 1]))
+                index = end + 1
+                continue
+
+            end = index
+            while end < len(lines) and lines[end].strip() and not FENCE_RE.match(lines[end]):
+                end += 1
+
+            self.parse_block(lines[index:end])
+            index = end
+
+    def parse_front_matter(self, lines: List[str]) -> int:
+        """Keep the front matter verbatim and return the index of the first line after it."""
+        if not lines or lines[0].strip() != '---':
+            return 0
+
+        for index in range(1, len(lines)):
+            if FRONT_MATTER_RE.match(lines[index]):
+                self.add_verbatim(''.join(lines[:index + 1]))
+                return index + 1
+
+        return 0
+
+    def parse_block(self, block: List[str]):
+        # Indented code, tables and horizontal rules are kept as they are.
+        if all(line.startswith(('    ', '\t')) for line in block):
+            self.add_verbatim(''.join(block))
+            return
+
+        if any(TABLE_SEPARATOR_RE.match(line) for line in block) or all(line.lstrip().startswith('|') for line in block):
+            self.add_verbatim(''.join(block))
+            return
+
+        if len(block) == 1 and HORIZONTAL_RULE_RE.match(block[0]):
+            self.add_verbatim(block[0])
+            return
+
+        line_based = any(
+            LINE_PREFIX_RE.match(line) or REFERENCE_DEFINITION_RE.match(line) or SETEXT_UNDERLINE_RE.match(line)
+            for line in block
+        )
+        if not line_based:
+            # A plain paragraph is translated as a whole, so sentences wrapped over lines stay together.
+            self.add_text(''.join(block))
+            return
+
+        for line in block:
+            if REFERENCE_DEFINITION_RE.match(line) or SETEXT_UNDERLINE_RE.match(line):
+                self.add_verbatim(line)
+                continue
+
+            prefix = LINE_PREFIX_RE.match(line)
+            if prefix:
+                self.add_verbatim(prefix.group(0))
+                line = line[prefix.end():]
+
+            self.add_text(line)
+
+    def add_verbatim(self, text: str):
+        if not text:
+            return
+
+        if self.parts and isinstance(self.parts[-1], str):
+            self.parts[-1] += text
+        else:
+            self.parts.append(text)
+
+    def add_text(self, text: str):
+        """Add a translatable text, keeping its surrounding whitespace and markup-only texts verbatim."""
+        stripped = text.strip()
+        if not stripped:
+            self.add_verbatim(text)
+            return
+
+        start = text.index(stripped)
+        self.add_verbatim(text[:start])
+
+        placeholders = []
+
+        def mask(match):
+            placeholders.append(match.group(0))
+            return PLACEHOLDER.format(len(placeholders) - 1)
+
+        masked = stripped
+        for pattern in INLINE_PATTERNS:
+            masked = pattern.sub(mask, masked)
+
+        if LETTER_RE.search(PLACEHOLDER_RE.sub('', masked)):
+            self.parts.append(Segment(masked, placeholders))
+        else:
+            self.add_verbatim(stripped)
+
+        self.add_verbatim(text[start + len(stripped):])
@@ -1,52 +1,53 @@
 import csv
-import io
 import hashlib
 import logging
 import os
 import shutil
+import tempfile
+import threading
 from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, TYPE_CHECKING, Union
 
-import requests
-from markdown import Extension
-from markdown.treeprocessors import Treeprocessor
+if TYPE_CHECKING:
+    import requests
 
+_http_session = None
+_http_session_lock = threading.Lock()
 
-class ImgExtractor(Treeprocessor):
-    def run(self, doc):
-        """Find all images and append to markdown.images."""
-        self.markdown.images = []
-        for image in doc.findall('.//img'):
-            self.markdown.images.append(image.get('src'))
 
+def get_http_session() -> 'requests.Session':
+    """Return the HTTP session shared by the whole process, so connections are pooled between requests."""
+    global _http_session
 
-class ImgExtExtension(Extension):
-    def extendMarkdown(self, md):
-        img_ext = ImgExtractor(md)
-        md.treeprocessors.add('imgext', img_ext, '>inline')
+    with _http_session_lock:
+        if _http_session is None:
+            # Imported here, so commands fetching nothing do not load requests and urllib3.
+            import requests
+            from requests.adapters import HTTPAdapter
 
+            _http_session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32)
+            _http_session.mount('http://', adapter)
+            _http_session.mount('https://', adapter)
 
-class NameDescriptionExtractor(Treeprocessor):
-    def run(self, doc):
-        """Find all h1,h2 and append to markdown.h1 and markdown.h2."""
-        self.markdown.h1s = []
-        for h1 in doc.findall('.//h1'):
-            self.markdown.h1s.append(h1.text)
-        self.markdown.h2s = []
-        for h2 in doc.findall('.//h2'):
-            self.markdown.h2s.append(h2.text)
+    return _http_session
 
 
-class H1H2Extension(Extension):
-    def extendMarkdown(self, md):
-        h1h2_ext = NameDescriptionExtractor(md)
-        md.treeprocessors.add('h1h2ext', h1h2_ext, '>inline')
+def iter_lines(text: str) -> Iterator[str]:
+    """Yield lines of the text with their line ends, without copying the whole text, as `io.StringIO` does."""
+    start = 0
+    while start < len(text):
+        end = text.find('\n', start) + 1 or len(text)
+        yield text[start:end]
+        start = end
 
 
-def make_json(csv_content: str) -> list:
+def make_json(csv_content: Union[str, Iterable[str]]) -> list:
+    """Return rows of a CSV, given by its text or its lines, e.g. a file opened with `newline=''`."""
     data = []
     try:
-        f = io.StringIO(csv_content)
-        csvReader = csv.DictReader(f)
+        lines = iter_lines(csv_content) if isinstance(csv_content, str) else csv_content
+        csvReader = csv.DictReader(lines)
         for rows in csvReader:
             data.append(rows)
     except Exception as e:
@@ -55,11 +56,15 @@ def make_json(csv_content: str) -> list:
 
 
 def get_articles_from_csv(url: str) -> list:
+    import requests
+
     try:
-        response = requests.get(url=url)
+        response = get_http_session().get(url=url)
         response.raise_for_status()
-        # Explicitly decode using UTF-8
-        csv_text = response.content.decode('utf-8')
+        # Explicitly decode using UTF-8, skipping the byte order mark of tables exported from Excel
+        csv_text = response.content.decode('utf-8-sig')
+        # The fetched bytes are dropped, so only the text and the rows are held while parsing.
+        del response
         if not csv_text:
             print("[WARNING] Fetched empty content from CSV URL.")
             return []
@@ -72,16 +77,61 @@ def get_articles_from_csv(url: str) -> list:
         return []
 
 
-def get_md_file(text: str, file_name: str) -> str:
-    mode = 'w'
-    if text.startswith('https://'):
-        text = requests.get(text).content
-        mode = 'wb'
+def is_markdown_url(markdown: Optional[str]) -> bool:
+    """Return whether the markdown of an article is given by a URL to fetch it from."""
+    return bool(markdown) and markdown.startswith('https://')
+
+
+class MarkdownFetcher:
+    """
+    Fetches markdown given by URLs once per build, so articles sharing the URL (e.g. legacy copies)
+    and the translations reuse the body.
+
+    Bodies are kept in memory, or in a temporary directory removed with the fetcher, if `on_disk` is set.
+    """
+
+    def __init__(self, on_disk: bool = False):
+        self.on_disk = on_disk
+
+        self._bodies: Dict[str, str] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._directory: Optional[tempfile.TemporaryDirectory] = None
+
+    def get(self, url: str) -> str:
+        with self._lock:
+            lock = self._locks.setdefault(url, threading.Lock())
 
-    with open(file_name, mode) as f:
-        f.write(text)
+        # Concurrent requests of the same URL wait for the first one.
+        with lock:
+            body = self._load(url)
+            if body is None:
+                response = get_http_session().get(url)
+                # Error pages must not become the body of the article, the failed fetch is not stored either.
+                response.raise_for_status()
+                body = response.content.decode('utf-8')
+                self._store(url, body)
 
-    return file_name
+        return body
+
+    def _get_path(self, url: str) -> Path:
+        if self._directory is None:
+            self._directory = tempfile.TemporaryDirectory(prefix='blogvi-markdown-')
+
+        return Path(self._directory.name, f'{hashlib.sha256(url.encode()).hexdigest()}.md')
+
+    def _load(self, url: str) -> Optional[str]:
+        if not self.on_disk:
+            return self._bodies.get(url)
+
+        path = self._get_path(url)
+        return path.read_text(encoding='utf-8') if path.exists() else None
+
+    def _store(self, url: str, body: str) -> None:
+        if self.on_disk:
+            self._get_path(url).write_text(body, encoding='utf-8')
+        else:
+            self._bodies[url] = body
 
 
 def copy_without_overwrite(src, dst):
@@ -108,6 +158,18 @@ def prepare_workdir(workdir: Path):
     return workdir, templates_dir
 
 
+def write_atomically(path: Union[str, Path], content: str) -> None:
+    """Write through a temporary file, so readers never see a partially written file."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    temporary_path = path.with_name(f'.{path.name}.tmp')
+    with open(temporary_path, 'w', encoding='utf-8') as fp:
+        fp.write(content)
+
+    os.replace(temporary_path, path)
+
+
 def get_md5_hash(text: str) -> str:
     return hashlib.md5(str(text).encode()).hexdigest()
 
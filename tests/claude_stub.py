@@ -0,0 +1,147 @@
+"""
+A minimal stand-in for the Anthropic API, covering the Message Batches endpoints and the Messages one.
+
+Translations are the source texts prefixed with the target language, e.g. `[de] Hello`. Batches end on their
+second retrieval, so a job is polled at least once before its results are fetched.
+"""
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+PROMPT_RE = re.compile(r'^Translate (?:the following text )?from (?P<source>\S+) to (?P<target>[^:\s]+):\n\n', re.S)
+
+
+def translate(content: str) -> str:
+    """Translate the user message of a request: a text, or a JSON array of texts of a batched request."""
+    match = PROMPT_RE.match(content)
+    target, text = match.group('target'), content[match.end():]
+
+    if text.startswith('['):
+        return json.dumps([f'[{target}] {item}' for item in json.loads(text)], ensure_ascii=False)
+
+    return f'[{target}] {text}'
+
+
+def get_message(params: dict, index: int) -> dict:
+    text = translate(params['messages'][-1]['content'])
+
+    return {
+        'id': f'msg_{index}',
+        'type': 'message',
+        'role': 'assistant',
+        'model': params['model'],
+        'content': [{'type': 'text', 'text': text}],
+        'stop_reason': 'end_turn',
+        'stop_sequence': None,
+        'usage': {'input_tokens': len(params['messages'][-1]['content']), 'output_tokens': len(text)},
+    }
+
+
+class ClaudeStub:
+    """Serves the stub API from a daemon thread, see `url`. Keeps the received requests for assertions."""
+
+    def __init__(self):
+        self.batches: Dict[str, dict] = {}
+        self.messages: List[dict] = []
+        self.retrievals = 0
+
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self.get_handler())
+        self.url = f'http://127.0.0.1:{self._server.server_port}'
+
+    def __enter__(self) -> 'ClaudeStub':
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def create_batch(self, body: dict) -> dict:
+        with self._lock:
+            batch_id = f'msgbatch_{len(self.batches)}'
+            self.batches[batch_id] = {'requests': body['requests'], 'retrievals': 0}
+
+        return self.get_batch(batch_id, retrieve=False)
+
+    def get_batch(self, batch_id: str, retrieve: bool = True) -> dict:
+        with self._lock:
+            batch = self.batches[batch_id]
+            if retrieve:
+                batch['retrievals'] += 1
+                self.retrievals += 1
+            ended = batch['retrievals'] >= 2
+            count = len(batch['requests'])
+
+        return {
+            'id': batch_id,
+            'type': 'message_batch',
+            'processing_status': 'ended' if ended else 'in_progress',
+            'request_counts': {'processing': 0 if ended else count, 'succeeded': count if ended else 0,
+                               'errored': 0, 'canceled': 0, 'expired': 0},
+            'created_at': '2024-01-01T00:00:00Z',
+            'expires_at': '2024-01-02T00:00:00Z',
+            'ended_at': '2024-01-01T00:01:00Z' if ended else None,
+            'archived_at': None,
+            'cancel_initiated_at': None,
+            'results_url': f'{self.url}/v1/messages/batches/{batch_id}/results' if ended else None,
+        }
+
+    def get_results(self, batch_id: str) -> str:
+        lines = [
+            json.dumps({'custom_id': request['custom_id'],
+                        'result': {'type': 'succeeded', 'message': get_message(request['params'], index)}},
+                       ensure_ascii=False)
+            for index, request in enumerate(self.batches[batch_id]['requests'])
+        ]
+
+        return ''.join(line + '\n' for line in lines)
+
+    def create_message(self, body: dict) -> dict:
+        with self._lock:
+            self.messages.append(body)
+            index = len(self.messages)
+
+        return get_message(body, index)
+
+    def get_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parts = self.path.split('?')[0].strip('/').split('/')
+                if parts[:3] != ['v1', 'messages', 'batches'] or len(parts) < 4 or parts[3] not in stub.batches:
+                    return self.send_json({'type': 'error', 'error': {'type': 'not_found_error'}}, 404)
+
+                if parts[4:] == ['results']:
+                    return self.send_body(stub.get_results(parts[3]).encode('utf-8'), 'application/binary')
+
+                self.send_json(stub.get_batch(parts[3]))
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                path = self.path.split('?')[0].rstrip('/')
+
+                if path == '/v1/messages/batches':
+                    return self.send_json(stub.create_batch(body))
+                if path == '/v1/messages':
+                    return self.send_json(stub.create_message(body))
+
+                self.send_json({'type': 'error', 'error': {'type': 'not_found_error'}}, 404)
+
+            def send_json(self, data: dict, status: int = 200):
+                self.send_body(json.dumps(data, ensure_ascii=False).encode('utf-8'), 'application/json', status)
+
+            def send_body(self, body: bytes, content_type: str, status: int = 200):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
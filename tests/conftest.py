@@ -0,0 +1,46 @@
+import csv
+import os
+import sys
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parents[1] / 'src'
+
+# The tests run against the source tree, whether or not the package is installed.
+sys.path.insert(0, str(SRC_DIR))
+
+
+def get_env() -> dict:
+    """Return the environment of a subprocess running the package from the source tree."""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(SRC_DIR), env.get('PYTHONPATH')]))
+
+    return env
+
+
+COLUMNS = (
+    'Status', 'Title', 'Legacy Slugs', 'Timestamp', 'Modified Timestamp', 'Author Name', 'Author email',
+    'About the Author', 'Author Avatar Image URL', 'linked.in github urls',
+    'Header Image (will be used in RSS feed)', 'Excerpt/Short Summary', 'Categories', 'Slug', 'Markdown',
+)
+
+
+def make_blog(workdir: Path, settings: str, articles: int = 3) -> Path:
+    """Write the settings and a CSV of generated articles, read by `blog_post_location_url: "posts.csv"`."""
+    workdir.joinpath('settings.yaml').write_text(settings, encoding='utf-8')
+
+    with open(workdir / 'posts.csv', 'w', newline='', encoding='utf-8') as fp:
+        writer = csv.DictWriter(fp, COLUMNS)
+        writer.writeheader()
+        for index in range(articles):
+            writer.writerow({
+                'Status': '1',
+                'Title': f'Post {index}',
+                'Timestamp': f'01/{index + 1:02d}/2024 10:00:00',
+                'Author Name': 'Ann',
+                'Author email': 'ann@example.com',
+                'Excerpt/Short Summary': f'Summary {index}',
+                'Categories': 'Engineering',
+                'Markdown': f'# Title {index}\n\nHello **world** {index}.\n',
+            })
+
+    return workdir
@@ -0,0 +1,172 @@
+"""The build graph: scheduling and skipping of the stages, and the pages they write."""
+import pytest
+
+from blog_vi.__main__ import generate_blog
+from blog_vi.core.build import BuildGraph, BuildTarget, Stage, StageCache
+from conftest import make_blog
+
+SETTINGS = '''blog_name: "Test"
+blog_root_url: "blog"
+blog_post_location_url: "posts.csv"
+domain_url: "https://example.com"
+'''
+
+
+def test_changed_template_rewrites_unchanged_articles(tmp_path):
+    make_blog(tmp_path, SETTINGS)
+    generate_blog(tmp_path)
+
+    template = tmp_path.joinpath('templates', 'article.html')
+    template.write_text(template.read_text(encoding='utf-8') + '<!-- changed template -->', encoding='utf-8')
+    generate_blog(tmp_path)
+
+    pages = sorted(tmp_path.glob('articles/*/index.html'))
+    assert len(pages) == 3
+    assert all('<!-- changed template -->' in page.read_text(encoding='utf-8') for page in pages)
+
+
+def test_missing_article_page_is_written_again(tmp_path):
+    make_blog(tmp_path, SETTINGS)
+    generate_blog(tmp_path)
+
+    page = tmp_path.joinpath('articles', 'post-1', 'index.html')
+    page.unlink()
+    generate_blog(tmp_path)
+
+    assert page.exists()
+
+
+def test_partial_build_rewrites_the_article_and_its_neighbours(tmp_path):
+    make_blog(tmp_path, SETTINGS, articles=5)
+    generate_blog(tmp_path)
+    stages = tmp_path.joinpath('.blogvi', 'stages.json').read_text(encoding='utf-8')
+
+    # Pages written again lose the marker.
+    pages = [*tmp_path.glob('articles/*/index.html'), *tmp_path.glob('*/index.html'), tmp_path / 'index.html']
+    for page in pages:
+        page.write_text(page.read_text(encoding='utf-8') + '<!-- previous build -->', encoding='utf-8')
+
+    generate_blog(tmp_path, target=BuildTarget(slugs=('post-2',)))
+
+    rewritten = sorted(
+        page.relative_to(tmp_path).as_posix() for page in pages
+        if '<!-- previous build -->' not in page.read_text(encoding='utf-8')
+    )
+    assert rewritten == [
+        'articles/post-1/index.html',
+        'articles/post-2/index.html',
+        'articles/post-3/index.html',
+        'engineering/index.html',
+        'index.html',
+    ]
+    # Partial builds do not record their runs, so the next full build is not skipped.
+    assert tmp_path.joinpath('.blogvi', 'stages.json').read_text(encoding='utf-8') == stages
+
+
+class FakeContext:
+    """The parts of `BuildContext` used by the scheduler, with inputs set by the tests."""
+
+    def __init__(self, workdir, **inputs):
+        self.settings = type('Settings', (), {'workdir': workdir})()
+        self.inputs = inputs
+        self.changed_inputs = {}
+        self.records_runs = True
+
+
+def get_graph(runs, outputs=()):
+    """Return a graph of stages recording their runs: `a` <- `b` <- `c`, and `d` apart."""
+    def stage(name, **kwargs):
+        return Stage(name, lambda context: runs.append(name), **kwargs)
+
+    return BuildGraph([
+        stage('c', requires=('b',), inputs=('data',), outputs=lambda context: list(outputs)),
+        stage('b', requires=('a',), inputs=('data',)),
+        stage('a', inputs=('data',)),
+        stage('d'),
+    ])
+
+
+def test_select_adds_required_stages_in_order():
+    graph = get_graph([])
+
+    assert graph.order.index('a') < graph.order.index('b') < graph.order.index('c')
+    assert graph.select(['c']) == ['a', 'b', 'c']
+    assert graph.select(['d', 'b']) == ['a', 'b', 'd']
+
+    with pytest.raises(ValueError, match='Unknown stage'):
+        graph.select(['e'])
+
+
+def test_cycles_and_unknown_requirements_are_rejected():
+    with pytest.raises(ValueError, match='depends on itself'):
+        BuildGraph([Stage('a', print, requires=('b',)), Stage('b', print, requires=('a',))])
+
+    with pytest.raises(ValueError, match='unknown stage'):
+        BuildGraph([Stage('a', print, requires=('b',))])
+
+
+def test_unchanged_stages_are_skipped(tmp_path):
+    runs = []
+    graph = get_graph(runs)
+
+    graph.run(FakeContext(tmp_path, data='1'))
+    assert sorted(runs) == ['a', 'b', 'c', 'd']
+
+    # Stages without inputs run on every build.
+    runs.clear()
+    graph.run(FakeContext(tmp_path, data='1'))
+    assert runs == ['d']
+
+    runs.clear()
+    context = FakeContext(tmp_path, data='2')
+    graph.run(context)
+    assert sorted(runs) == ['a', 'b', 'c', 'd']
+    assert context.changed_inputs['a'] == ['data']
+
+
+def test_stage_with_missing_output_runs_again(tmp_path):
+    runs = []
+    output = tmp_path / 'output'
+    graph = get_graph(runs, outputs=[output])
+
+    graph.run(FakeContext(tmp_path, data='1'))
+    output.write_text('')
+
+    runs.clear()
+    graph.run(FakeContext(tmp_path, data='1'))
+    assert runs == ['d']
+
+    output.unlink()
+    runs.clear()
+    graph.run(FakeContext(tmp_path, data='1'))
+    assert sorted(runs) == ['c', 'd']
+
+
+def test_named_stages_always_run(tmp_path):
+    runs = []
+    graph = get_graph(runs)
+    graph.run(FakeContext(tmp_path, data='1'))
+
+    runs.clear()
+    graph.run(FakeContext(tmp_path, data='1'), ['c'])
+    assert runs == ['c']
+
+    runs.clear()
+    graph.run(FakeContext(tmp_path, data='1'), ['c'], force=True)
+    assert runs == ['a', 'b', 'c']
+
+
+def test_failed_stage_stops_the_build(tmp_path):
+    runs = []
+
+    def fail(context):
+        raise RuntimeError('failed')
+
+    graph = BuildGraph([Stage('a', fail, inputs=('data',)),
+                        Stage('b', lambda context: runs.append('b'), requires=('a',))])
+
+    with pytest.raises(RuntimeError):
+        graph.run(FakeContext(tmp_path, data='1'))
+
+    assert runs == []
+    assert StageCache.for_settings(FakeContext(tmp_path).settings).get('a') is None
@@ -0,0 +1,39 @@
+"""The CLI imports the heavy dependencies only in the commands that use them."""
+import subprocess
+import sys
+
+import pytest
+
+from conftest import get_env
+
+HEAVY_MODULES = ('anthropic', 'deepl', 'feedgen', 'markdown', 'requests', 'urllib3')
+
+
+def get_imported_modules(statement: str) -> set:
+    """Return the top-level modules imported by `statement`, as reported by `python -X importtime`."""
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        env=get_env(), stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, check=True,
+    )
+
+    # Lines look like `import time:       353 |      20214 |   click`, nested imports are indented.
+    modules = set()
+    for line in process.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            name = line.rsplit('|', 1)[1].strip()
+            modules.add(name.split('.')[0])
+
+    return modules
+
+
+def test_cli_import_skips_heavy_modules():
+    modules = get_imported_modules('import blog_vi._cli')
+
+    assert 'blog_vi' in modules
+    assert modules.isdisjoint(HEAVY_MODULES), sorted(modules.intersection(HEAVY_MODULES))
+
+
+@pytest.mark.parametrize('module', HEAVY_MODULES)
+def test_heavy_modules_are_reported(module):
+    # Guards the parsing above: the modules are listed once they are imported.
+    assert module in get_imported_modules(f'import {module}')
@@ -0,0 +1,157 @@
+"""The manifest of the build outputs: stale files, the list of changes and its archive."""
+import csv
+import json
+import tarfile
+
+import pytest
+
+from blog_vi.__main__ import generate_blog
+from conftest import make_blog
+
+SETTINGS = '''blog_name: "Test"
+blog_root_url: "blog"
+blog_post_location_url: "posts.csv"
+domain_url: "https://example.com"
+'''
+
+
+def edit_rows(workdir, edit):
+    """Rewrite the CSV of the blog with `edit` applied to its list of rows."""
+    with open(workdir / 'posts.csv', newline='', encoding='utf-8') as fp:
+        reader = csv.DictReader(fp)
+        fieldnames, rows = reader.fieldnames, list(reader)
+
+    edit(rows)
+
+    with open(workdir / 'posts.csv', 'w', newline='', encoding='utf-8') as fp:
+        writer = csv.DictWriter(fp, fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def unpublish(rows):
+    rows[1]['Status'] = '0'
+
+
+def load_state(workdir, filename):
+    return json.loads(workdir.joinpath('.blogvi', filename).read_text(encoding='utf-8'))
+
+
+def test_unpublished_article_is_reported(tmp_path, capsys):
+    make_blog(tmp_path, SETTINGS)
+    generate_blog(tmp_path)
+    edit_rows(tmp_path, unpublish)
+    capsys.readouterr()
+
+    generate_blog(tmp_path, stale_outputs='report')
+
+    assert '    articles/post-1/index.html' in capsys.readouterr().out
+    assert tmp_path.joinpath('articles', 'post-1', 'index.html').exists()
+    # Kept in the manifest, so the next build reports them again.
+    assert 'articles/post-1/index.html' in load_state(tmp_path, 'manifest.json')['files']
+
+
+@pytest.mark.parametrize('mode', ['delete', 'tombstone'])
+def test_unpublished_article_is_deleted(tmp_path, mode):
+    make_blog(tmp_path, SETTINGS)
+    generate_blog(tmp_path)
+    edit_rows(tmp_path, unpublish)
+
+    generate_blog(tmp_path, stale_outputs=mode)
+
+    assert not tmp_path.joinpath('articles', 'post-1').exists()
+    assert tmp_path.joinpath('articles', 'post-0', 'index.html').exists()
+    assert 'articles/post-1/index.html' not in load_state(tmp_path, 'manifest.json')['files']
+    assert 'articles/post-1/index.html' in load_state(tmp_path, 'changes.json')['removed']
+
+    tombstones = tmp_path.joinpath('.blogvi', 'tombstones.json')
+    if mode == 'delete':
+        assert not tombstones.exists()
+    else:
+        urls = {tombstone['path']: tombstone['url'] for tombstone in load_state(tmp_path, 'tombstones.json')}
+        assert urls == {
+            'articles/post-1/cache.json': 'https://example.com/blog/articles/post-1/cache.json',
+            'articles/post-1/index.html': 'https://example.com/blog/articles/post-1/',
+        }
+
+
+def test_renamed_article_replaces_its_page(tmp_path):
+    make_blog(tmp_path, SETTINGS)
+    generate_blog(tmp_path)
+
+    def rename(rows):
+        rows[1]['Title'] = 'Renamed'
+
+    edit_rows(tmp_path, rename)
+    generate_blog(tmp_path, stale_outputs='delete')
+
+    assert not tmp_path.joinpath('articles', 'post-1').exists()
+    assert tmp_path.joinpath('articles', 'renamed', 'index.html').exists()
+
+    changes = load_state(tmp_path, 'changes.json')
+    assert {'articles/renamed/index.html', 'articles/renamed/cache.json'} <= set(changes['added'])
+    assert {'articles/post-1/index.html', 'articles/post-1/cache.json'} <= set(changes['removed'])
+
+
+def test_empty_source_keeps_the_blog(tmp_path):
+    make_blog(tmp_path, SETTINGS)
+    generate_blog(tmp_path)
+    manifest = load_state(tmp_path, 'manifest.json')
+    pages = {name: tmp_path.joinpath(name).read_bytes() for name in manifest['files']}
+
+    edit_rows(tmp_path, list.clear)
+    with pytest.raises(SystemExit):
+        generate_blog(tmp_path, stale_outputs='delete')
+
+    assert {name: tmp_path.joinpath(name).read_bytes() for name in pages} == pages
+    assert load_state(tmp_path, 'manifest.json') == manifest
+
+
+def edit_article(rows):
+    rows[1]['Markdown'] += 'More.\n'
+
+
+def test_changes_list_the_edited_article(tmp_path):
+    make_blog(tmp_path, SETTINGS)
+    generate_blog(tmp_path)
+    first = load_state(tmp_path, 'changes.json')
+    assert 'index.html' in first['added']
+    assert 'articles/post-1/index.html' in first['added']
+    assert first['changed'] == first['removed'] == []
+
+    edit_rows(tmp_path, edit_article)
+    generate_blog(tmp_path)
+
+    assert load_state(tmp_path, 'changes.json') == {
+        'added': [],
+        'changed': ['articles/post-1/cache.json', 'articles/post-1/index.html'],
+        'removed': [],
+        'purge': [
+            'https://example.com/blog/articles/post-1/cache.json',
+            'https://example.com/blog/articles/post-1/',
+        ],
+    }
+
+
+def test_emitted_archive_holds_the_changes(tmp_path):
+    workdir = tmp_path / 'blog'
+    workdir.mkdir()
+    make_blog(workdir, SETTINGS)
+
+    generate_blog(workdir, emit_tar=tmp_path / 'first.tar.gz')
+    with tarfile.open(tmp_path / 'first.tar.gz') as archive:
+        names = archive.getnames()
+    assert set(names) == set(load_state(workdir, 'changes.json')['added']) | {'changes.json'}
+
+    edit_rows(workdir, edit_article)
+    generate_blog(workdir, emit_tar=tmp_path / 'second.tar')
+
+    with tarfile.open(tmp_path / 'second.tar') as archive:
+        assert sorted(archive.getnames()) == [
+            'articles/post-1/cache.json', 'articles/post-1/index.html', 'changes.json'
+        ]
+        page = archive.extractfile('articles/post-1/index.html').read().decode('utf-8')
+        changes = json.load(archive.extractfile('changes.json'))
+
+    assert 'More.' in page
+    assert changes['changed'] == ['articles/post-1/cache.json', 'articles/post-1/index.html']
@@ -0,0 +1,74 @@
+"""Builds into other outputs than the blog directory: memory, tar and zip archives."""
+import tarfile
+import zipfile
+
+import pytest
+from click.testing import CliRunner
+
+from blog_vi.__main__ import generate_blog
+from blog_vi._cli import _cli
+from conftest import make_blog
+
+SETTINGS = '''blog_name: "Test"
+blog_root_url: "blog"
+blog_post_location_url: "posts.csv"
+domain_url: "https://example.com"
+'''
+
+PAGES = [
+    'articles/post-0/index.html',
+    'articles/post-1/index.html',
+    'articles/post-2/index.html',
+    'data.json',
+    'engineering/index.html',
+    'index.html',
+    'rss.xml',
+]
+
+
+def get_archive_names(path):
+    if path.suffix == '.zip':
+        with zipfile.ZipFile(path) as archive:
+            return archive.namelist()
+
+    with tarfile.open(path) as archive:
+        return archive.getnames()
+
+
+def test_build_into_memory(tmp_path):
+    make_blog(tmp_path, SETTINGS)
+
+    output = generate_blog(tmp_path, output='memory')
+
+    assert set(PAGES) <= set(output.files)
+    assert 'templates/assets/js/search.js' in output.files
+    assert 'Hello <strong>world</strong> 1.' in output.read('articles/post-1/index.html').decode('utf-8')
+    # The blog directory is left as it is.
+    assert not tmp_path.joinpath('index.html').exists()
+    assert not list(tmp_path.glob('articles/*/index.html'))
+
+
+@pytest.mark.parametrize('filename', ['site.tar', 'site.tar.gz', 'site.zip'])
+def test_build_into_archive(tmp_path, filename):
+    workdir = tmp_path / 'blog'
+    workdir.mkdir()
+    make_blog(workdir, SETTINGS)
+    archive_path = tmp_path / filename
+
+    result = CliRunner().invoke(_cli, ['build', str(workdir), '--output', str(archive_path)])
+    assert result.exit_code == 0, result.output
+
+    names = get_archive_names(archive_path)
+    assert set(PAGES) <= set(names)
+    assert 'templates/assets/js/search.js' in names
+    assert len(names) == len(set(names))
+    assert not workdir.joinpath('index.html').exists()
+
+
+def test_memory_output_is_not_a_command_line_option(tmp_path):
+    make_blog(tmp_path, SETTINGS)
+
+    result = CliRunner().invoke(_cli, ['build', str(tmp_path), '--output', 'memory'])
+
+    assert result.exit_code == 2
+    assert 'expected directory' in result.output
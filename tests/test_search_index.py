@@ -0,0 +1,36 @@
+"""The search index exports the markdown bodies, when the search looks into them."""
+import json
+
+import pytest
+
+from blog_vi.__main__ import generate_blog
+from conftest import make_blog
+
+SETTINGS = '''blog_name: "Test"
+blog_root_url: "blog"
+blog_post_location_url: "posts.csv"
+domain_url: "https://example.com"
+search_config:
+  title:
+    weight: 8
+  markdown:
+    weight: 1
+'''
+
+
+@pytest.mark.parametrize('low_memory', [False, True])
+def test_search_index_exports_markdown(tmp_path, low_memory):
+    make_blog(tmp_path, SETTINGS)
+
+    output = generate_blog(tmp_path, low_memory=low_memory, output='memory')
+    records = {record['title']: record for record in json.loads(output.read('data.json'))}
+
+    assert records['Post 1']['markdown'] == '# Title 1\n\nHello **world** 1.\n'
+
+
+def test_search_index_skips_markdown(tmp_path):
+    make_blog(tmp_path, SETTINGS.split('search_config:')[0])
+
+    output = generate_blog(tmp_path, output='memory')
+
+    assert all('markdown' not in record for record in json.loads(output.read('data.json')))
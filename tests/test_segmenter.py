@@ -0,0 +1,27 @@
+"""Markdown segmentation and the restoring of placeholders into translations."""
+from blog_vi.core.translations.segmenter import MarkdownDocument, Segment
+
+MARKDOWN = 'Read the [guide](https://example.com/guide) and run `make`.\n\n```\ncode\n```\n'
+
+
+def test_parse_masks_inline_parts():
+    document = MarkdownDocument.parse(MARKDOWN)
+
+    assert [segment.text for segment in document.segments] == ['Read the [guide⟦1⟧ and run ⟦0⟧.']
+    assert document.segments[0].source == 'Read the [guide](https://example.com/guide) and run `make`.'
+
+
+def test_render_restores_placeholders():
+    document = MarkdownDocument.parse(MARKDOWN)
+
+    assert document.render(['Lies die [Anleitung⟦1⟧ und starte ⟦0⟧.']) == (
+        'Lies die [Anleitung](https://example.com/guide) und starte `make`.\n\n```\ncode\n```\n'
+    )
+
+
+def test_restore_rejects_lost_and_repeated_placeholders():
+    segment = Segment('Run ⟦0⟧ then ⟦1⟧.', ['`a`', '`b`'])
+
+    assert segment.restore('Starte ⟦ 1 ⟧ und ⟦0⟧.') == 'Starte `b` und `a`.'
+    assert segment.restore('Starte ⟦0⟧.') is None
+    assert segment.restore('Starte ⟦0⟧, ⟦0⟧ und ⟦1⟧.') is None
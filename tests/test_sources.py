@@ -0,0 +1,63 @@
+"""Local sources of the articles: snapshots written by `write_snapshot()` and read back by the build."""
+import gzip
+
+import pytest
+
+from blog_vi.core.sources import get_articles_from_source, write_snapshot
+
+ROWS = [
+    {'Title': 'Post 1', 'Markdown': '# Title 1\n\nHello, "world" – ünïcode.\n', 'Status': '1'},
+    {'Title': 'Post 2', 'Markdown': '', 'Status': '0'},
+]
+
+
+@pytest.mark.parametrize('filename', ['posts.csv', 'posts.csv.gz'])
+def test_csv_round_trip(tmp_path, filename):
+    write_snapshot(ROWS, tmp_path / filename)
+
+    assert get_articles_from_source(filename, tmp_path) == ROWS
+
+
+def test_file_url(tmp_path):
+    path = tmp_path / 'snapshot.csv.gz'
+    write_snapshot(ROWS, path)
+
+    assert get_articles_from_source(path.as_uri(), tmp_path / 'elsewhere') == ROWS
+
+
+@pytest.mark.parametrize('filename', ['posts.parquet', 'posts.arrow', 'posts.feather'])
+def test_pyarrow_round_trip(tmp_path, filename):
+    pytest.importorskip('pyarrow')
+    write_snapshot(ROWS, tmp_path / filename)
+
+    assert get_articles_from_source(filename, tmp_path) == ROWS
+
+
+def test_byte_order_mark_is_skipped(tmp_path):
+    tmp_path.joinpath('posts.csv').write_bytes('\ufeffTitle,Status\r\nPost 1,1\r\n'.encode('utf-8'))
+    with gzip.open(tmp_path / 'posts.csv.gz', 'wb') as fp:
+        fp.write('\ufeffTitle,Status\r\nPost 1,1\r\n'.encode('utf-8'))
+
+    assert get_articles_from_source('posts.csv', tmp_path) == [{'Title': 'Post 1', 'Status': '1'}]
+    assert get_articles_from_source('posts.csv.gz', tmp_path) == [{'Title': 'Post 1', 'Status': '1'}]
+
+
+@pytest.mark.parametrize('filename, data', [
+    ('posts.csv', b'Title,Status\r\nPost \xff,1\r\n'),
+    ('posts.csv.gz', gzip.compress(b'Title,Status\r\nPost 1,1\r\n')[:-8]),
+    ('posts.missing', None),
+])
+def test_unreadable_source_has_no_articles(tmp_path, capsys, filename, data):
+    if data is not None:
+        tmp_path.joinpath(filename).write_bytes(data)
+
+    assert get_articles_from_source(filename, tmp_path) == []
+    assert '[ERROR]' in capsys.readouterr().out
+
+
+def test_invalid_parquet_has_no_articles(tmp_path, capsys):
+    pytest.importorskip('pyarrow')
+    tmp_path.joinpath('posts.parquet').write_bytes(b'PAR1 not really parquet PAR1')
+
+    assert get_articles_from_source('posts.parquet', tmp_path) == []
+    assert 'Invalid Parquet file' in capsys.readouterr().out
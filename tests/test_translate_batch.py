@@ -0,0 +1,120 @@
+"""`blogvi translate --batch` end to end, against a stub of the Message Batches API."""
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from blog_vi import _cli as cli
+from blog_vi._cli import _cli
+from blog_vi.core.translations.providers.base import BaseTranslateProvider, BatchJobsMixin
+from blog_vi.core.translations.memory import TranslationMemory
+from claude_stub import ClaudeStub
+from conftest import make_blog
+
+SETTINGS = '''blog_name: "Test"
+blog_root_url: "blog"
+blog_post_location_url: "posts.csv"
+domain_url: "https://example.com"
+translate_articles: true
+translator: claude
+claude_translator:
+  api_key: "test"
+  base_url: "{base_url}"
+translation_list:
+  - abbreviation: de
+    label: Deutsch
+source_language:
+  abbreviation: en
+  label: English
+'''
+
+
+def test_translate_batch(tmp_path):
+    with ClaudeStub() as stub:
+        make_blog(tmp_path, SETTINGS.format(base_url=stub.url))
+
+        result = CliRunner().invoke(_cli, ['translate', str(tmp_path), '--batch', '--poll-interval', '0'])
+        assert result.exit_code == 0, result.output
+        assert result.exception is None, result.output
+
+    # Submitted once, polled until ended, then ingested.
+    assert list(stub.batches) == ['msgbatch_0']
+    requests = stub.batches['msgbatch_0']['requests']
+    assert requests
+    assert stub.retrievals >= 2
+    assert f'Ingested {len(requests)} translations' in result.output
+    assert not tmp_path.joinpath('.blogvi', 'batch_job.json').exists()
+
+    # The build takes every translation from the memory, with no interactive request.
+    assert stub.messages == []
+
+    memory = TranslationMemory(tmp_path / '.blogvi' / 'translation_memory.sqlite3', read_only=True)
+    try:
+        assert memory.get_stats()['entries'] == len(requests)
+    finally:
+        memory.close()
+
+    page = tmp_path.joinpath('de', 'articles', 'post-1', 'index.html')
+    assert '[de] Hello' in page.read_text(encoding='utf-8')
+
+
+def test_translate_batch_resumes_submitted_job(tmp_path):
+    with ClaudeStub() as stub:
+        make_blog(tmp_path, SETTINGS.format(base_url=stub.url))
+        batch = stub.create_batch({'requests': []})
+
+        # A job submitted by an interrupted run, with no results.
+        state_path = tmp_path.joinpath('.blogvi', 'batch_job.json')
+        state_path.parent.mkdir()
+        state_path.write_text(json.dumps({'provider': 'claude', 'source': 'en', 'requests': {},
+                                          'jobs': [batch['id']]}))
+
+        result = CliRunner().invoke(_cli, ['translate', str(tmp_path), '--batch', '--poll-interval', '0'])
+        assert result.exception is None, result.output
+
+    assert f'Resuming batch jobs {batch["id"]}' in result.output
+    assert list(stub.batches) == [batch['id']]
+    assert not state_path.exists()
+
+    # The build translates what the job did not, with interactive requests.
+    assert stub.messages
+    page = tmp_path.joinpath('de', 'articles', 'post-1', 'index.html')
+    assert '[de] Hello' in page.read_text(encoding='utf-8')
+
+
+def test_translate_without_translations_fails(tmp_path):
+    make_blog(tmp_path, SETTINGS.format(base_url='http://127.0.0.1:9').replace('translate_articles: true',
+                                                                               'translate_articles: false'))
+
+    result = CliRunner().invoke(_cli, ['translate', str(tmp_path), '--batch'])
+
+    assert result.exit_code == 1
+    assert 'Translations are disabled' in result.output
+    assert not tmp_path.joinpath('articles').exists()
+
+
+def test_translate_passes_build_options(tmp_path, monkeypatch):
+    make_blog(tmp_path, SETTINGS.format(base_url='http://127.0.0.1:9'))
+    calls = []
+    monkeypatch.setattr(cli, 'generate_blog', lambda workdir, **kwargs: calls.append(kwargs))
+
+    result = CliRunner().invoke(_cli, ['translate', str(tmp_path), '--resume', '--low-memory'])
+
+    assert result.exit_code == 0, result.output
+    assert calls == [{'low_memory': True, 'resume': True, 'batch': False, 'poll_interval': 60}]
+
+
+def test_batch_jobs_are_abstract():
+    class IncompleteBatchProvider(BatchJobsMixin, BaseTranslateProvider):
+        id = 'incomplete-batch-test'
+
+        def translate(self, text, source_abbreviation, target_abbreviation):
+            return text
+
+        def submit_batch_job(self, requests):
+            return 'job'
+
+    assert IncompleteBatchProvider.supports_batch_jobs
+    assert not BaseTranslateProvider.supports_batch_jobs
+    with pytest.raises(TypeError):
+        IncompleteBatchProvider()
@@ -0,0 +1,96 @@
+"""Translations of article bodies, whose provider loses the placeholders of the segments."""
+from pathlib import Path
+
+from blog_vi.__main__ import generate_blog
+from blog_vi.core.translations.memory import TranslationMemory
+from blog_vi.core.translations.providers.base import BaseTranslateProvider
+from conftest import make_blog
+
+SETTINGS = '''blog_name: "Test"
+blog_root_url: "blog"
+blog_post_location_url: "posts.csv"
+domain_url: "https://example.com"
+translate_articles: true
+translator: placeholder-test
+translation_list:
+  - abbreviation: de
+    label: Deutsch
+source_language:
+  abbreviation: en
+  label: English
+'''
+
+MARKDOWN = 'See the [guide](https://example.com/guide) first.\n'
+SEGMENT = 'See the [guide⟦0⟧ first.'
+
+
+class PlaceholderTestProvider(BaseTranslateProvider):
+    """Prefixes texts with the target language, dropping the placeholders while `drop_placeholders` is set."""
+    id = 'placeholder-test'
+    drop_placeholders = False
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls()
+
+    def translate(self, text, source_abbreviation, target_abbreviation):
+        if self.drop_placeholders:
+            text = text.replace('⟦0⟧', '')
+
+        return f'[{target_abbreviation}] {text}'
+
+    def get_provider(self):
+        return None
+
+
+def make_link_blog(workdir: Path) -> None:
+    """Write a blog of a single article, with a link in its body."""
+    make_blog(workdir, SETTINGS, articles=1)
+
+    csv_path = workdir.joinpath('posts.csv')
+    csv_path.write_text(csv_path.read_text(encoding='utf-8').replace('# Title 0\n\nHello **world** 0.\n', MARKDOWN),
+                        encoding='utf-8')
+
+
+def build(workdir: Path, drop_placeholders: bool) -> str:
+    PlaceholderTestProvider.drop_placeholders = drop_placeholders
+    generate_blog(workdir)
+
+    return workdir.joinpath('de', 'articles', 'post-0', 'index.html').read_text(encoding='utf-8')
+
+
+def get_memory_translation(workdir: Path):
+    memory = TranslationMemory(workdir / '.blogvi' / 'translation_memory.sqlite3', read_only=True)
+    try:
+        return memory.get('placeholder-test', 'en', 'de', SEGMENT)
+    finally:
+        memory.close()
+
+
+def test_lost_placeholders_fail_the_segment(tmp_path):
+    make_link_blog(tmp_path)
+
+    page = build(tmp_path, drop_placeholders=True)
+
+    # The segment keeps its source text, with the link, and the broken translation is not remembered.
+    assert 'href="https://example.com/guide"' in page
+    assert '[de] See the' not in page
+    assert get_memory_translation(tmp_path) is None
+
+
+def test_article_with_lost_placeholders_is_retried(tmp_path):
+    make_link_blog(tmp_path)
+
+    build(tmp_path, drop_placeholders=True)
+
+    # Neither cached nor checkpointed, so the next build translates the article again.
+    translated_dir = tmp_path.joinpath('de', 'articles', 'post-0')
+    assert not any(path.suffix == '.json' for path in translated_dir.iterdir())
+    checkpoint = tmp_path.joinpath('.blogvi', 'checkpoints', 'de.jsonl')
+    assert not checkpoint.exists() or 'post-0' not in checkpoint.read_text(encoding='utf-8')
+
+    page = build(tmp_path, drop_placeholders=False)
+
+    assert '[de] See the' in page
+    assert 'href="https://example.com/guide"' in page
+    assert get_memory_translation(tmp_path) == f'[de] {SEGMENT}'